@@ -0,0 +1,33 @@
+from typing import Optional, Sequence
+
+from PIL import Image
+
+from app.wrap.geometry import Quad, perspective_coefficients
+
+
+def rectify(image: Image.Image, quad_points: Sequence, max_side: Optional[int] = None) -> Image.Image:
+    """
+    Warps the quadrilateral ``quad_points`` (tl, tr, br, bl in top-left-origin
+    pixels of ``image``) to an upright rectangle. The output size follows the
+    quad's mean side lengths, capped at ``max_side`` on the longer side;
+    the crop is never upscaled. Cards standing on their short side come out
+    landscape.
+    """
+    quad = Quad(quad_points)
+    if not quad.is_clockwise():
+        # Reverse the winding around the first corner; Quad.clockwise only
+        # rotates the order, which would mirror the crop
+        quad = Quad(quad.points[[0, 3, 2, 1]])
+    width, height = quad.dimensions()
+    if height > width:
+        # Rotate the corner order a quarter turn so the long side is on top
+        quad = Quad(quad.points[[3, 0, 1, 2]])
+        width, height = height, width
+
+    scale = 1.0
+    if max_side and max(width, height) > max_side:
+        scale = max_side / max(width, height)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+
+    coefficients = perspective_coefficients(quad, size[0], size[1])
+    return image.transform(size, Image.PERSPECTIVE, coefficients, Image.BICUBIC)
@@ -5,18 +5,27 @@ import numpy as np
 import tempfile
 import os
 import time
-from typing import Dict, Any, List, Tuple
-from PIL import Image, ImageDraw
+from typing import Dict, Any, List, Optional, Tuple
+from PIL import Image
 from app.utils.image_utils import get_image_dimensions, calculate_fast_rate, calculate_rack_cooling_rate
+from app.utils.visualization import card_overlay, maybe_render
+from app.utils.proxy import make_proxy
+from app.card.nms import suppress_cards
+from app.wrap.geometry import Quad, point_xy
 
+# Candidates overlapping a better one by more than this IoU are dropped
+CARD_NMS_IOU = 0.7
 
-def detect_card(image: Image.Image) -> Dict[str, Any]:
+
+def detect_card(image: Image.Image, visualize: bool = False, proxy_max_side: Optional[int] = None,
+                max_observations: int = 5) -> Dict[str, Any]:
     start_time = time.time()
     dimensions = get_image_dimensions(image)
     width, height = dimensions["width"], dimensions["height"]
 
-    temp_filename = _save_temp_image(image)
-    output_image = image.copy()
+    # Vision reports normalized boxes, so detecting on the proxy and scaling
+    # by the full width and height yields full-resolution pixels.
+    temp_filename = _save_temp_image(make_proxy(image, proxy_max_side).image)
     cards = []
     max_confidence = 0.0
     best_card_position = None
@@ -26,21 +35,14 @@ def detect_card(image: Image.Image) -> Dict[str, Any]:
             Foundation.NSURL.fileURLWithPath_(temp_filename), None
         )
 
-        cards = _detect_with_rectangle_request(handler, width, height)
+        cards = _detect_with_rectangle_request(handler, width, height, max_observations)
 
         if not cards:
             cards = _detect_with_document_request(handler, width, height)
 
         cards, max_confidence, best_card_position = _filter_cards(cards)
 
-        draw = ImageDraw.Draw(output_image)
-        for card in cards:
-            pos = card["position"]
-            confidence = card["confidence"]
-            color = (0, 255, 0)  # Set color to green by default
-            draw.rectangle([pos["x"], pos["y"], pos["x"] + pos["width"], pos["y"] + pos["height"]],
-                           outline=color, width=4)
-            draw.text((pos["x"], pos["y"] - 20), f"Confidence: {confidence:.2f}", fill=color)  # Confidence text
+        overlay = card_overlay(cards, width, height)
 
         return {
             "has_card": len(cards) > 0,
@@ -53,7 +55,8 @@ def detect_card(image: Image.Image) -> Dict[str, Any]:
             "fast_rate": calculate_fast_rate(width, height),
             "rack_cooling_rate": calculate_rack_cooling_rate(width, height, len(cards)),
             "processing_time": time.time() - start_time,
-            "output_image": output_image
+            "overlay": overlay,
+            "output_image": maybe_render(image, overlay, visualize)
         }
 
     except Exception as e:
@@ -69,7 +72,7 @@ def detect_card(image: Image.Image) -> Dict[str, Any]:
             "fast_rate": calculate_fast_rate(width, height),
             "rack_cooling_rate": calculate_rack_cooling_rate(width, height, 0),
             "processing_time": time.time() - start_time,
-            "output_image": output_image
+            "overlay": card_overlay([], width, height)
         }
     finally:
         if os.path.exists(temp_filename):
@@ -82,12 +85,12 @@ def _save_temp_image(image):
         return tmp.name
 
 
-def _detect_with_rectangle_request(handler, width, height) -> List[Dict[str, Any]]:
+def _detect_with_rectangle_request(handler, width, height, max_observations=5) -> List[Dict[str, Any]]:
     request = Vision.VNDetectRectanglesRequest.alloc().init()
     request.setMinimumAspectRatio_(0.5)
     request.setMaximumAspectRatio_(2.2)
     request.setMinimumSize_(0.15)
-    request.setMaximumObservations_(5)
+    request.setMaximumObservations_(max_observations)
     request.setQuadratureTolerance_(8.0)
 
     success, error = handler.performRequests_error_([request], None)
@@ -110,7 +113,8 @@ def _detect_with_rectangle_request(handler, width, height) -> List[Dict[str, Any
             "confidence": final_conf,
             "is_card_like": is_card_like,
             "aspect_ratio": aspect_ratio,
-            "corners": _convert_bounding_box_to_corners(bbox, width, height)
+            "corners": _convert_bounding_box_to_corners(bbox, width, height),
+            "quad": _observation_quad(obs, width, height)
         })
     return results
 
@@ -135,7 +139,8 @@ def _detect_with_document_request(handler, width, height) -> List[Dict[str, Any]
             "confidence": confidence,
             "is_card_like": 1.3 <= aspect_ratio <= 1.9,
             "aspect_ratio": aspect_ratio,
-            "corners": _convert_bounding_box_to_corners(bbox, width, height)
+            "corners": _convert_bounding_box_to_corners(bbox, width, height),
+            "quad": _observation_quad(obs, width, height)
         })
     return results
 
@@ -144,14 +149,8 @@ def _filter_cards(cards: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], fl
     if not cards:
         return [], 0.0, None
 
-    cards.sort(key=lambda c: c["confidence"], reverse=True)
-    best = cards[0]
-    filtered = [best]
-
-    for other in cards[1:]:
-        if not _has_significant_overlap(best["position"], other["position"]):
-            filtered.append(other)
-
+    filtered = suppress_cards(cards, iou_threshold=CARD_NMS_IOU)
+    best = filtered[0]
     return filtered, best["confidence"], best["position"]
 
 
@@ -165,13 +164,12 @@ def _convert_bounding_box_to_corners(bbox, width, height) -> List[Dict[str, floa
     ]
 
 
-def _has_significant_overlap(b1, b2, threshold=0.7):
-    x1 = max(b1["x"], b2["x"])
-    y1 = max(b1["y"], b2["y"])
-    x2 = min(b1["x"] + b1["width"], b2["x"] + b2["width"])
-    y2 = min(b1["y"] + b1["height"], b2["y"] + b2["height"])
-    if x2 <= x1 or y2 <= y1:
-        return False
-    inter_area = (x2 - x1) * (y2 - y1)
-    union_area = b1["width"] * b1["height"] + b2["width"] * b2["height"] - inter_area
-    return (inter_area / union_area) > threshold
+def _observation_quad(obs, width, height) -> List[List[float]]:
+    """tl, tr, br, bl corners in top-left-origin pixels, from the observation's own corners when it has them."""
+    if hasattr(obs, "topLeft"):
+        corners = [point_xy(c) for c in (obs.topLeft(), obs.topRight(), obs.bottomRight(), obs.bottomLeft())]
+    else:
+        bbox = obs.boundingBox()
+        x, y, w, h = bbox.origin.x, bbox.origin.y, bbox.size.width, bbox.size.height
+        corners = [(x, y + h), (x + w, y + h), (x + w, y), (x, y)]
+    return Quad.from_vision(corners, width, height).points.tolist()
@@ -0,0 +1,60 @@
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+
+def boxes_array(positions: Sequence[Dict[str, float]]) -> np.ndarray:
+    """(n, 4) x, y, width, height from card position dicts."""
+    if not positions:
+        return np.zeros((0, 4))
+    return np.array([[p["x"], p["y"], p["width"], p["height"]] for p in positions], dtype=np.float64)
+
+
+def iou_matrix(boxes: np.ndarray, others: np.ndarray = None) -> np.ndarray:
+    """Pairwise IoU of x/y/width/height boxes, shape (len(boxes), len(others))."""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    others = boxes if others is None else np.asarray(others, dtype=np.float64).reshape(-1, 4)
+
+    x1 = np.maximum(boxes[:, None, 0], others[None, :, 0])
+    y1 = np.maximum(boxes[:, None, 1], others[None, :, 1])
+    x2 = np.minimum(boxes[:, None, 0] + boxes[:, None, 2], others[None, :, 0] + others[None, :, 2])
+    y2 = np.minimum(boxes[:, None, 1] + boxes[:, None, 3], others[None, :, 1] + others[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    union = (boxes[:, 2] * boxes[:, 3])[:, None] + (others[:, 2] * others[:, 3])[None, :] - inter
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(union > 0, inter / np.where(union > 0, union, 1.0), 0.0)
+
+
+def nms(boxes: np.ndarray, scores: Sequence[float], iou_threshold: float = 0.5,
+        max_results: int = None) -> np.ndarray:
+    """
+    Greedy non-maximum suppression. Returns indices of the kept boxes in
+    descending score order; ties keep the earlier box. The IoU matrix is
+    computed once, so each step is one row lookup.
+    """
+    scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+    if len(scores) == 0:
+        return np.zeros(0, dtype=np.intp)
+
+    order = np.argsort(-scores, kind="stable")
+    overlaps = iou_matrix(boxes) > iou_threshold
+    suppressed = np.zeros(len(scores), dtype=bool)
+
+    keep = []
+    for index in order:
+        if suppressed[index]:
+            continue
+        keep.append(index)
+        if max_results is not None and len(keep) >= max_results:
+            break
+        suppressed |= overlaps[index]
+    return np.array(keep, dtype=np.intp)
+
+
+def suppress_cards(cards: List[Dict[str, Any]], iou_threshold: float = 0.5,
+                   max_results: int = None) -> List[Dict[str, Any]]:
+    """Cards surviving NMS on their ``position`` boxes and ``confidence``, best first."""
+    keep = nms(boxes_array([c["position"] for c in cards]), [c["confidence"] for c in cards],
+               iou_threshold, max_results)
+    return [cards[i] for i in keep]
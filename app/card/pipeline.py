@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+import contextvars
+import os
+import time
+
+from PIL import Image
+
+from app.card.crops import rectify
+from app.card.detector import detect_card
+from app.card.nms import suppress_cards
+from app.ocr.engine import perform_ocr
+from app.utils.deadline import check_deadline
+from app.utils.request_logging import get_logger
+
+log = get_logger(__name__)
+
+CARD_OCR_WORKERS = int(os.environ.get("CARD_OCR_WORKERS", "4"))
+CARD_CROP_MAX_SIDE = int(os.environ.get("CARD_CROP_MAX_SIDE", "2000"))
+# Cards on one sheet do not overlap, so anything overlapping a better
+# candidate by more than this is a duplicate detection.
+CARD_SHEET_NMS_IOU = 0.3
+
+
+def read_cards(image: Image.Image, languages: List[str], recognition_level: str, max_cards: int = 4,
+               max_workers: int = None, ocr: Callable[..., Dict[str, Any]] = perform_ocr) -> Dict[str, Any]:
+    """
+    Detects up to ``max_cards`` cards, rectifies each from its corners and
+    OCRs the crops in parallel. Cards come back best-first with their
+    crop images under ``crop``.
+    """
+    start_time = time.time()
+
+    detection = detect_card(image, max_observations=max(8, max_cards * 2))
+    if "error" in detection:
+        raise RuntimeError(detection["error"])
+    detection_time = time.time() - start_time
+
+    check_deadline("detection")
+
+    cards = suppress_cards(detection["cards"], iou_threshold=CARD_SHEET_NMS_IOU, max_results=max_cards)
+    crops = [rectify(image, card["quad"], CARD_CROP_MAX_SIDE) for card in cards]
+
+    def read(crop):
+        check_deadline("recognition")
+        crop_start = time.time()
+        result = ocr(crop, languages, recognition_level)
+        result["processing_time"] = time.time() - crop_start
+        return result
+
+    workers = min(max_workers or CARD_OCR_WORKERS, len(crops)) or 1
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Each crop runs in a copy of this context so it keeps the request id and deadline
+        jobs = [pool.submit(contextvars.copy_context().run, read, crop) for crop in crops]
+        ocr_results = [job.result() for job in jobs]
+
+    results = []
+    for index, (card, crop, ocr_result) in enumerate(zip(cards, crops, ocr_results)):
+        results.append({
+            "id": f"card-{index + 1}",
+            "confidence": card["confidence"],
+            "position": card["position"],
+            "corners": [{"x": x, "y": y} for x, y in card["quad"]],
+            "crop": crop,
+            "crop_width": crop.width,
+            "crop_height": crop.height,
+            "document_type": ocr_result["document_type"],
+            "document_scores": ocr_result.get("document_scores", {}),
+            "recognized_text": ocr_result["recognized_text"],
+            "ocr_confidence": ocr_result["confidence"],
+            "text_lines": ocr_result["text_lines"],
+            "text_object_count": ocr_result["text_object_count"],
+            "processing_time": ocr_result["processing_time"],
+        })
+
+    log.info("cards_read", candidates=len(detection["cards"]), cards=len(results), workers=workers,
+             detection_ms=round(detection_time * 1000, 3))
+
+    return {
+        "card_count": len(results),
+        "cards": results,
+        "dimensions": detection["dimensions"],
+        "detection_time": detection_time,
+        "processing_time": time.time() - start_time,
+    }
@@ -0,0 +1,81 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+
+def bbox_dict(observation: Any) -> Dict[str, float]:
+    """Normalized, bottom-left-origin bounding box of a face observation."""
+    bbox = observation.boundingBox()
+    return {
+        "x": float(bbox.origin.x),
+        "y": float(bbox.origin.y),
+        "width": float(bbox.size.width),
+        "height": float(bbox.size.height)
+    }
+
+
+def _bbox_key(observation: Any):
+    bbox = bbox_dict(observation)
+    return tuple(round(bbox[k], 6) for k in ("x", "y", "width", "height"))
+
+
+def match_results(observations: Sequence[Any], results: Optional[Sequence[Any]]) -> List[Optional[Any]]:
+    """
+    Lines batched results up with the faces they were computed for.
+    Results carry their input face's bounding box, so they are matched on
+    it; if none match but the counts agree, input order is used.
+    """
+    results = list(results or [])
+    by_bbox = {}
+    for result in results:
+        by_bbox.setdefault(_bbox_key(result), result)
+
+    matched = [by_bbox.get(_bbox_key(observation)) for observation in observations]
+    if not any(m is not None for m in matched) and len(results) == len(observations):
+        return results
+    return matched
+
+
+def analyze_faces(handler: Any, observations: Sequence[Any], quality_request: Any,
+                  landmarks_request: Optional[Any] = None) -> List[Dict[str, Any]]:
+    """
+    Scores every face in one performRequests call: all observations go to
+    the capture quality request, and to the landmarks request when one is
+    given. The number of framework calls does not depend on the face count.
+
+    ``quality_score`` is None for faces the quality request returned nothing
+    for; ``has_landmarks`` is None when landmarks were not requested.
+    """
+    observations = list(observations)
+    if not observations:
+        return []
+
+    requests = [quality_request]
+    quality_request.setInputFaceObservations_(observations)
+    if landmarks_request is not None:
+        landmarks_request.setInputFaceObservations_(observations)
+        requests.append(landmarks_request)
+
+    handler.performRequests_error_(requests, None)
+
+    qualities = match_results(observations, quality_request.results())
+    landmarks = match_results(observations, landmarks_request.results()) if landmarks_request is not None else None
+
+    faces = []
+    for i, observation in enumerate(observations):
+        quality = qualities[i]
+        faces.append({
+            "id": str(i + 1),
+            "bbox": bbox_dict(observation),
+            "quality_score": float(quality.faceCaptureQuality() or 0.0) if quality is not None else None,
+            "has_landmarks": (landmarks[i] is not None and landmarks[i].landmarks() is not None)
+                             if landmarks is not None else None
+        })
+    return faces
+
+
+def best_face(faces: List[Dict[str, Any]]):
+    """(quality_score, position) of the highest-scoring face, or (None, None)."""
+    scored = [face for face in faces if face["quality_score"] is not None]
+    if not scored:
+        return None, None
+    best = max(scored, key=lambda face: face["quality_score"])
+    return best["quality_score"], dict(best["bbox"])
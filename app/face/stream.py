@@ -0,0 +1,78 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+
+class LatestFrameSlot:
+    """Single-slot buffer that only keeps the newest frame; older frames are dropped."""
+
+    def __init__(self):
+        self._frame: Optional[Tuple[int, bytes, float]] = None
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, data: bytes) -> None:
+        self.received += 1
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = (self.received, data, time.perf_counter())
+        self._ready.set()
+
+    async def get(self) -> Optional[Tuple[int, bytes, float]]:
+        while self._frame is None:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+
+        frame, self._frame = self._frame, None
+        return frame
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+
+class LatencyStats:
+
+    def __init__(self, window: int = 100):
+        self._samples = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self.count += 1
+
+    def summary(self) -> Dict[str, Any]:
+        if not self._samples:
+            return {"count": 0, "last_ms": None, "avg_ms": None, "p95_ms": None}
+
+        ordered = sorted(self._samples)
+        p95_index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+
+        return {
+            "count": self.count,
+            "last_ms": round(self._samples[-1] * 1000.0, 2),
+            "avg_ms": round(sum(ordered) / len(ordered) * 1000.0, 2),
+            "p95_ms": round(ordered[p95_index] * 1000.0, 2)
+        }
+
+
+def compact_face_result(face_result: Dict[str, Any]) -> Dict[str, Any]:
+    quality_score = face_result.get("quality_score")
+
+    result = {
+        "has_face": face_result.get("has_face", False),
+        "face_count": face_result.get("face_count", 0),
+        "quality_score": round(float(quality_score), 4) if quality_score is not None else None,
+        "position": face_result.get("position"),
+        "processing_time": round(face_result.get("processing_time", 0.0), 4)
+    }
+
+    if "error" in face_result:
+        result["error"] = face_result["error"]
+
+    return result
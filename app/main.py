@@ -1,38 +1,78 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Query, Body
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Query, Body, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse, Response, FileResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import io
 from PIL import Image
 import sys
 import os
+import time
+import asyncio
 from datetime import datetime
 import uuid
 import json
-from typing import Dict, List, Optional, Union, Tuple
+import hashlib
+import functools
+from typing import Awaitable, Callable, Dict, List, Optional, Union, Tuple
 
 from app.ocr.engine import perform_ocr
+from app.ocr.result_store import get_result_store
+from app.ocr.recognition_level import AUTO_LEVEL, effective_level, level_selector
 from app.face.quality_detection import detect_face_quality
+from app.face.stream import LatestFrameSlot, LatencyStats, compact_face_result
 from app.card.detector import detect_card
-from app.utils.image_processing import convert_to_supported_format, pil_to_ci_image, ci_to_pil_image
-from app.wrap.correct_perspective import correct_perspective
+from app.card.pipeline import read_cards
+from app.utils.image_processing import convert_to_supported_format, pil_to_ci_image
 from app.wrap.detect_rectangle import detect_document_edges
-from app.wrap.enhance_image import enhance_image
+from app.wrap.pipeline import PerspectivePipeline
 from app.utils.image_utils import get_image_dimensions, calculate_fast_rate, calculate_rack_cooling_rate
+from app.utils.visualization import render_overlay, format_overlay, OVERLAY_FORMATS
+from app.utils.encoding import negotiate_output_format, encode_image, output_extension, output_media_type, accepts_encoding
+from app.utils.responses import RESPONSE_MODES, build_result_response
+from app.utils.metrics import metrics
+from app.utils.proxy import make_proxy
+from app.utils.worker_pool import worker_pool, process_mode
+from app.utils.deadline import (
+        Deadline, DeadlineExceeded, DEADLINE_HEADER, parse_timeout, bind_deadline, reset_deadline,
+        current_deadline, check_deadline, call_before_deadline
+    )
+from app.utils.scheduler import scheduler, megapixels
+from app.utils.single_flight import single_flight, request_key, COALESCE_REQUESTS
+from app.utils.prescreen import prescreen as prescreen_image, prescreen_enabled
+from app.utils.result_records import (
+    ResultRecorder, RESULT_RECORDS, RECORD_ID_RE, decode_record,
+    bind_record, reset_record, claim_record_id, used_record_id
+)
+from app.utils.file_serving import resolve_output_path, serve_file, ETagCache, GENERATED_FILENAME_RE
+from app.utils.request_logging import (
+        configure_logging, shutdown_logging, bind_request, reset_request, current_request_id,
+        get_logger, elapsed_ms
+    )
 
 from app.models.schemas import (
         OCRResponse, OCRRequest, FaceQualityResponse, CardDetectionResponse,
         PerspectiveTransformRequest, PerspectiveResponse, Point, Optional, List,
-        TextLine, TextElement, ImageDimensions
+        TextLine, TextElement, ImageDimensions, CardOCRResult, CardOCRResponse,
+        OCRSearchResponse, StoredOCRDocument
     )
 
 
+log = get_logger(__name__)
+
 OUTPUT_FOLDER = "output"
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
+output_etags = ETagCache()
+result_recorder = ResultRecorder(OUTPUT_FOLDER)
+
 STATIC_FOLDER = "static"
 os.makedirs(STATIC_FOLDER, exist_ok=True)
 
+# Scheduler cost keys whose runs feed the auto recognition level
+OCR_ENDPOINTS = ("ocr", "card_ocr")
+
 app = FastAPI(
     title="macOS Vision API",
     description="API for OCR, face quality detection, card detection, and perspective transformation using macOS Vision Framework",
@@ -50,6 +90,49 @@ app.add_middleware(
 app.mount("/static", StaticFiles(directory=STATIC_FOLDER), name="static")
 
 
+@app.on_event("startup")
+async def start_logging():
+    configure_logging()
+    result_recorder.start()
+
+@app.on_event("shutdown")
+async def stop_logging():
+    worker_pool.shutdown(wait=False)
+    result_recorder.close()
+    shutdown_logging()
+
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    tokens = bind_request(request.headers.get("x-request-id"))
+    timeout = parse_timeout(request.headers.get(DEADLINE_HEADER) or request.query_params.get("timeout"))
+    deadline_token = bind_deadline(Deadline.after(timeout))
+    record_token = bind_record()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = current_request_id()
+        record_id = used_record_id()
+        if record_id is not None:
+            response.headers["X-Record-ID"] = record_id
+        log.info("request_completed", method=request.method, path=request.url.path,
+                 status=response.status_code, duration_ms=elapsed_ms(start), record_id=record_id)
+        return response
+    finally:
+        reset_record(record_token)
+        reset_deadline(deadline_token)
+        reset_request(tokens)
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    metrics.increment("deadline_exceeded", path=request.url.path, stage=exc.stage, reason=exc.reason)
+    log.info("deadline_exceeded", path=request.url.path, stage=exc.stage, reason=exc.reason)
+    # 499 is the de facto status for a client that closed the connection
+    status_code = 499 if exc.reason == "client_disconnected" else 504
+    return JSONResponse(status_code=status_code, content={"detail": {
+        "error": "deadline_exceeded", "stage": exc.stage, "reason": exc.reason
+    }})
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint for container orchestration"""
@@ -60,41 +143,280 @@ async def root():
     """Root endpoint to check if API is running"""
     return FileResponse(os.path.join(STATIC_FOLDER, "index.html"))
 
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
 @app.get("/output/{filename}")
-async def get_output_file(filename: str):
-    file_path = os.path.join(OUTPUT_FOLDER, filename)
-    if not os.path.exists(file_path):
+async def get_output_file(filename: str, request: Request):
+    file_path = resolve_output_path(OUTPUT_FOLDER, filename)
+    if file_path is None:
         raise HTTPException(status_code=404, detail="File not found")
     
-    return FileResponse(file_path)
+    stat_result = os.stat(file_path)
+    etag = await run_in_threadpool(output_etags.get, file_path, stat_result)
+    
+    return serve_file(
+        file_path, etag, stat_result,
+        immutable=bool(GENERATED_FILENAME_RE.match(filename)),
+        if_none_match=request.headers.get("if-none-match"),
+        range_header=request.headers.get("range"),
+        if_range=request.headers.get("if-range")
+    )
+
+def _overlay_path(image_filename: str) -> str:
+    return os.path.join(OUTPUT_FOLDER, f"{os.path.splitext(image_filename)[0]}.overlay.json")
+
+def _save_overlay(image_filename: str, overlay: Dict, rendered: bool) -> None:
+    with open(_overlay_path(image_filename), "w", encoding="utf-8") as f:
+        json.dump({**overlay, "rendered": rendered}, f, ensure_ascii=False, separators=(",", ":"))
+
+def _resolve_output_format(request: Request, output_format: Optional[str]) -> str:
+    try:
+        return negotiate_output_format(output_format, request.headers.get("accept"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _prescreen(image: Image.Image, endpoint: str, requested: Optional[bool], data: Optional[bytes] = None) -> None:
+    if not prescreen_enabled(requested):
+        return
+    
+    result = prescreen_image(image, endpoint, data=data)
+    metrics.observe("prescreen_seconds", result["processing_time"], endpoint=endpoint)
+    if result["passed"]:
+        return
+    
+    for reason in result["reasons"]:
+        metrics.increment("prescreen_rejected", endpoint=endpoint, reason=reason["code"])
+    log.info("image_rejected", endpoint=endpoint, reasons=[r["code"] for r in result["reasons"]],
+             metrics=result["metrics"])
+    raise HTTPException(status_code=422, detail={
+        "error": "image_rejected",
+        "reasons": result["reasons"],
+        "metrics": result["metrics"],
+    })
+
+async def _run_engine(fn, image: Image.Image, *args, **kwargs):
+    """
+    Runs an engine function in the worker pool when WORKER_MODE=process,
+    otherwise on the threadpool so the event loop keeps serving the
+    scheduler and disconnect checks while Vision runs.
+    """
+    if process_mode():
+        return await worker_pool.run(fn, image, *args, **kwargs)
+    return await run_in_threadpool(call_before_deadline, fn, image, *args, **kwargs)
+
+async def _run_scheduled(cost_key: Tuple[str, Optional[str]], fn, image: Image.Image, *args, **kwargs):
+    """
+    Waits for the cost-aware scheduler to admit the run, cheapest expected
+    jobs first. OCR runs are counted by the level selector here, once per
+    engine run however many coalesced requests share it.
+    """
+    endpoint, level = cost_key
+    if endpoint not in OCR_ENDPOINTS:
+        async with scheduler.slot(cost_key, megapixels(*image.size)):
+            return await _run_engine(fn, image, *args, **kwargs)
+    
+    with level_selector.track(level):
+        async with scheduler.slot(cost_key, megapixels(*image.size)):
+            run_start = time.perf_counter()
+            result = await _run_engine(fn, image, *args, **kwargs)
+    # Run time only: the selector adds the queue from in-flight work itself
+    level_selector.observe(level, time.perf_counter() - run_start)
+    return result
+
+async def _run_coalesced(cost_key: Tuple[str, Optional[str]], image_data: bytes, fn, image: Image.Image,
+                         *args, finish: Optional[Callable[[Dict], Awaitable[None]]] = None, **kwargs):
+    """
+    Shares one engine run between concurrent requests with the same upload
+    and parameters. ``finish`` runs once on the result before it is shared.
+    """
+    endpoint = cost_key[0]
+    
+    async def run():
+        result = await _run_scheduled(cost_key, fn, image, *args, **kwargs)
+        if finish is not None:
+            await finish(result)
+        return result
+    
+    if not COALESCE_REQUESTS:
+        return await run()
+    
+    key = request_key(endpoint, image_data, args=args, **kwargs)
+    return await single_flight.run(key, run, endpoint=endpoint)
+
+def _resolve_recognition_level(recognition_level: str) -> str:
+    if recognition_level != AUTO_LEVEL:
+        return effective_level(recognition_level)
+    
+    level = level_selector.choose()
+    metrics.increment("ocr_auto_level", level=level)
+    return level
+
+def _watch_client(request: Request) -> None:
+    """Cancels the request's deadline when the client disconnects."""
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.watch(request.is_disconnected)
+
+async def _store_ocr_result(image_data: bytes, languages: List[str], level: str, ocr_result: Dict) -> None:
+    """
+    Indexes the result in the OCR result store when one is configured and
+    sets ``document_key`` to its key, or None if nothing was stored.
+    """
+    ocr_result["document_key"] = None
+    store = get_result_store()
+    if store is None or ocr_result.get("error"):
+        return
+    
+    key = hashlib.sha256(image_data).hexdigest()
+    try:
+        await run_in_threadpool(store.save, key, ocr_result, current_request_id(), languages, level)
+    except Exception as e:
+        log.error("ocr_result_store_failed", error=str(e))
+        return
+    ocr_result["document_key"] = key
+
+def _require_result_store():
+    store = get_result_store()
+    if store is None:
+        raise HTTPException(status_code=503, detail="OCR result store is not enabled (set OCR_RESULT_STORE)")
+    return store
+
+def _record_result(endpoint: str, response) -> None:
+    """Queues the response as a compressed record for GET /results/{id}, id sent back as X-Record-ID."""
+    if not RESULT_RECORDS:
+        return
+    record_id = claim_record_id()
+    result_recorder.submit(record_id, {
+        "id": record_id,
+        "endpoint": endpoint,
+        "created_at": time.time(),
+        "result": jsonable_encoder(response),
+    })
+
+def _encode_output(image: Image.Image, prefix: str, output_format: str, quality: Optional[int] = None) -> Tuple[bytes, str]:
+    data, encode_seconds = encode_image(image, output_format, quality)
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"{prefix}_{timestamp}_{uuid.uuid4().hex[:8]}.{output_extension(output_format)}"
+    
+    metrics.observe("output_encode_seconds", encode_seconds, endpoint=prefix, format=output_format)
+    metrics.observe("output_bytes", len(data), endpoint=prefix, format=output_format)
+    return data, filename
+
+def _save_output(image: Image.Image, prefix: str, output_format: str, quality: Optional[int] = None) -> str:
+    data, filename = _encode_output(image, prefix, output_format, quality)
+    with open(os.path.join(OUTPUT_FOLDER, filename), "wb") as f:
+        f.write(data)
+    return filename
+
+def _check_response_mode(response_mode: str) -> None:
+    if response_mode not in RESPONSE_MODES:
+        raise HTTPException(status_code=400, detail=f"response_mode must be one of: {', '.join(RESPONSE_MODES)}")
+
+def _result_response(response_mode: str, response, data: bytes, filename: str, output_format: str) -> Response:
+    """Streams the image in the body instead of writing it to /output."""
+    return build_result_response(response_mode, data, output_media_type(output_format),
+                                 jsonable_encoder(response), filename)
+
+def _check_overlay_format(overlay_format: Optional[str]) -> None:
+    if overlay_format is not None and overlay_format not in OVERLAY_FORMATS:
+        raise HTTPException(status_code=400, detail=f"overlay must be one of: {', '.join(OVERLAY_FORMATS)}")
+
+@app.get("/results/{record_id}")
+async def get_result_record(record_id: str, request: Request):
+    """The saved result of an earlier request, by the X-Record-ID it was returned with."""
+    if not RECORD_ID_RE.match(record_id):
+        raise HTTPException(status_code=404, detail="Result not found")
+    
+    pending = result_recorder.get(record_id)
+    if pending is not None:
+        return JSONResponse(content=pending)
+    
+    data = await run_in_threadpool(result_recorder.read, record_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Result not found")
+    if accepts_encoding(request.headers.get("accept-encoding"), "gzip"):
+        # Records are stored gzipped, so they can go out as they are
+        return Response(content=data, media_type="application/json", headers={"Content-Encoding": "gzip"})
+    return JSONResponse(content=decode_record(data))
+
+@app.get("/render/{filename}")
+async def render_output_file(filename: str, format: str = Query("png")):
+    if format not in ("png",) + OVERLAY_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be one of: png, json, svg")
+    
+    image_path = resolve_output_path(OUTPUT_FOLDER, filename)
+    overlay_path = _overlay_path(filename)
+    if image_path is None or not os.path.exists(overlay_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    with open(overlay_path, encoding="utf-8") as f:
+        overlay = json.load(f)
+    rendered = overlay.pop("rendered", False)
+    
+    if format == "json":
+        return JSONResponse(content=overlay)
+    if format == "svg":
+        return Response(content=format_overlay(overlay, "svg"), media_type="image/svg+xml")
+    
+    if rendered and image_path.lower().endswith(".png"):
+        return FileResponse(image_path)
+    
+    try:
+        with Image.open(image_path) as image:
+            # A rendered webp/jpg output already carries the overlay; it only needs re-encoding
+            rendered_image = image.convert("RGB") if rendered else render_overlay(image.convert("RGB"), overlay)
+        
+        data, _ = encode_image(rendered_image, "png")
+        return Response(content=data, media_type="image/png")
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error rendering visualization: {str(e)}")
 
 @app.post("/ocr", response_model=OCRResponse)
 async def ocr_endpoint(
+    request: Request,
     file: UploadFile = File(...),
     languages: str = Form("th-TH,en-US"),  
     recognition_level: str = Form("accurate"),
-    save_visualization: bool = Form(False)  
+    save_visualization: bool = Form(False),
+    overlay: Optional[str] = Form(None),
+    output_format: Optional[str] = Form(None),
+    quality: Optional[int] = Form(None),
+    prescreen: Optional[bool] = Form(None),
+    response_mode: str = Form("json")
 ):  
+    _check_overlay_format(overlay)
+    _check_response_mode(response_mode)
+    output_format = _resolve_output_format(request, output_format)
     try:
         image_data = await file.read()
+        _watch_client(request)
         image = Image.open(io.BytesIO(image_data))
+        _prescreen(image, "ocr", prescreen, image_data)
         
         processed_image = convert_to_supported_format(image)
+        check_deadline("decode")
         
         language_list = [lang.strip() for lang in languages.split(",")]
+        level = _resolve_recognition_level(recognition_level)
         
-        ocr_result = perform_ocr(processed_image, language_list, recognition_level)
+        ocr_result = await _run_coalesced(("ocr", level), image_data, perform_ocr, processed_image, language_list,
+                                          level, visualize=save_visualization and overlay is None,
+                                          finish=functools.partial(_store_ocr_result, image_data, language_list, level))
+        check_deadline("recognition")
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"ocr_{timestamp}_{uuid.uuid4().hex[:8]}.png"
-        output_path = os.path.join(OUTPUT_FOLDER, filename)
-        
-        if save_visualization and "visualization_image" in ocr_result:
-            ocr_result["visualization_image"].save(output_path)
+        rendered = save_visualization and ocr_result.get("visualization_image") is not None
+        output_image = ocr_result["visualization_image"] if rendered else processed_image
+        if response_mode == "json":
+            filename = _save_output(output_image, "ocr", output_format, quality)
+            _save_overlay(filename, ocr_result["overlay"], rendered)
+            ocr_result["output_path"] = f"/output/{filename}"
         else:
-            processed_image.save(output_path)
-        
-        ocr_result["output_path"] = f"/output/{filename}"
+            output_data, filename = _encode_output(output_image, "ocr", output_format, quality)
+            ocr_result["output_path"] = ""
         
         if "visualization_image" in ocr_result:
             del ocr_result["visualization_image"]
@@ -114,8 +436,9 @@ async def ocr_endpoint(
                 position=line["position"]
             )
         
-        return OCRResponse(
+        response = OCRResponse(
             document_type=ocr_result["document_type"],
+            document_scores=ocr_result.get("document_scores", {}),
             recognized_text=ocr_result["recognized_text"],
             confidence=ocr_result["confidence"],
             text_lines=text_lines,
@@ -124,36 +447,77 @@ async def ocr_endpoint(
             rack_cooling_rate=ocr_result["rack_cooling_rate"],
             processing_time=ocr_result["processing_time"],
             text_object_count=ocr_result["text_object_count"],
-            output_path=ocr_result["output_path"]
+            recognition_level=level,
+            document_key=ocr_result["document_key"],
+            output_path=ocr_result["output_path"],
+            overlay=format_overlay(ocr_result["overlay"], overlay) if overlay else None
         )
+        _record_result("ocr", response)
         
+        if response_mode != "json":
+            return _result_response(response_mode, response, output_data, filename, output_format)
+        return response
+        
+    except (HTTPException, DeadlineExceeded):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing OCR: {str(e)}")
 
+@app.get("/ocr/search", response_model=OCRSearchResponse)
+async def ocr_search_endpoint(q: str = Query(..., min_length=1), limit: int = Query(20, ge=1, le=100)):
+    """Full-text search over stored OCR results."""
+    store = _require_result_store()
+    start = time.perf_counter()
+    results = await run_in_threadpool(store.search, q, limit)
+    return OCRSearchResponse(query=q, count=len(results), results=results, query_time_ms=elapsed_ms(start))
+
+@app.get("/ocr/documents/{key}", response_model=StoredOCRDocument)
+async def ocr_document_endpoint(key: str):
+    """A stored OCR result by content hash (SHA-256 of the upload), as returned in ``document_key``."""
+    store = _require_result_store()
+    document = await run_in_threadpool(store.get, key)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    return document
+
 @app.post("/face-quality", response_model=FaceQualityResponse)
 async def face_quality_endpoint(
+    request: Request,
     file: UploadFile = File(...),
-    save_visualization: bool = Form(True) 
+    save_visualization: bool = Form(True),
+    landmarks: bool = Form(False),
+    overlay: Optional[str] = Form(None),
+    output_format: Optional[str] = Form(None),
+    quality: Optional[int] = Form(None),
+    prescreen: Optional[bool] = Form(None),
+    response_mode: str = Form("json")
 ):
+    _check_overlay_format(overlay)
+    _check_response_mode(response_mode)
+    output_format = _resolve_output_format(request, output_format)
     
     try:
         image_data = await file.read()
+        _watch_client(request)
         image = Image.open(io.BytesIO(image_data))
+        _prescreen(image, "face", prescreen, image_data)
         
         processed_image = convert_to_supported_format(image)
-        
-        face_result = detect_face_quality(processed_image)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"face_{timestamp}_{uuid.uuid4().hex[:8]}.png"
-        output_path = os.path.join(OUTPUT_FOLDER, filename)
-        
-        if save_visualization and "output_image" in face_result:
-            face_result["output_image"].save(output_path)
+        check_deadline("decode")
+        
+        face_result = await _run_coalesced(("face", None), image_data, detect_face_quality, processed_image,
+                                           visualize=save_visualization and overlay is None, landmarks=landmarks)
+        check_deadline("recognition")
+        
+        rendered = save_visualization and face_result.get("output_image") is not None
+        output_image = face_result["output_image"] if rendered else processed_image
+        if response_mode == "json":
+            filename = _save_output(output_image, "face", output_format, quality)
+            _save_overlay(filename, face_result["overlay"], rendered)
+            face_result["output_path"] = f"/output/{filename}"
         else:
-            processed_image.save(output_path)
-        
-        face_result["output_path"] = f"/output/{filename}"
+            output_data, filename = _encode_output(output_image, "face", output_format, quality)
+            face_result["output_path"] = ""
         
         if "output_image" in face_result:
             del face_result["output_image"]
@@ -163,6 +527,7 @@ async def face_quality_endpoint(
             face_count=face_result.get("face_count", 0),
             quality_score=face_result.get("quality_score"),
             position=face_result.get("position"),
+            faces=face_result.get("faces"),
             dimensions=ImageDimensions(
                 width=face_result["dimensions"]["width"],
                 height=face_result["dimensions"]["height"],
@@ -171,38 +536,109 @@ async def face_quality_endpoint(
             fast_rate=face_result.get("fast_rate"),
             rack_cooling_rate=face_result.get("rack_cooling_rate"),
             processing_time=face_result.get("processing_time", 0.0),
-            output_path=face_result["output_path"]
+            output_path=face_result["output_path"],
+            overlay=format_overlay(face_result["overlay"], overlay) if overlay else None
         )
+        _record_result("face", response)
         
+        if response_mode != "json":
+            return _result_response(response_mode, response, output_data, filename, output_format)
         return response
         
+    except (HTTPException, DeadlineExceeded):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error checking face quality: {str(e)}")
 
+def _process_stream_frame(frame_data: bytes) -> Dict:
+    image = Image.open(io.BytesIO(frame_data))
+    processed_image = convert_to_supported_format(image)
+    return compact_face_result(detect_face_quality(processed_image))
+
+@app.websocket("/ws/face-quality")
+async def face_quality_stream(websocket: WebSocket):
+    await websocket.accept()
+
+    slot = LatestFrameSlot()
+    stats = LatencyStats()
+
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    slot.put(message["bytes"])
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            slot.close()
+
+    receiver = asyncio.create_task(receive_frames())
+
+    try:
+        while True:
+            frame = await slot.get()
+            if frame is None:
+                break
+
+            frame_id, frame_data, received_at = frame
+            try:
+                result = await run_in_threadpool(_process_stream_frame, frame_data)
+            except Exception as e:
+                result = {"has_face": False, "face_count": 0, "error": f"Error checking face quality: {str(e)}"}
+
+            stats.add(time.perf_counter() - received_at)
+
+            await websocket.send_json({
+                "frame": frame_id,
+                **result,
+                "dropped_frames": slot.dropped,
+                "latency": stats.summary()
+            })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+
 @app.post("/card-detect", response_model=CardDetectionResponse)
 async def card_detection_endpoint(
+    request: Request,
     file: UploadFile = File(...),
-    save_visualization: bool = Form(True)  
+    save_visualization: bool = Form(True),
+    overlay: Optional[str] = Form(None),
+    output_format: Optional[str] = Form(None),
+    quality: Optional[int] = Form(None),
+    prescreen: Optional[bool] = Form(None),
+    response_mode: str = Form("json")
 ):
+    _check_overlay_format(overlay)
+    _check_response_mode(response_mode)
+    output_format = _resolve_output_format(request, output_format)
     
     try:
         image_data = await file.read()
+        _watch_client(request)
         image = Image.open(io.BytesIO(image_data))
+        _prescreen(image, "card", prescreen, image_data)
         
         processed_image = convert_to_supported_format(image)
-        
-        card_result = detect_card(processed_image)
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"card_{timestamp}_{uuid.uuid4().hex[:8]}.png"
-        output_path = os.path.join(OUTPUT_FOLDER, filename)
-        
-        if save_visualization and "output_image" in card_result:
-            card_result["output_image"].save(output_path)
+        check_deadline("decode")
+        
+        card_result = await _run_coalesced(("card", None), image_data, detect_card, processed_image,
+                                           visualize=save_visualization and overlay is None)
+        check_deadline("recognition")
+        
+        rendered = save_visualization and card_result.get("output_image") is not None
+        output_image = card_result["output_image"] if rendered else processed_image
+        if response_mode == "json":
+            filename = _save_output(output_image, "card", output_format, quality)
+            _save_overlay(filename, card_result["overlay"], rendered)
+            card_result["output_path"] = f"/output/{filename}"
         else:
-            processed_image.save(output_path)
-        
-        card_result["output_path"] = f"/output/{filename}"
+            output_data, filename = _encode_output(output_image, "card", output_format, quality)
+            card_result["output_path"] = ""
         
         response = CardDetectionResponse(
             has_card=card_result.get("has_card", False),
@@ -218,96 +654,257 @@ async def card_detection_endpoint(
             fast_rate=card_result.get("fast_rate"),
             rack_cooling_rate=card_result.get("rack_cooling_rate"),
             processing_time=card_result.get("processing_time", 0.0),
-            output_path=card_result["output_path"]
+            output_path=card_result["output_path"],
+            overlay=format_overlay(card_result["overlay"], overlay) if overlay else None
         )
+        _record_result("card", response)
         
+        if response_mode != "json":
+            return _result_response(response_mode, response, output_data, filename, output_format)
         return response
         
+    except (HTTPException, DeadlineExceeded):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error detecting card: {str(e)}")
 
+def _parse_points(points: str) -> List[Dict]:
+    try:
+        points_data = json.loads(points)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON format for points")
+    if not isinstance(points_data, list) or len(points_data) != 4:
+        raise HTTPException(status_code=400, detail="Exactly 4 points must be provided")
+    return points_data
+
+def _points_to_vectors(points_data: List[Dict]) -> Tuple:
+    try:
+        from Quartz import CIVector
+        return tuple(CIVector.vectorWithX_Y_(float(point["x"]), float(point["y"])) for point in points_data)
+    except Exception as e:
+        log.error("vector_creation_failed", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Error creating vectors: {str(e)}")
+
+def _extract_point_coords(point) -> Dict[str, float]:
+    try:
+        # Try CIVector X() and Y() methods first
+        return {"x": float(point.X()), "y": float(point.Y())}
+    except AttributeError:
+        try:
+            # Try lowercase x,y properties used in some frameworks
+            return {"x": float(point.x), "y": float(point.y)}
+        except AttributeError:
+            try:
+                # Try lowercase x(),y() methods
+                return {"x": float(point.x()), "y": float(point.y())}
+            except AttributeError:
+                # Last resort: if we have a tuple
+                if isinstance(point, tuple) and len(point) >= 2:
+                    return {"x": float(point[0]), "y": float(point[1])}
+                raise ValueError(f"Cannot extract coordinates from {type(point)}")
+
+def _detect_document_corners(processed_image: Image.Image, ci_image=None):
+    """Finds the document on a downscaled proxy and returns corners in full-resolution pixels."""
+    proxy = make_proxy(processed_image)
+    if proxy.is_downscaled or ci_image is None:
+        ci_image = pil_to_ci_image(proxy.image)
+    return detect_document_edges(ci_image, full_size=(proxy.full_width, proxy.full_height))
+
+def _correct_and_enhance(ci_image, corners: Tuple, output_width: Optional[int], output_height: Optional[int]) -> Image.Image:
+    pipeline = PerspectivePipeline(ci_image, corners, output_width, output_height)
+    
+    try:
+        graph = pipeline.build()
+    except Exception as e:
+        log.error("perspective_correction_failed", error=str(e))
+        raise HTTPException(status_code=500, detail=f"ไม่สามารถปรับเปอร์สเปคทีฟ: {str(e)}")
+    
+    try:
+        return pipeline.render(graph)
+    except Exception as e:
+        log.error("ci_to_pil_failed", error=str(e))
+        raise HTTPException(status_code=500, detail=f"ไม่สามารถแปลงภาพ: {str(e)}")
+
+def _perspective_response(result_image: Image.Image, start_time: float, output_format: str, quality: Optional[int],
+                          response_mode: str, points: Optional[List[Dict]] = None):
+    if response_mode == "json":
+        filename = _save_output(result_image, "perspective", output_format, quality)
+        output_path = f"/output/{filename}"
+    else:
+        output_data, filename = _encode_output(result_image, "perspective", output_format, quality)
+        output_path = ""
+    
+    img_dimensions = get_image_dimensions(result_image)
+    fast_rate = calculate_fast_rate(img_dimensions["width"], img_dimensions["height"])
+    rack_cooling_rate = calculate_rack_cooling_rate(img_dimensions["width"], img_dimensions["height"])
+    
+    response = PerspectiveResponse(
+        format=output_format,
+        width=img_dimensions["width"],
+        height=img_dimensions["height"],
+        dimensions=ImageDimensions(
+            width=img_dimensions["width"],
+            height=img_dimensions["height"],
+            unit="pixel"
+        ),
+        fast_rate=fast_rate,
+        rack_cooling_rate=rack_cooling_rate,
+        processing_time=time.time() - start_time,
+        output_path=output_path,
+        points=[Point(**point) for point in points] if points else None
+    )
+    _record_result("perspective", response)
+    
+    if response_mode != "json":
+        return _result_response(response_mode, response, output_data, filename, output_format)
+    return response
+
+MAX_CARDS_PER_SHEET = 8
+
+@app.post("/card-detect/ocr", response_model=CardOCRResponse)
+async def card_ocr_endpoint(
+    request: Request,
+    file: UploadFile = File(...),
+    languages: str = Form("th-TH,en-US"),
+    recognition_level: str = Form("accurate"),
+    max_cards: int = Form(4),
+    save_crops: bool = Form(False),
+    output_format: Optional[str] = Form(None),
+    quality: Optional[int] = Form(None),
+    prescreen: Optional[bool] = Form(None)
+):
+    """Detects every card on a sheet, rectifies each one and OCRs the crops in parallel."""
+    if not 1 <= max_cards <= MAX_CARDS_PER_SHEET:
+        raise HTTPException(status_code=400, detail=f"max_cards must be between 1 and {MAX_CARDS_PER_SHEET}")
+    output_format = _resolve_output_format(request, output_format)
+    
+    try:
+        image_data = await file.read()
+        _watch_client(request)
+        image = Image.open(io.BytesIO(image_data))
+        _prescreen(image, "card", prescreen, image_data)
+        
+        processed_image = convert_to_supported_format(image)
+        check_deadline("decode")
+        
+        language_list = [lang.strip() for lang in languages.split(",")]
+        level = _resolve_recognition_level(recognition_level)
+        
+        sheet = await _run_scheduled(("card_ocr", level), read_cards, processed_image, language_list, level, max_cards)
+        check_deadline("recognition")
+        
+        cards = []
+        for card in sheet["cards"]:
+            crop = card.pop("crop")
+            if save_crops:
+                check_deadline("save")
+                card["crop_path"] = f"/output/{_save_output(crop, 'card', output_format, quality)}"
+            card["text_lines"] = {key: TextLine(**line) for key, line in card["text_lines"].items()}
+            cards.append(CardOCRResult(**card))
+        
+        response = CardOCRResponse(
+            card_count=sheet["card_count"],
+            cards=cards,
+            dimensions=ImageDimensions(**sheet["dimensions"]),
+            detection_time=sheet["detection_time"],
+            processing_time=sheet["processing_time"],
+            recognition_level=level
+        )
+        _record_result("card_ocr", response)
+        return response
+    
+    except (HTTPException, DeadlineExceeded):
+        raise
+    except Exception as e:
+        log.error("card_ocr_failed", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Error reading cards: {str(e)}")
+
 @app.post("/perspective", response_model=PerspectiveResponse)
 async def perspective_endpoint(
+    request: Request,
     file: UploadFile = File(...),
     points: str = Form(...),  
     output_width: Optional[int] = Form(None),
-    output_height: Optional[int] = Form(None)
+    output_height: Optional[int] = Form(None),
+    output_format: Optional[str] = Form(None),
+    quality: Optional[int] = Form(None),
+    response_mode: str = Form("json")
 ):
+    _check_response_mode(response_mode)
+    output_format = _resolve_output_format(request, output_format)
+    points_data = _parse_points(points)
     
     try:
+        start_time = time.time()
         image_data = await file.read()
+        _watch_client(request)
         image = Image.open(io.BytesIO(image_data))
         
         processed_image = convert_to_supported_format(image)
-        
-        try:
-            points_data = json.loads(points)
-            if len(points_data) != 4:
-                raise HTTPException(status_code=400, detail="Exactly 4 points must be provided")
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=400, detail="Invalid JSON format for points")
+        check_deadline("decode")
         
         ci_image = pil_to_ci_image(processed_image)
         
-        try:
-            from Quartz import CIVector
-            top_left = CIVector.vectorWithX_Y_(float(points_data[0]["x"]), float(points_data[0]["y"]))
-            top_right = CIVector.vectorWithX_Y_(float(points_data[1]["x"]), float(points_data[1]["y"]))
-            bottom_right = CIVector.vectorWithX_Y_(float(points_data[2]["x"]), float(points_data[2]["y"]))
-            bottom_left = CIVector.vectorWithX_Y_(float(points_data[3]["x"]), float(points_data[3]["y"]))
-        except Exception as e:
-            print(f"Warning: CIVector creation failed: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error creating vectors: {str(e)}")
+        corners = _points_to_vectors(points_data)
+        check_deadline("render")
+        result_image = _correct_and_enhance(ci_image, corners, output_width, output_height)
+        check_deadline("save")
         
-        try:
-            corrected_ci_image = correct_perspective(ci_image, top_left, top_right, bottom_right, bottom_left)
-        except Exception as e:
-            print(f"Error in perspective correction function: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"ไม่สามารถปรับเปอร์สเปคทีฟ: {str(e)}")
-        
-        try:
-            enhanced_ci_image = enhance_image(corrected_ci_image)
-        except Exception as e:
-            print(f"Error enhancing image: {str(e)}")
-            enhanced_ci_image = corrected_ci_image  
+        return _perspective_response(result_image, start_time, output_format, quality, response_mode)
         
-        try:
-            result_image = ci_to_pil_image(enhanced_ci_image)
-        except Exception as e:
-            print(f"Error converting CIImage to PIL: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"ไม่สามารถแปลงภาพ: {str(e)}")
+    except (HTTPException, DeadlineExceeded):
+        raise
+    except Exception as e:
+        log.error("perspective_failed", error=str(e))
+        raise HTTPException(status_code=500, detail=f"Error in perspective correction: {str(e)}")
+
+@app.post("/perspective/auto", response_model=PerspectiveResponse)
+async def perspective_auto_endpoint(
+    request: Request,
+    file: UploadFile = File(...),
+    points: Optional[str] = Form(None),
+    output_width: Optional[int] = Form(None),
+    output_height: Optional[int] = Form(None),
+    output_format: Optional[str] = Form(None),
+    quality: Optional[int] = Form(None),
+    response_mode: str = Form("json")
+):
+    """Detects the document edges, corrects and enhances one upload; ``points`` overrides detection."""
+    _check_response_mode(response_mode)
+    output_format = _resolve_output_format(request, output_format)
+    points_data = _parse_points(points) if points else None
+    
+    try:
+        start_time = time.time()
+        image_data = await file.read()
+        _watch_client(request)
+        image = Image.open(io.BytesIO(image_data))
         
-        if output_width and output_height:
-            result_image = result_image.resize((output_width, output_height), Image.LANCZOS)
+        processed_image = convert_to_supported_format(image)
+        check_deadline("decode")
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"perspective_{timestamp}_{uuid.uuid4().hex[:8]}.png"
-        output_path = os.path.join(OUTPUT_FOLDER, filename)
-        result_image.save(output_path)
+        ci_image = pil_to_ci_image(processed_image)
         
-        img_dimensions = get_image_dimensions(result_image)
-        fast_rate = calculate_fast_rate(img_dimensions["width"], img_dimensions["height"])
-        rack_cooling_rate = calculate_rack_cooling_rate(img_dimensions["width"], img_dimensions["height"])
+        if points_data is None:
+            corners = _detect_document_corners(processed_image, ci_image)
+            check_deadline("recognition")
+            try:
+                points_data = [_extract_point_coords(point) for point in corners]
+            except ValueError as e:
+                log.warning("point_extraction_failed", error=str(e))
+        else:
+            corners = _points_to_vectors(points_data)
         
-        response = PerspectiveResponse(
-            format="png",
-            width=img_dimensions["width"],
-            height=img_dimensions["height"],
-            dimensions=ImageDimensions(
-                width=img_dimensions["width"],
-                height=img_dimensions["height"],
-                unit="pixel"
-            ),
-            fast_rate=fast_rate,
-            rack_cooling_rate=rack_cooling_rate,
-            processing_time=0.0,  
-            output_path=f"/output/{filename}"
-        )
+        check_deadline("render")
+        result_image = _correct_and_enhance(ci_image, corners, output_width, output_height)
+        check_deadline("save")
         
-        return response
+        return _perspective_response(result_image, start_time, output_format, quality, response_mode, points_data)
         
+    except (HTTPException, DeadlineExceeded):
+        raise
     except Exception as e:
-        print(f"Error in perspective correction: {str(e)}")
+        log.error("perspective_auto_failed", error=str(e))
         raise HTTPException(status_code=500, detail=f"Error in perspective correction: {str(e)}")
 
 @app.post("/perspective/detect-rectangle", response_model=Dict[str, List[Dict[str, float]]])
@@ -321,40 +918,18 @@ async def detect_rectangle_endpoint(
         
         processed_image = convert_to_supported_format(image)
         
-        ci_image = pil_to_ci_image(processed_image)
-        
         try:
-            top_left, top_right, bottom_right, bottom_left = detect_document_edges(ci_image)
-            
-            points = []
-            
-            def extract_point_coords(point):
-                try:
-                    # Try CIVector X() and Y() methods first
-                    return {"x": float(point.X()), "y": float(point.Y())}
-                except AttributeError:
-                    try:
-                        # Try lowercase x,y properties used in some frameworks
-                        return {"x": float(point.x), "y": float(point.y)}
-                    except AttributeError:
-                        try:
-                            # Try lowercase x(),y() methods
-                            return {"x": float(point.x()), "y": float(point.y())}
-                        except AttributeError:
-                            # Last resort: if we have a tuple
-                            if isinstance(point, tuple) and len(point) >= 2:
-                                return {"x": float(point[0]), "y": float(point[1])}
-                            raise ValueError(f"Cannot extract coordinates from {type(point)}")
+            top_left, top_right, bottom_right, bottom_left = _detect_document_corners(processed_image)
             
             try:
                 points = [
-                    extract_point_coords(top_left),
-                    extract_point_coords(top_right),
-                    extract_point_coords(bottom_right),
-                    extract_point_coords(bottom_left)
+                    _extract_point_coords(top_left),
+                    _extract_point_coords(top_right),
+                    _extract_point_coords(bottom_right),
+                    _extract_point_coords(bottom_left)
                 ]
             except Exception as e:
-                print(f"Error extracting point coordinates: {str(e)}")
+                log.warning("point_extraction_failed", error=str(e))
                 raise ValueError(f"Cannot extract point coordinates: {str(e)}")
             
             return {"points": points}
@@ -370,5 +945,5 @@ async def detect_rectangle_endpoint(
             return {"points": points}
         
     except Exception as e:
-        print(f"Error detecting rectangle: {str(e)}")
+        log.error("detect_rectangle_failed", error=str(e))
         raise HTTPException(status_code=500, detail=f"Error detecting rectangle: {str(e)}")
@@ -29,6 +29,7 @@ class OCRRequest(BaseModel):
 
 class OCRResponse(BaseModel):
     document_type: str
+    document_scores: Dict[str, float] = {}
     recognized_text: str
     confidence: float
     text_lines: Dict[str, TextLine]
@@ -38,17 +39,50 @@ class OCRResponse(BaseModel):
     processing_time: float
     text_object_count: int
     output_path: str
+    overlay: Optional[Any] = None
+    recognition_level: Optional[str] = None
+    document_key: Optional[str] = None
+
+class OCRSearchHit(BaseModel):
+    key: str
+    request_id: Optional[str] = None
+    created_at: float
+    document_type: Optional[str] = None
+    confidence: Optional[float] = None
+    snippet: str
+    rank: float
+
+class OCRSearchResponse(BaseModel):
+    query: str
+    count: int
+    results: List[OCRSearchHit]
+    query_time_ms: float
+
+class StoredOCRDocument(BaseModel):
+    key: str
+    request_id: Optional[str] = None
+    created_at: float
+    document_type: Optional[str] = None
+    confidence: Optional[float] = None
+    recognition_level: Optional[str] = None
+    languages: List[str] = []
+    width: Optional[int] = None
+    height: Optional[int] = None
+    recognized_text: str
+    text_lines: List[TextLine]
 
 class FaceQualityResponse(BaseModel):
     has_face: bool
     face_count: int = 0
     quality_score: Optional[float] = None
     position: Optional[Dict[str, Any]] = None
+    faces: Optional[List[Dict[str, Any]]] = None
     dimensions: Optional[ImageDimensions] = None
     fast_rate: Optional[float] = None
     rack_cooling_rate: Optional[float] = None
     processing_time: float
     output_path: str
+    overlay: Optional[Any] = None
 
 class CardDetectionResponse(BaseModel):
     has_card: bool
@@ -61,6 +95,31 @@ class CardDetectionResponse(BaseModel):
     rack_cooling_rate: Optional[float] = None
     processing_time: float
     output_path: str
+    overlay: Optional[Any] = None
+
+class CardOCRResult(BaseModel):
+    id: str
+    confidence: float
+    position: Dict[str, float]
+    corners: List[Point]
+    crop_width: int
+    crop_height: int
+    crop_path: Optional[str] = None
+    document_type: str
+    document_scores: Dict[str, float] = {}
+    recognized_text: str
+    ocr_confidence: float
+    text_lines: Dict[str, TextLine]
+    text_object_count: int
+    processing_time: float
+
+class CardOCRResponse(BaseModel):
+    card_count: int
+    cards: List[CardOCRResult]
+    dimensions: ImageDimensions
+    detection_time: float
+    processing_time: float
+    recognition_level: Optional[str] = None
 
 class PerspectiveTransformRequest(BaseModel):
     points: List[Point]
@@ -75,4 +134,5 @@ class PerspectiveResponse(BaseModel):
     fast_rate: float
     rack_cooling_rate: float
     processing_time: float
-    output_path: str
\ No newline at end of file
+    output_path: str
+    points: Optional[List[Point]] = None
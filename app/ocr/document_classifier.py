@@ -1,56 +1,108 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Union, Optional
+import json
+import os
 import re
 
-def classify_document_type(text: str, text_elements: List[Dict]) -> str:
- 
-    text = text.lower()
-    
-    # Check for Thai ID card
-    thai_id_patterns = [
-        r"บัตรประจำตัวประชาชน",
-        r"identification card",
-        r"thai national id",
-        r"\d-\d{4}-\d{5}-\d{2}-\d",  # ID format with dashes
-        r"\d{13}"  # 13 consecutive digits
-    ]
-    
-    for pattern in thai_id_patterns:
-        if re.search(pattern, text):
-            return "card_id"
-    
-    # Check for passport
-    passport_patterns = [
-        r"passport",
-        r"หนังสือเดินทาง",
-        r"nationality",
-        r"สัญชาติ"
-    ]
-    
-    for pattern in passport_patterns:
-        if re.search(pattern, text):
-            return "passport"
-    
-    # Check for driving license
-    driving_patterns = [
-        r"driving licence",
-        r"driver('s)? license",
-        r"ใบอนุญาตขับขี่",
-        r"ใบขับขี่"
-    ]
-    
-    for pattern in driving_patterns:
-        if re.search(pattern, text):
-            return "driving_license"
-    
-    # Analyze layout based on text elements
-    if text_elements and len(text_elements) > 5:
-        
-        name_patterns = [r"name", r"ชื่อ", r"นาย", r"นาง", r"นางสาว"]
-        date_patterns = [r"เกิดวันที่", r"date of birth", r"issue", r"วันออกบัตร"]
-        
-        for pattern in name_patterns + date_patterns:
-            for element in text_elements:
-                if re.search(pattern, element["text"].lower()):
-                    return "card_id"  
-    
-    return "unknown"
\ No newline at end of file
+from app.ocr.observations import TextObservations
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "document_rules.json")
+
+
+class DocumentClassifier:
+    """
+    Scores document types with every rule compiled into one alternation.
+
+    The combined pattern finds each position where some rule matches in a
+    single scan of the lowercased text; only at those positions are the
+    individual rules checked, so overlapping matches are all counted. A
+    label's score is the sum of the weights of its distinct matching rules.
+    Layout rules run over the element texts only when no primary rule
+    matched. Patterns are written in lowercase.
+    """
+
+    def __init__(self, rules: Dict[str, Any]):
+        self.labels = list(rules["labels"])
+        self._priority = {label: index for index, label in enumerate(self.labels)}
+
+        self._primary = self._compile(rules["rules"])
+
+        layout = rules.get("layout_rules", {})
+        self._layout = self._compile(layout.get("rules", []))
+        self._layout_min_elements = layout.get("min_elements", 6)
+
+    @classmethod
+    def from_file(cls, path: str) -> "DocumentClassifier":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _compile(rules: List[Dict[str, Any]]):
+        if not rules:
+            return None
+        # Non-capturing branches keep the regex engine's first-character
+        # prefilter, which named groups would disable.
+        combined = re.compile("|".join(f"(?:{rule['pattern']})" for rule in rules))
+        compiled = [(re.compile(rule["pattern"]), rule["label"], float(rule.get("weight", 1.0))) for rule in rules]
+        return combined, compiled
+
+    @staticmethod
+    def _scan(engine, text: str) -> Dict[str, float]:
+        if engine is None or not text:
+            return {}
+
+        combined, compiled = engine
+        remaining = list(range(len(compiled)))
+        matched = []
+
+        match = combined.search(text)
+        while match is not None and remaining:
+            start = match.start()
+            still_remaining = []
+            for index in remaining:
+                if compiled[index][0].match(text, start):
+                    matched.append(index)
+                else:
+                    still_remaining.append(index)
+            remaining = still_remaining
+            match = combined.search(text, start + 1)
+
+        scores: Dict[str, float] = {}
+        for index in matched:
+            _, label, weight = compiled[index]
+            scores[label] = scores.get(label, 0.0) + weight
+        return scores
+
+    def score(self, text: str, text_elements: Union[TextObservations, List[Dict], None] = None) -> Dict[str, float]:
+        scores = self._scan(self._primary, text.lower())
+
+        if not scores and text_elements and len(text_elements) >= self._layout_min_elements:
+            if isinstance(text_elements, TextObservations):
+                element_texts = text_elements.texts
+            else:
+                element_texts = [element["text"] for element in text_elements]
+            scores = self._scan(self._layout, "\n".join(element_texts).lower())
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self._priority.get(item[0], len(self.labels))))
+        return dict(ranked)
+
+    def classify(self, text: str, text_elements: Union[TextObservations, List[Dict], None] = None) -> str:
+        scores = self.score(text, text_elements)
+        return next(iter(scores), "unknown")
+
+
+_default_classifier: Optional[DocumentClassifier] = None
+
+
+def get_document_classifier() -> DocumentClassifier:
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = DocumentClassifier.from_file(os.environ.get("DOCUMENT_RULES_PATH", DEFAULT_RULES_PATH))
+    return _default_classifier
+
+
+def score_document_types(text: str, text_elements: Union[TextObservations, List[Dict]]) -> Dict[str, float]:
+    return get_document_classifier().score(text, text_elements)
+
+
+def classify_document_type(text: str, text_elements: Union[TextObservations, List[Dict]]) -> str:
+    return get_document_classifier().classify(text, text_elements)
@@ -0,0 +1,112 @@
+from typing import Dict, Sequence
+import numpy as np
+
+# Two boxes share a line when their vertical overlap covers at least this
+# fraction of the shorter box.
+LINE_OVERLAP_RATIO = 0.5
+
+# Boxes in the same band are split into separate lines (columns) when the
+# horizontal gap between them exceeds this many line heights.
+COLUMN_GAP_RATIO = 3.0
+
+
+def assign_line_labels(boxes: np.ndarray,
+                       overlap_ratio: float = LINE_OVERLAP_RATIO,
+                       column_gap_ratio: float = COLUMN_GAP_RATIO):
+    """
+    Group (n, 4) boxes of x, y, width, height into lines.
+
+    Returns ``(order, labels)``: ``order`` lists box indices in reading order
+    (top to bottom, then left to right) and ``labels[k]`` is the line number of
+    ``boxes[order[k]]``. Line numbers are consecutive and start at 0.
+    """
+    n = len(boxes)
+    if n == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+    x, y, w, h = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    top = y
+    bottom = y + h
+
+    # Sweep down the page by vertical centre; a new band starts wherever a box
+    # does not overlap enough with the box above it.
+    by_center = np.argsort(y + h / 2.0, kind="stable")
+    sorted_top = top[by_center]
+    sorted_bottom = bottom[by_center]
+    sorted_height = h[by_center]
+
+    overlap = np.minimum(sorted_bottom[1:], sorted_bottom[:-1]) - np.maximum(sorted_top[1:], sorted_top[:-1])
+    min_height = np.minimum(sorted_height[1:], sorted_height[:-1])
+    new_band = overlap < overlap_ratio * min_height
+
+    band = np.empty(n, dtype=np.intp)
+    band[by_center] = np.concatenate(([0], np.cumsum(new_band)))
+
+    # Within each band, walk left to right and break at column gutters.
+    order = np.lexsort((x, band))
+    sorted_band = band[order]
+    sorted_x = x[order]
+    sorted_height = h[order]
+
+    same_band = sorted_band[1:] == sorted_band[:-1]
+    # The running right edge restarts at each band so a wide box from the band
+    # above cannot hide a gutter.
+    band_start = np.flatnonzero(np.concatenate(([True], ~same_band)))
+    sorted_right = _segment_max_accumulate(sorted_x + w[order], band_start)
+
+    gap = sorted_x[1:] - sorted_right[:-1]
+    line_height = np.maximum(sorted_height[1:], sorted_height[:-1])
+    new_line = ~same_band | (gap > column_gap_ratio * line_height)
+
+    labels = np.concatenate(([0], np.cumsum(new_line)))
+    return order, labels
+
+
+def _segment_max_accumulate(values: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    # Running maximum that resets at every index in ``starts``. Offsetting each
+    # segment above the previous one lets a single accumulate do the work.
+    segment = np.zeros(len(values), dtype=np.intp)
+    segment[starts[1:]] = 1
+    segment = np.cumsum(segment)
+
+    span = values.max() - values.min() + 1.0
+    shifted = values - values.min() + segment * span
+    return np.maximum.accumulate(shifted) - segment * span + values.min()
+
+
+def build_text_lines(boxes: np.ndarray, confidences: np.ndarray, texts: Sequence[str],
+                     overlap_ratio: float = LINE_OVERLAP_RATIO,
+                     column_gap_ratio: float = COLUMN_GAP_RATIO) -> Dict[str, Dict]:
+
+    if len(boxes) == 0:
+        return {}
+
+    order, labels = assign_line_labels(boxes, overlap_ratio, column_gap_ratio)
+
+    starts = np.flatnonzero(np.concatenate(([True], labels[1:] != labels[:-1])))
+    ends = np.append(starts[1:], len(order))
+
+    ordered_boxes = boxes[order]
+    left = np.minimum.reduceat(ordered_boxes[:, 0], starts)
+    top = np.minimum.reduceat(ordered_boxes[:, 1], starts)
+    right = np.maximum.reduceat(ordered_boxes[:, 0] + ordered_boxes[:, 2], starts)
+    bottom = np.maximum.reduceat(ordered_boxes[:, 1] + ordered_boxes[:, 3], starts)
+    confidence = np.add.reduceat(np.asarray(confidences, dtype=np.float64)[order], starts) / (ends - starts)
+
+    text_lines = {}
+    for i, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        line_id = f"line_{i+1}"
+
+        text_lines[line_id] = {
+            "id": line_id,
+            "text": " ".join(texts[j] for j in order[start:end].tolist()),
+            "confidence": float(confidence[i]),
+            "position": {
+                "x": float(left[i]),
+                "y": float(top[i]),
+                "width": float(right[i] - left[i]),
+                "height": float(bottom[i] - top[i]),
+            }
+        }
+
+    return text_lines
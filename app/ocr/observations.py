@@ -0,0 +1,72 @@
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+
+class TextObservations:
+    """
+    Struct-of-arrays container for recognized text.
+
+    ``boxes`` is an (n, 4) float64 array of pixel x, y, width, height with a
+    top-left origin, ``confidences`` an (n,) float64 array and ``texts`` a list
+    of strings. Responses are built from it by line grouping, so per-element
+    dicts are never materialized.
+    """
+
+    __slots__ = ("boxes", "confidences", "texts")
+
+    def __init__(self, boxes: np.ndarray, confidences: np.ndarray, texts: List[str]):
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.confidences = np.asarray(confidences, dtype=np.float64).reshape(-1)
+        self.texts = list(texts)
+
+        if not (len(self.boxes) == len(self.confidences) == len(self.texts)):
+            raise ValueError("boxes, confidences and texts must have the same length")
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @classmethod
+    def empty(cls) -> "TextObservations":
+        return cls(np.empty((0, 4)), np.empty(0), [])
+
+    @classmethod
+    def from_normalized(cls, normalized_boxes: np.ndarray, confidences: np.ndarray, texts: List[str],
+                        width: float, height: float) -> "TextObservations":
+        # Vision boxes are normalized with a bottom-left origin
+        normalized_boxes = np.asarray(normalized_boxes, dtype=np.float64).reshape(-1, 4)
+        boxes = np.empty_like(normalized_boxes)
+        boxes[:, 0] = normalized_boxes[:, 0] * width
+        boxes[:, 1] = (1.0 - normalized_boxes[:, 1] - normalized_boxes[:, 3]) * height
+        boxes[:, 2] = normalized_boxes[:, 2] * width
+        boxes[:, 3] = normalized_boxes[:, 3] * height
+        return cls(boxes, confidences, texts)
+
+    @classmethod
+    def from_elements(cls, text_elements: Sequence[Dict[str, Any]]) -> "TextObservations":
+        count = len(text_elements)
+        boxes = np.empty((count, 4), dtype=np.float64)
+        confidences = np.empty(count, dtype=np.float64)
+        texts = []
+        for i, element in enumerate(text_elements):
+            position = element["position"]
+            boxes[i] = (position["x"], position["y"], position["width"], position["height"])
+            confidences[i] = element["confidence"]
+            texts.append(element["text"])
+        return cls(boxes, confidences, texts)
+
+    def mean_confidence(self) -> float:
+        return float(self.confidences.mean()) if len(self) else 0.0
+
+    def joined_text(self, separator: str = "\n") -> str:
+        return separator.join(self.texts)
+
+    def nbytes(self) -> int:
+        return int(self.boxes.nbytes + self.confidences.nbytes + sum(len(text.encode("utf-8")) for text in self.texts))
+
+
+def as_observations(text_elements: Optional[Any]) -> TextObservations:
+    if isinstance(text_elements, TextObservations):
+        return text_elements
+    if not text_elements:
+        return TextObservations.empty()
+    return TextObservations.from_elements(text_elements)
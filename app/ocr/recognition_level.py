@@ -0,0 +1,94 @@
+from contextlib import contextmanager
+from typing import Dict, Iterator
+import os
+import threading
+import time
+
+RECOGNITION_LEVELS = ("fast", "accurate")
+AUTO_LEVEL = "auto"
+
+# Target latency for one OCR request. Under "auto", requests use accurate
+# while the estimated latency stays within this and fast once it would not.
+OCR_LATENCY_SLO_SECONDS = float(os.environ.get("OCR_LATENCY_SLO_SECONDS", "3.0"))
+# How many OCR jobs run side by side, used to turn queue depth into waiting time
+OCR_AUTO_CAPACITY = int(os.environ.get("OCR_AUTO_CAPACITY", "1"))
+# While degraded, one request per this many seconds still runs accurate so
+# its latency estimate follows reality instead of the spike that caused it
+OCR_AUTO_PROBE_SECONDS = float(os.environ.get("OCR_AUTO_PROBE_SECONDS", "30"))
+# Accurate comes back only once the queue wait drops below this share of
+# the headroom the SLO leaves over accurate's own run time, so a queue
+# hovering at the limit does not flip the level per request
+RECOVER_RATIO = 0.7
+EWMA_ALPHA = 0.2
+# Per-level latency estimates until real requests have been measured
+INITIAL_LATENCY = {"fast": 0.3, "accurate": 1.0}
+
+
+def effective_level(recognition_level: str) -> str:
+    """The level Vision actually runs; anything but accurate is fast."""
+    return "accurate" if recognition_level == "accurate" else "fast"
+
+
+class LevelSelector:
+    """
+    Picks fast or accurate for ``auto`` requests from the OCR work in
+    flight and a moving average of each level's latency. The estimate for
+    a new request is the in-flight work spread over ``capacity`` plus its
+    own run time. While degraded, an occasional probe runs at accurate so
+    the estimate can recover after a latency spike.
+    """
+
+    def __init__(self, slo_seconds: float = None, capacity: int = None, probe_seconds: float = None):
+        self.slo_seconds = OCR_LATENCY_SLO_SECONDS if slo_seconds is None else slo_seconds
+        self.capacity = max(1, capacity or OCR_AUTO_CAPACITY)
+        self.probe_seconds = OCR_AUTO_PROBE_SECONDS if probe_seconds is None else probe_seconds
+        self.latency: Dict[str, float] = dict(INITIAL_LATENCY)
+        self.inflight: Dict[str, int] = {level: 0 for level in RECOGNITION_LEVELS}
+        self.degraded = False
+        self.clock = time.monotonic
+        self._next_probe = 0.0
+        self._lock = threading.Lock()
+
+    def _estimate(self, level: str) -> float:
+        queued = sum(self.inflight[l] * self.latency[l] for l in RECOGNITION_LEVELS)
+        return queued / self.capacity + self.latency[level]
+
+    def estimate(self, level: str) -> float:
+        with self._lock:
+            return self._estimate(level)
+
+    def _recover_at(self) -> float:
+        own = self.latency["accurate"]
+        return own + RECOVER_RATIO * (self.slo_seconds - own)
+
+    def choose(self) -> str:
+        with self._lock:
+            estimate = self._estimate("accurate")
+            now = self.clock()
+            if not self.degraded:
+                self.degraded = estimate > self.slo_seconds
+                self._next_probe = now + self.probe_seconds
+            elif estimate <= self._recover_at():
+                self.degraded = False
+            elif now >= self._next_probe and not self.inflight["accurate"]:
+                self._next_probe = now + self.probe_seconds
+                return "accurate"
+            return "fast" if self.degraded else "accurate"
+
+    def observe(self, level: str, seconds: float) -> None:
+        with self._lock:
+            self.latency[level] += EWMA_ALPHA * (seconds - self.latency[level])
+
+    @contextmanager
+    def track(self, level: str) -> Iterator[None]:
+        """Counts a request at ``level`` as in flight for the duration of the block."""
+        with self._lock:
+            self.inflight[level] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.inflight[level] -= 1
+
+
+level_selector = LevelSelector()
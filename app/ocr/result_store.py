@@ -0,0 +1,175 @@
+from typing import Any, Dict, List, Optional
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# SQLite file for recognized documents; empty keeps the store off
+OCR_RESULT_STORE = os.environ.get("OCR_RESULT_STORE", "")
+MAX_SEARCH_RESULTS = 100
+# Trigram tokens cannot match queries shorter than this; those are scanned with LIKE
+TRIGRAM_MIN_LENGTH = 3
+SNIPPET_CHARS = 16
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    key TEXT PRIMARY KEY,
+    request_id TEXT,
+    created_at REAL NOT NULL,
+    document_type TEXT,
+    confidence REAL,
+    recognition_level TEXT,
+    languages TEXT,
+    width INTEGER,
+    height INTEGER,
+    recognized_text TEXT NOT NULL,
+    text_lines TEXT NOT NULL
+);
+"""
+
+
+def _tokenizer(connection: sqlite3.Connection) -> str:
+    """
+    Trigram tokens match any substring, which Thai needs because it is
+    written without spaces between words. SQLite before 3.34 lacks them.
+    """
+    try:
+        connection.execute("CREATE VIRTUAL TABLE temp.tokenizer_probe USING fts5(x, tokenize='trigram')")
+        connection.execute("DROP TABLE temp.tokenizer_probe")
+        return "trigram"
+    except sqlite3.OperationalError:
+        return "unicode61"
+
+
+def _phrase(query: str) -> str:
+    """Quotes free text as one FTS5 phrase so operators in it are not parsed."""
+    return '"' + query.replace('"', '""') + '"'
+
+
+def _like_pattern(query: str) -> str:
+    return "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _snippet(text: str, query: str) -> str:
+    """The text around the first match of ``query``, marked like FTS5 snippet()."""
+    start = text.lower().find(query.lower())
+    if start < 0:
+        return ""
+    end = start + len(query)
+    before = max(0, start - SNIPPET_CHARS)
+    after = min(len(text), end + SNIPPET_CHARS)
+    return ("…" if before else "") + text[before:start] + "[" + text[start:end] + "]" + \
+        text[end:after] + ("…" if after < len(text) else "")
+
+
+class ResultStore:
+    """
+    OCR results in SQLite, keyed by the SHA-256 of the upload, with
+    ``recognized_text`` and the text of every line indexed in an FTS5
+    table. Recognizing the same upload again replaces its row. One
+    connection is shared behind a lock; WAL keeps readers off the writer.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._lock, self._connection:
+            if path != ":memory:":
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(_SCHEMA)
+            self.tokenizer = _tokenizer(self._connection)
+            self._connection.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING "
+                f"fts5(key UNINDEXED, recognized_text, lines, tokenize='{self.tokenizer}')"
+            )
+
+    def save(self, key: str, result: Dict[str, Any], request_id: Optional[str] = None,
+             languages: Optional[List[str]] = None, recognition_level: Optional[str] = None) -> None:
+        text_lines = result.get("text_lines") or {}
+        lines = [{"id": line["id"], "text": line["text"], "confidence": line["confidence"],
+                  "position": line["position"]} for line in text_lines.values()]
+        dimensions = result.get("dimensions") or {}
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, request_id, time.time(), result.get("document_type"), result.get("confidence"),
+                 recognition_level, ",".join(languages or []), dimensions.get("width"), dimensions.get("height"),
+                 result.get("recognized_text", ""), json.dumps(lines, ensure_ascii=False))
+            )
+            self._connection.execute("DELETE FROM documents_fts WHERE key = ?", (key,))
+            self._connection.execute(
+                "INSERT INTO documents_fts (key, recognized_text, lines) VALUES (?, ?, ?)",
+                (key, result.get("recognized_text", ""), "\n".join(line["text"] for line in lines))
+            )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        A stored document by content hash. The request id is client-chosen,
+        so it is kept for correlating logs but never used to look rows up.
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT * FROM documents WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        document = dict(row)
+        document["languages"] = [lang for lang in (document["languages"] or "").split(",") if lang]
+        document["text_lines"] = json.loads(document["text_lines"])
+        return document
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Documents whose text contains ``query``, best match first."""
+        limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+        if self.tokenizer == "trigram" and len(query) < TRIGRAM_MIN_LENGTH:
+            return self._scan(query, limit)
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT d.key, d.request_id, d.created_at, d.document_type, d.confidence, "
+                "snippet(documents_fts, -1, '[', ']', '…', 16) AS snippet, bm25(documents_fts) AS rank "
+                "FROM documents_fts JOIN documents d ON d.key = documents_fts.key "
+                "WHERE documents_fts MATCH ? ORDER BY rank LIMIT ?",
+                (_phrase(query), limit)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _scan(self, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Substring scan for queries too short for the index, newest first and unranked."""
+        pattern = _like_pattern(query)
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT d.key, d.request_id, d.created_at, d.document_type, d.confidence, "
+                "f.recognized_text, f.lines FROM documents_fts f JOIN documents d ON d.key = f.key "
+                "WHERE f.recognized_text LIKE ? ESCAPE '\\' OR f.lines LIKE ? ESCAPE '\\' "
+                "ORDER BY d.created_at DESC LIMIT ?",
+                (pattern, pattern, limit)
+            ).fetchall()
+        results = []
+        for row in rows:
+            hit = dict(row)
+            text, lines = hit.pop("recognized_text"), hit.pop("lines")
+            hit["snippet"] = _snippet(text, query) or _snippet(lines, query)
+            hit["rank"] = 0.0
+            results.append(hit)
+        return results
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+_store: Optional[ResultStore] = None
+_store_lock = threading.Lock()
+
+
+def get_result_store() -> Optional[ResultStore]:
+    """The configured store, opened on first use; None when OCR_RESULT_STORE is unset."""
+    global _store
+    if not OCR_RESULT_STORE:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore(OCR_RESULT_STORE)
+        return _store
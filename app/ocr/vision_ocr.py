@@ -5,7 +5,9 @@ import time
 import os
 import tempfile
 from typing import List, Dict, Any
-from PIL import Image, ImageDraw
+import numpy as np
+from PIL import Image
+from app.ocr.observations import TextObservations
 from app.utils.image_utils import get_image_dimensions, calculate_fast_rate, calculate_rack_cooling_rate
 
 
@@ -41,76 +43,43 @@ def process_image_with_vision(image, languages: List[str], recognition_level: st
         
         results = text_request.results()
         
-        recognized_text = ""
-        confidence_sum = 0
-        text_object_count = 0
-        text_elements = []
+        text_object_count = len(results) if results else 0
         
-        visualization_image = image.copy()
-        draw = ImageDraw.Draw(visualization_image)
+        texts = []
+        confidences = np.empty(text_object_count, dtype=np.float64)
+        normalized_boxes = np.empty((text_object_count, 4), dtype=np.float64)
         
-        if results:
-            text_object_count = len(results)
-            for idx, result in enumerate(results):
-
-                text = result.text()
-                confidence = result.confidence()
-                
-                recognized_text += text + "\n"
-                
-                confidence_sum += confidence
-                
-                bbox = result.boundingBox()
-                
-                x = bbox.origin.x * width
-                y = (1 - bbox.origin.y - bbox.size.height) * height  # Flip Y coordinate
-                w = bbox.size.width * width
-                h = bbox.size.height * height
-                
-                element_id = f"element_{idx+1}"
-                
-                text_elements.append({
-                    "id": element_id,
-                    "text": text,
-                    "confidence": float(confidence),
-                    "position": {
-                        "x": float(x),
-                        "y": float(y),
-                        "width": float(w),
-                        "height": float(h),
-                        "unit": "pixel"
-                    }
-                })
-                
-                draw.rectangle([x, y, x + w, y + h], outline="red", width=2)
-                label = text[:10] + "..." if len(text) > 10 else text
-                draw.text((x, y - 10), label, fill="red")
+        for idx in range(text_object_count):
+            result = results[idx]
+            texts.append(result.text())
+            confidences[idx] = result.confidence()
+            
+            bbox = result.boundingBox()
+            normalized_boxes[idx] = (bbox.origin.x, bbox.origin.y, bbox.size.width, bbox.size.height)
+        
+        observations = TextObservations.from_normalized(normalized_boxes, confidences, texts, width, height)
         
-        avg_confidence = confidence_sum / len(results) if results else 0
+        avg_confidence = observations.mean_confidence()
         
         fast_rate = calculate_fast_rate(width, height)
         rack_cooling_rate = calculate_rack_cooling_rate(width, height, text_object_count)
         
-        visualization_path = temp_filename + "_vis.png"
-        visualization_image.save(visualization_path)
-        
         return {
-            "text": recognized_text.strip(),
+            "text": observations.joined_text().strip(),
             "confidence": float(avg_confidence),
-            "text_elements": text_elements,
+            "observations": observations,
             "dimensions": dimensions,
             "fast_rate": fast_rate,
             "rack_cooling_rate": rack_cooling_rate,
             "processing_time": time.time() - start_time,
-            "text_object_count": text_object_count,
-            "visualization_image": visualization_image
+            "text_object_count": text_object_count
         }
     
     except Exception as e:
         return {
             "text": f"Error occurred: {str(e)}",
             "confidence": 0.0,
-            "text_elements": [],
+            "observations": TextObservations.empty(),
             "dimensions": dimensions,
             "fast_rate": calculate_fast_rate(width, height),
             "rack_cooling_rate": calculate_rack_cooling_rate(width, height, 0),
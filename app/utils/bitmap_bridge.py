@@ -0,0 +1,136 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Tuple
+import math
+import threading
+
+from PIL import Image
+
+BYTES_PER_PIXEL = 4
+
+
+class BitmapAdapter(ABC):
+    """
+    The few Core Image calls the bitmap bridge needs. The real implementation
+    is image_processing.CoreImageAdapter; tests use an in-memory fake so the
+    conversion logic runs without macOS.
+    """
+
+    @abstractmethod
+    def create_context(self) -> Any:
+        ...
+
+    @abstractmethod
+    def create_filter(self, name: str) -> Any:
+        """A new filter instance, or None if the name is unknown."""
+
+    @abstractmethod
+    def reset_filter(self, filter: Any) -> None:
+        """Restores a reused filter's default parameters."""
+
+    @abstractmethod
+    def image_from_rgba(self, data: bytes, width: int, height: int, bytes_per_row: int) -> Any:
+        ...
+
+    @abstractmethod
+    def extent(self, image: Any) -> Tuple[float, float, float, float]:
+        ...
+
+    @abstractmethod
+    def render_rgba(self, context: Any, image: Any, bounds: Tuple[int, int, int, int],
+                    buffer: bytearray, bytes_per_row: int) -> None:
+        """Renders ``bounds`` of ``image`` into ``buffer`` as premultiplied RGBA8."""
+
+
+class RenderCache:
+    """
+    One render context and one instance per filter name for each thread.
+    Contexts are expensive to create and safe to reuse; filters are not
+    thread-safe, so each worker thread gets its own.
+
+    A cached filter keeps its last input image until it is used again on
+    the same thread, so at most one image per filter name per thread stays
+    referenced.
+    """
+
+    def __init__(self, adapter: BitmapAdapter):
+        self.adapter = adapter
+        self._local = threading.local()
+
+    def context(self) -> Any:
+        context = getattr(self._local, "context", None)
+        if context is None:
+            context = self._local.context = self.adapter.create_context()
+        return context
+
+    def filter(self, name: str) -> Optional[Any]:
+        filters: Dict[str, Any] = getattr(self._local, "filters", None)
+        if filters is None:
+            filters = self._local.filters = {}
+
+        if name in filters:
+            filter = filters[name]
+            if filter is not None:
+                self.adapter.reset_filter(filter)
+            return filter
+
+        filter = filters[name] = self.adapter.create_filter(name)
+        return filter
+
+    def clear(self) -> None:
+        """Drops the calling thread's context and filters."""
+        self._local.__dict__.clear()
+
+
+def pil_to_rgba(image: Image.Image) -> Tuple[bytes, int, int, int]:
+    """
+    Packs a PIL image as premultiplied RGBA8 rows, the layout Core Image's
+    RGBA8 bitmap format expects. Returns (data, width, height, bytes_per_row).
+    """
+    if image.mode == "RGBA":
+        # Opaque alpha makes premultiplication a no-op, so skip the pass
+        data = image.convert("RGBa").tobytes() if image.getextrema()[3][0] < 255 else image.tobytes()
+    else:
+        data = image.convert("RGBA").tobytes()
+    width, height = image.size
+    return data, width, height, width * BYTES_PER_PIXEL
+
+
+def rgba_to_pil(buffer, width: int, height: int, bytes_per_row: int,
+                premultiplied: bool = True) -> Image.Image:
+    """
+    Wraps rendered RGBA8 rows as an RGBA image. When every pixel is opaque
+    the image shares ``buffer`` instead of copying it.
+    """
+    image = Image.frombuffer("RGBA", (width, height), buffer, "raw", "RGBA", bytes_per_row, 1)
+    if premultiplied and image.getextrema()[3][0] < 255:
+        image = Image.frombuffer("RGBA", (width, height), buffer, "raw", "RGBa", bytes_per_row, 1)
+    return image
+
+
+def render_bounds(extent: Tuple[float, float, float, float]) -> Tuple[int, int, int, int]:
+    """Integral (x, y, width, height) covering an image extent."""
+    x, y, width, height = extent
+    if not all(math.isfinite(value) for value in extent):
+        raise ValueError("Cannot render an image with an infinite extent")
+    left = math.floor(x)
+    bottom = math.floor(y)
+    right = math.ceil(round(x + width, 6))
+    top = math.ceil(round(y + height, 6))
+    if right <= left or top <= bottom:
+        raise ValueError("Cannot render an empty image")
+    return left, bottom, right - left, top - bottom
+
+
+def pil_to_ci(image: Image.Image, adapter: BitmapAdapter) -> Any:
+    data, width, height, bytes_per_row = pil_to_rgba(image)
+    return adapter.image_from_rgba(data, width, height, bytes_per_row)
+
+
+def ci_to_pil(image: Any, cache: RenderCache) -> Image.Image:
+    """Renders ``image`` straight into a Python buffer and wraps it, with no codec in between."""
+    bounds = render_bounds(cache.adapter.extent(image))
+    width, height = bounds[2], bounds[3]
+    bytes_per_row = width * BYTES_PER_PIXEL
+    buffer = bytearray(bytes_per_row * height)
+    cache.adapter.render_rgba(cache.context(), image, bounds, buffer, bytes_per_row)
+    return rgba_to_pil(buffer, width, height, bytes_per_row)
@@ -0,0 +1,134 @@
+from contextvars import ContextVar
+from typing import Any, Callable, List, Optional
+import asyncio
+import os
+import time
+
+DEADLINE_HEADER = "x-request-timeout"
+# Seconds a request may take when the client does not say; 0 means no limit
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get("REQUEST_TIMEOUT_SECONDS", "0"))
+MAX_REQUEST_TIMEOUT_SECONDS = float(os.environ.get("MAX_REQUEST_TIMEOUT_SECONDS", "300"))
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class DeadlineExceeded(Exception):
+    """Raised at a stage boundary once the request's time is up or its client has gone."""
+
+    def __init__(self, stage: str, reason: str = "timeout"):
+        super().__init__(stage, reason)
+        self.stage = stage
+        self.reason = reason
+
+    def __str__(self) -> str:
+        return f"{self.reason} before {self.stage}"
+
+
+class Deadline:
+    """
+    The time budget of one request as a wall-clock ``expires_at`` (None for
+    no limit), so it means the same thing in worker processes. cancel()
+    marks the request abandoned, for example when the client disconnects,
+    and runs the registered callbacks so queued work can be dropped.
+    """
+
+    def __init__(self, expires_at: Optional[float] = None):
+        self.expires_at = expires_at
+        self.reason: Optional[str] = None
+        self._callbacks: List[Callable[[], Any]] = []
+        self._watcher: Optional[asyncio.Task] = None
+
+    @classmethod
+    def after(cls, seconds: Optional[float]) -> "Deadline":
+        return cls(time.time() + seconds if seconds else None)
+
+    def remaining(self) -> Optional[float]:
+        return None if self.expires_at is None else self.expires_at - time.time()
+
+    @property
+    def expired(self) -> bool:
+        if self.reason is None and self.expires_at is not None and time.time() >= self.expires_at:
+            self.reason = "timeout"
+        return self.reason is not None
+
+    def check(self, stage: str) -> None:
+        if self.expired:
+            raise DeadlineExceeded(stage, self.reason)
+
+    def cancel(self, reason: str = "client_disconnected") -> None:
+        if self.reason is None:
+            self.reason = reason
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback: Callable[[], Any]) -> None:
+        self._callbacks.append(callback)
+
+    def watch(self, is_disconnected: Callable[[], Any]) -> None:
+        """Polls ``is_disconnected`` (a coroutine function) and cancels when it returns True."""
+        async def poll():
+            while not self.expired:
+                if await is_disconnected():
+                    self.cancel()
+                    return
+                await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+        if self._watcher is None:
+            self._watcher = asyncio.ensure_future(poll())
+
+    def close(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+        self._callbacks = []
+
+
+deadline_var: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def parse_timeout(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds from the X-Request-Timeout header or ``timeout`` query
+    parameter, capped at MAX_REQUEST_TIMEOUT_SECONDS. Missing or unusable
+    values fall back to REQUEST_TIMEOUT_SECONDS.
+    """
+    try:
+        seconds = float(value) if value else REQUEST_TIMEOUT_SECONDS
+    except ValueError:
+        seconds = REQUEST_TIMEOUT_SECONDS
+    if seconds <= 0:
+        return None
+    return min(seconds, MAX_REQUEST_TIMEOUT_SECONDS)
+
+
+def bind_deadline(deadline: Deadline):
+    return deadline_var.set(deadline)
+
+
+def reset_deadline(token) -> None:
+    deadline = deadline_var.get()
+    if deadline is not None:
+        deadline.close()
+    deadline_var.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return deadline_var.get()
+
+
+def check_deadline(stage: str) -> None:
+    """Raises DeadlineExceeded if the current request is out of time; no-op outside a request."""
+    deadline = deadline_var.get()
+    if deadline is not None:
+        deadline.check(stage)
+
+
+def deadline_expired() -> bool:
+    deadline = deadline_var.get()
+    return deadline is not None and deadline.expired
+
+
+def call_before_deadline(fn: Callable, *args, **kwargs) -> Any:
+    """Runs ``fn`` unless the request ran out of time while it waited in a queue."""
+    check_deadline("queue")
+    return fn(*args, **kwargs)
@@ -0,0 +1,122 @@
+from typing import Any, Dict, Optional, Tuple
+import io
+import os
+import time
+
+from PIL import Image, features
+
+OUTPUT_FORMATS = {
+    "png": {"extension": "png", "media_type": "image/png", "pil_format": "PNG"},
+    "jpeg": {"extension": "jpg", "media_type": "image/jpeg", "pil_format": "JPEG"},
+    "webp": {"extension": "webp", "media_type": "image/webp", "pil_format": "WEBP"},
+}
+
+FORMAT_ALIASES = {"jpg": "jpeg"}
+
+DEFAULT_OUTPUT_FORMAT = os.environ.get("OUTPUT_FORMAT", "png").lower()
+DEFAULT_OUTPUT_QUALITY = int(os.environ.get("OUTPUT_QUALITY", "85"))
+# zlib level 1 is several times faster than Pillow's default of 6 and
+# only slightly larger on photographs.
+PNG_COMPRESS_LEVEL = int(os.environ.get("PNG_COMPRESS_LEVEL", "1"))
+
+
+def supported_output_formats() -> Tuple[str, ...]:
+    return tuple(name for name in OUTPUT_FORMATS if name != "webp" or features.check("webp"))
+
+
+def _normalize(name: str) -> str:
+    name = name.strip().lower()
+    return FORMAT_ALIASES.get(name, name)
+
+
+def _parse_header_list(header: str):
+    """Yields (value, quality) for each entry of an Accept-style header."""
+    for part in header.split(","):
+        fields = part.strip().split(";")
+        q = 1.0
+        for param in fields[1:]:
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        yield fields[0].strip().lower(), q
+
+
+def _parse_accept(accept: str):
+    """
+    Yields (quality, position, format) for every supported image type in an
+    Accept header. Wildcards are ignored so browsers sending ``*/*`` keep the
+    server default.
+    """
+    media_types = {spec["media_type"]: name for name, spec in OUTPUT_FORMATS.items()}
+    for position, (media_type, q) in enumerate(_parse_header_list(accept)):
+        if media_type in media_types and q > 0:
+            yield q, position, media_types[media_type]
+
+
+def accepts_encoding(accept_encoding: Optional[str], coding: str) -> bool:
+    """
+    Whether an Accept-Encoding header allows ``coding`` with a non-zero q.
+    An explicit entry for the coding wins over ``*``; a missing header
+    allows nothing, so clients that did not ask get the identity encoding.
+    """
+    if not accept_encoding:
+        return False
+    entries = dict(_parse_header_list(accept_encoding))
+    q = entries.get(coding, entries.get("*", 0.0))
+    return q > 0
+
+
+def negotiate_output_format(requested: Optional[str] = None, accept: Optional[str] = None) -> str:
+    """
+    An explicit ``requested`` format wins, then the best supported image type
+    in the Accept header, then OUTPUT_FORMAT. Raises ValueError for an
+    unsupported explicit format.
+    """
+    supported = supported_output_formats()
+
+    if requested:
+        output_format = _normalize(requested)
+        if output_format not in supported:
+            raise ValueError(f"Unsupported output format '{requested}', expected one of: {', '.join(supported)}")
+        return output_format
+
+    if accept:
+        candidates = [c for c in _parse_accept(accept) if c[2] in supported]
+        if candidates:
+            return sorted(candidates, key=lambda c: (-c[0], c[1]))[0][2]
+
+    default = _normalize(DEFAULT_OUTPUT_FORMAT)
+    return default if default in supported else "png"
+
+
+def _save_options(output_format: str, quality: Optional[int]) -> Dict[str, Any]:
+    if output_format == "png":
+        return {"compress_level": PNG_COMPRESS_LEVEL}
+    quality = DEFAULT_OUTPUT_QUALITY if quality is None else max(1, min(100, int(quality)))
+    if output_format == "webp":
+        return {"quality": quality, "method": 4}
+    return {"quality": quality, "optimize": False}
+
+
+def encode_image(image: Image.Image, output_format: str, quality: Optional[int] = None) -> Tuple[bytes, float]:
+    """Returns the encoded bytes and the encode time in seconds."""
+    spec = OUTPUT_FORMATS[output_format]
+
+    if output_format == "jpeg" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+    image.save(buffer, format=spec["pil_format"], **_save_options(output_format, quality))
+    return buffer.getvalue(), time.perf_counter() - start
+
+
+def output_extension(output_format: str) -> str:
+    return OUTPUT_FORMATS[output_format]["extension"]
+
+
+def output_media_type(output_format: str) -> str:
+    return OUTPUT_FORMATS[output_format]["media_type"]
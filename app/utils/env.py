@@ -0,0 +1,14 @@
+import os
+
+TRUTHY_VALUES = ("1", "true", "yes", "on")
+
+
+def env_flag(name: str, default: bool) -> bool:
+    """
+    Reads a boolean environment variable. Unset keeps ``default``; any other
+    value is true only if it is one of TRUTHY_VALUES, ignoring case.
+    """
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in TRUTHY_VALUES
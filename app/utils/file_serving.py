@@ -0,0 +1,170 @@
+from collections import OrderedDict
+from typing import Iterator, Optional, Tuple
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from fastapi.responses import Response, FileResponse, StreamingResponse
+
+SAFE_FILENAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,254}$")
+# Names produced by main._encode_output are unique per request and never
+# rewritten, so clients and CDNs may cache them forever.
+GENERATED_FILENAME_RE = re.compile(
+    r"^(?:ocr|face|card|perspective)_\d{8}_\d{6}_[0-9a-f]{8}(?:\.overlay\.json|\.png|\.jpg|\.webp)$"
+)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+_RANGE_CHUNK_SIZE = 64 * 1024
+
+
+def is_safe_filename(filename: str) -> bool:
+    return bool(SAFE_FILENAME_RE.match(filename)) and ".." not in filename
+
+
+def resolve_output_path(folder: str, filename: str) -> Optional[str]:
+    """
+    Returns the real path of ``filename`` inside ``folder``, or None if the
+    name is not a plain file name, escapes the folder (including through
+    symlinks) or does not exist.
+    """
+    if not is_safe_filename(filename):
+        return None
+
+    root = os.path.realpath(folder)
+    path = os.path.realpath(os.path.join(root, filename))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        return None
+    return path
+
+
+class ETagCache:
+    """sha256 ETags memoized by (path, size, mtime) so unchanged files are hashed once."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, stat_result: os.stat_result) -> str:
+        key = (path, stat_result.st_size, stat_result.st_mtime_ns)
+        with self._lock:
+            etag = self._entries.get(key)
+            if etag is not None:
+                self._entries.move_to_end(key)
+                return etag
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        etag = f'"{digest.hexdigest()}"'
+
+        with self._lock:
+            self._entries[key] = etag
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return etag
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Weak comparison as required for If-None-Match."""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single ``bytes=`` range into inclusive (start, end). Returns None
+    when the header is absent, malformed or asks for several ranges, in which
+    case the whole file is served. Raises ValueError if unsatisfiable.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+
+    spec = header[len("bytes="):].strip()
+    if "," in spec or "-" not in spec:
+        return None
+
+    first, _, last = spec.partition("-")
+    first = first.strip()
+    last = last.strip()
+    if not (first or last) or (first and not first.isdigit()) or (last and not last.isdigit()):
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or (last and end < start):
+        raise ValueError("Unsatisfiable range")
+    return start, min(end, size - 1)
+
+
+def iter_range(path: str, start: int, end: int, chunk_size: int = _RANGE_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yields the inclusive byte range in chunks of at most ``chunk_size``."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def serve_file(path: str, etag: str, stat_result: os.stat_result, immutable: bool,
+               if_none_match: Optional[str] = None, range_header: Optional[str] = None,
+               if_range: Optional[str] = None) -> Response:
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    size = stat_result.st_size
+    # A stale If-Range validator means the client's partial copy is outdated
+    if if_range is not None and if_range.strip() != etag:
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        return FileResponse(path, headers=headers, stat_result=stat_result)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    # A sync iterator is read on the threadpool, one bounded chunk at a time
+    return StreamingResponse(iter_range(path, start, end), status_code=206, headers=headers, media_type=media_type)
@@ -5,6 +5,11 @@ import Cocoa
 import Quartz
 import numpy as np
 
+from app.utils.bitmap_bridge import BitmapAdapter, RenderCache, pil_to_ci, ci_to_pil
+from app.utils.request_logging import get_logger
+
+log = get_logger(__name__)
+
 def convert_to_supported_format(image: Image.Image) -> Image.Image:
 
     if image.mode not in ('RGB', 'RGBA'):
@@ -23,11 +28,59 @@ def convert_to_supported_format(image: Image.Image) -> Image.Image:
     
     return image
 
+class CoreImageAdapter(BitmapAdapter):
+    """BitmapAdapter backed by Core Image, rendering RGBA8 in sRGB."""
+
+    def __init__(self):
+        self.color_space = Quartz.CGColorSpaceCreateWithName(Quartz.kCGColorSpaceSRGB)
+
+    def create_context(self):
+        return Cocoa.CIContext.contextWithOptions_(None)
+
+    def create_filter(self, name: str):
+        return Cocoa.CIFilter.filterWithName_(name)
+
+    def reset_filter(self, filter) -> None:
+        filter.setDefaults()
+
+    def image_from_rgba(self, data: bytes, width: int, height: int, bytes_per_row: int):
+        ns_data = Foundation.NSData.dataWithBytes_length_(data, len(data))
+        return Cocoa.CIImage.imageWithBitmapData_bytesPerRow_size_format_colorSpace_(
+            ns_data, bytes_per_row, Quartz.CGSizeMake(width, height), Cocoa.kCIFormatRGBA8, self.color_space
+        )
+
+    def extent(self, image):
+        extent = image.extent()
+        return extent.origin.x, extent.origin.y, extent.size.width, extent.size.height
+
+    def render_rgba(self, context, image, bounds, buffer: bytearray, bytes_per_row: int) -> None:
+        context.render_toBitmap_rowBytes_bounds_format_colorSpace_(
+            image, buffer, bytes_per_row, Quartz.CGRectMake(*bounds), Cocoa.kCIFormatRGBA8, self.color_space
+        )
+
+
+# Shared by every Core Image user in the app: one CIContext and one instance
+# per filter name for each worker thread.
+render_cache = RenderCache(CoreImageAdapter())
+
+
 def pil_to_ci_image(pil_image: Image.Image) -> Cocoa.CIImage:
    
     if pil_image.mode not in ('RGB', 'RGBA'):
         pil_image = pil_image.convert('RGB')
     
+    try:
+        ci_image = pil_to_ci(pil_image, render_cache.adapter)
+        if ci_image is not None:
+            return ci_image
+        log.warning("bitmap_bridge_fallback", direction="pil_to_ci", error="no image")
+    except Exception as e:
+        log.warning("bitmap_bridge_fallback", direction="pil_to_ci", error=str(e))
+    
+    return _pil_to_ci_image_encoded(pil_image)
+
+def _pil_to_ci_image_encoded(pil_image: Image.Image) -> Cocoa.CIImage:
+    
     buffer = io.BytesIO()
     pil_image.save(buffer, format="PNG")
     image_data = buffer.getvalue()
@@ -59,9 +112,18 @@ def pil_to_ci_image(pil_image: Image.Image) -> Cocoa.CIImage:
     raise ValueError("Failed to convert PIL Image to CIImage")
 
 def ci_to_pil_image(ci_image: Cocoa.CIImage) -> Image.Image:
+    
+    try:
+        return ci_to_pil(ci_image, render_cache)
+    except Exception as e:
+        log.warning("bitmap_bridge_fallback", direction="ci_to_pil", error=str(e))
+    
+    return _ci_to_pil_image_encoded(ci_image)
+
+def _ci_to_pil_image_encoded(ci_image: Cocoa.CIImage) -> Image.Image:
   
     try:
-        context = Cocoa.CIContext.contextWithOptions_(None)
+        context = render_cache.context()
         
         extent = ci_image.extent()
         width = int(extent.size.width)
@@ -85,7 +147,7 @@ def ci_to_pil_image(ci_image: Cocoa.CIImage) -> Image.Image:
     
     except Exception as e:
         try:
-            print(f"Primary conversion method failed, trying fallback: {str(e)}")
+            log.warning("ci_conversion_fallback", error=str(e))
             
             options = {
                 Cocoa.kCIContextUseSoftwareRenderer: False
@@ -0,0 +1,53 @@
+from typing import Any, Dict, Tuple
+import threading
+
+
+class MetricsRegistry:
+    """
+    In-process counters and summaries keyed by name and a sorted label tuple.
+    Summaries keep count, sum, min and max, which is enough for averages
+    without storing samples.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple, float] = {}
+        self._summaries: Dict[Tuple, Dict[str, float]] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> Tuple:
+        return (name,) + tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def increment(self, name: str, value: float = 1.0, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = self._key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                self._summaries[key] = {"count": 1, "sum": value, "min": value, "max": value}
+            else:
+                summary["count"] += 1
+                summary["sum"] += value
+                summary["min"] = min(summary["min"], value)
+                summary["max"] = max(summary["max"], value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = [{"name": key[0], "labels": dict(key[1:]), "value": value}
+                        for key, value in sorted(self._counters.items())]
+            summaries = [{"name": key[0], "labels": dict(key[1:]), **summary,
+                          "avg": summary["sum"] / summary["count"]}
+                         for key, summary in sorted(self._summaries.items())]
+        return {"counters": counters, "summaries": summaries}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+
+metrics = MetricsRegistry()
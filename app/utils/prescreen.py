@@ -0,0 +1,149 @@
+from typing import Any, Dict, Optional
+import io
+import math
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from app.utils.env import env_flag
+
+# Metrics are computed on a grayscale copy whose longer side is at most this.
+# Much below 512 the text strokes that tell a sharp document from a blurry
+# one are averaged away.
+PRESCREEN_MAX_SIDE = 512
+# Pixels at or above this level count as glare.
+GLARE_LEVEL = 250
+
+# min_side: shorter side of the original image in pixels
+# min_sharpness: variance of the Laplacian on the downscaled copy
+# min_brightness / max_brightness: mean luminance, 0.0-1.0
+# max_glare: fraction of pixels at or above GLARE_LEVEL
+DEFAULT_THRESHOLDS = {
+    "min_side": 200,
+    "min_sharpness": 20.0,
+    "min_brightness": 0.12,
+    "max_brightness": 0.92,
+    "max_glare": 0.15,
+}
+
+# Documents need fine detail, but white paper is bright and often clips, so
+# glare is left to the brightness check there. Skin has little texture, so
+# faces get a low sharpness bar but a strict glare limit.
+ENDPOINT_THRESHOLDS = {
+    "ocr": {"min_side": 300, "min_sharpness": 60.0, "max_brightness": 0.985, "max_glare": 1.0},
+    "face": {"min_side": 120, "min_sharpness": 5.0, "max_glare": 0.08},
+    "card": {"min_side": 300, "min_sharpness": 30.0},
+}
+
+
+def prescreen_enabled(requested: Optional[bool] = None) -> bool:
+    """A per-request flag wins; otherwise PRESCREEN_ENABLED decides (off by default)."""
+    if requested is not None:
+        return requested
+    return env_flag("PRESCREEN_ENABLED", False)
+
+
+def thresholds_for(endpoint: str) -> Dict[str, float]:
+    """
+    Defaults, then the endpoint's own values, then environment overrides
+    named PRESCREEN_<ENDPOINT>_<KEY> (e.g. PRESCREEN_OCR_MIN_SHARPNESS).
+    """
+    thresholds = {**DEFAULT_THRESHOLDS, **ENDPOINT_THRESHOLDS.get(endpoint, {})}
+    for key in thresholds:
+        value = os.environ.get(f"PRESCREEN_{endpoint.upper()}_{key.upper()}")
+        if value is not None:
+            thresholds[key] = float(value)
+    return thresholds
+
+
+def grayscale_thumbnail(image: Image.Image, max_side: int = PRESCREEN_MAX_SIDE) -> np.ndarray:
+    """Float32 luminance of a copy no larger than max_side on its longer side."""
+    gray = image.convert("L")
+    scale = max_side / max(gray.size)
+    if scale < 1.0:
+        size = (max(1, round(gray.width * scale)), max(1, round(gray.height * scale)))
+        gray = gray.resize(size, Image.BILINEAR, reducing_gap=2.0)
+    return np.asarray(gray, dtype=np.float32)
+
+
+def draft_proxy(data: bytes, max_side: int = PRESCREEN_MAX_SIDE) -> Image.Image:
+    """
+    Opens a JPEG upload again and has the decoder produce grayscale at a
+    reduced DCT scale, still at least max_side on its longer side, so the
+    full-resolution image is never decoded or converted for the check.
+    The caller's own image is left to decode at full size.
+    """
+    proxy = Image.open(io.BytesIO(data))
+    scale = max_side / max(proxy.size)
+    if scale < 1.0:
+        proxy.draft("L", (math.ceil(proxy.width * scale), math.ceil(proxy.height * scale)))
+    return proxy
+
+
+def laplacian_variance(gray: np.ndarray) -> float:
+    """Variance of the 4-neighbour Laplacian; low values mean a blurry image."""
+    if gray.shape[0] < 3 or gray.shape[1] < 3:
+        return 0.0
+    laplacian = (gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:]
+                 - 4.0 * gray[1:-1, 1:-1])
+    return float(laplacian.var())
+
+
+def measure(image: Image.Image, data: Optional[bytes] = None) -> Dict[str, Any]:
+    """Metrics of ``image``; pass the upload ``data`` to let JPEGs be decoded small."""
+    source = draft_proxy(data) if data is not None and image.format == "JPEG" else image
+    gray = grayscale_thumbnail(source)
+    return {
+        "width": image.width,
+        "height": image.height,
+        "min_side": min(image.size),
+        "sharpness": round(laplacian_variance(gray), 3),
+        "brightness": round(float(gray.mean()) / 255.0, 4),
+        "glare": round(float((gray >= GLARE_LEVEL).mean()), 4),
+    }
+
+
+def _reason(code: str, metric: str, value: float, threshold: float, message: str) -> Dict[str, Any]:
+    return {"code": code, "metric": metric, "value": value, "threshold": threshold, "message": message}
+
+
+def evaluate(measured: Dict[str, Any], thresholds: Dict[str, float]):
+    reasons = []
+    if measured["min_side"] < thresholds["min_side"]:
+        reasons.append(_reason("too_small", "min_side", measured["min_side"], thresholds["min_side"],
+                               "Image is too small"))
+    if measured["sharpness"] < thresholds["min_sharpness"]:
+        reasons.append(_reason("blurry", "sharpness", measured["sharpness"], thresholds["min_sharpness"],
+                               "Image is too blurry"))
+    if measured["brightness"] < thresholds["min_brightness"]:
+        reasons.append(_reason("too_dark", "brightness", measured["brightness"], thresholds["min_brightness"],
+                               "Image is too dark"))
+    if measured["brightness"] > thresholds["max_brightness"]:
+        reasons.append(_reason("overexposed", "brightness", measured["brightness"], thresholds["max_brightness"],
+                               "Image is overexposed"))
+    if measured["glare"] > thresholds["max_glare"]:
+        reasons.append(_reason("glare", "glare", measured["glare"], thresholds["max_glare"],
+                               "Image has too much glare"))
+    return reasons
+
+
+def prescreen(image: Image.Image, endpoint: str, thresholds: Optional[Dict[str, float]] = None,
+              data: Optional[bytes] = None) -> Dict[str, Any]:
+    """
+    Cheap usability check run before recognition. Returns ``passed``, the
+    rejection ``reasons`` (empty when passed), the ``metrics`` and the
+    ``thresholds`` that were applied.
+    """
+    start = time.perf_counter()
+    thresholds = thresholds or thresholds_for(endpoint)
+    measured = measure(image, data)
+    reasons = evaluate(measured, thresholds)
+    return {
+        "passed": not reasons,
+        "reasons": reasons,
+        "metrics": measured,
+        "thresholds": thresholds,
+        "processing_time": time.perf_counter() - start,
+    }
@@ -0,0 +1,50 @@
+from typing import Optional
+import os
+
+from PIL import Image
+
+# Longest side of the copy that face, card and document-edge detection run
+# on. 0 disables the proxy and detects on the full image.
+DETECTION_PROXY_MAX_SIDE = int(os.environ.get("DETECTION_PROXY_MAX_SIDE", "1024"))
+
+
+def proxy_max_side(requested: Optional[int] = None) -> int:
+    return DETECTION_PROXY_MAX_SIDE if requested is None else requested
+
+
+class ProxyImage:
+    """
+    A downscaled copy of an image for detection, plus the size of the
+    full-resolution image. Vision reports normalized coordinates, which
+    map onto the full image through full_width and full_height directly.
+    """
+
+    __slots__ = ("image", "full_width", "full_height")
+
+    def __init__(self, image: Image.Image, full_width: int, full_height: int):
+        self.image = image
+        self.full_width = full_width
+        self.full_height = full_height
+
+    @property
+    def is_downscaled(self) -> bool:
+        return self.image.size != (self.full_width, self.full_height)
+
+
+def make_proxy(image: Image.Image, max_side: Optional[int] = None) -> ProxyImage:
+    """
+    Downscales ``image`` so its longest side is at most ``max_side``
+    (DETECTION_PROXY_MAX_SIDE by default). Images that are already small
+    enough, or max_side <= 0, are used as they are.
+    """
+    max_side = proxy_max_side(max_side)
+    width, height = image.size
+    longest = max(width, height)
+    if max_side <= 0 or longest <= max_side:
+        return ProxyImage(image, width, height)
+
+    scale = max_side / longest
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    # reducing_gap lets Pillow shrink by an integer factor first, which is
+    # most of the work for a 4000 px input
+    return ProxyImage(image.resize(size, Image.BILINEAR, reducing_gap=3.0), width, height)
@@ -0,0 +1,166 @@
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+
+LOGGER_NAMESPACE = "app"
+
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+# Whether DEBUG events of the current request are kept, decided once per
+# request so a sampled request logs its whole trace.
+debug_sampled_var: ContextVar[bool] = ContextVar("debug_sampled", default=True)
+
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+_listener: Optional[QueueListener] = None
+
+
+def _debug_sample_rate() -> float:
+    return float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+
+
+def bind_request(request_id: Optional[str] = None):
+    """
+    Starts a logging context for one request and returns tokens for
+    reset_request. Caller-supplied ids are kept when they are short and
+    plain; anything else is replaced by a fresh id.
+    """
+    if not request_id or not _REQUEST_ID_RE.match(request_id):
+        request_id = uuid.uuid4().hex
+    rate = _debug_sample_rate()
+    sampled = rate >= 1.0 or random.random() < rate
+    return request_id_var.set(request_id), debug_sampled_var.set(sampled)
+
+
+def reset_request(tokens) -> None:
+    request_token, sampled_token = tokens
+    request_id_var.reset(request_token)
+    debug_sampled_var.reset(sampled_token)
+
+
+def current_request_id() -> str:
+    return request_id_var.get()
+
+
+class StructuredLogger:
+    """
+    Logs an event name plus keyword fields. The level check runs before
+    anything is built, so disabled events cost one integer comparison and
+    field values are only turned into text by the formatter on the
+    listener thread.
+    """
+
+    __slots__ = ("_logger",)
+
+    def __init__(self, logger: logging.Logger):
+        self._logger = logger
+
+    def is_enabled(self, level: int) -> bool:
+        if level <= logging.DEBUG and not debug_sampled_var.get():
+            return False
+        return self._logger.isEnabledFor(level)
+
+    def log(self, level: int, event: str, **fields: Any) -> None:
+        if not self.is_enabled(level):
+            return
+        self._logger.log(level, event, extra={"fields": fields, "request_id": request_id_var.get()})
+
+    def debug(self, event: str, **fields: Any) -> None:
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields: Any) -> None:
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields: Any) -> None:
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, **fields: Any) -> None:
+        self.log(logging.ERROR, event, **fields)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    if not name.startswith(LOGGER_NAMESPACE):
+        name = f"{LOGGER_NAMESPACE}.{name}"
+    return StructuredLogger(logging.getLogger(name))
+
+
+def _json_default(value: Any):
+    # NumPy scalars and arrays, CIVectors and anything else unexpected
+    if hasattr(value, "item"):
+        try:
+            return value.item()
+        except (TypeError, ValueError):
+            pass
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, event, request_id and the event fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 6),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=_json_default)
+
+
+def configure_logging(level: Optional[str] = None, stream=None) -> QueueListener:
+    """
+    Routes the ``app`` logger through a QueueHandler so request threads only
+    enqueue records; a QueueListener thread formats and writes them.
+    Calling it again replaces the previous configuration.
+    """
+    global _listener
+    shutdown_logging()
+
+    logger = logging.getLogger(LOGGER_NAMESPACE)
+    logger.setLevel((level or os.environ.get("LOG_LEVEL", "INFO")).upper())
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    records: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    logger.addHandler(_PassthroughQueueHandler(records))
+    _listener = QueueListener(records, output, respect_handler_level=False)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging() -> None:
+    """Flushes queued records and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class _PassthroughQueueHandler(QueueHandler):
+    # The stock prepare() formats the message on the calling thread and
+    # drops args; records here carry only an event name and a fields dict,
+    # so they can be queued as-is and formatted on the listener thread.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 3)
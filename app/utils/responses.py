@@ -0,0 +1,80 @@
+from typing import Any, Dict, Optional
+from urllib.parse import quote
+import json
+import uuid
+
+from fastapi.responses import Response
+
+RESPONSE_MODES = ("json", "image", "multipart")
+
+HEADER_PREFIX = "X-Result-"
+# Values longer than this are left out of the headers; use multipart mode
+# to get the full result alongside the image.
+MAX_HEADER_VALUE = 1024
+# Printable ASCII except "%" passes through unchanged; everything else,
+# including newlines and Thai text, is percent-encoded as UTF-8.
+_HEADER_SAFE = "".join(chr(c) for c in range(0x20, 0x7f) if chr(c) != "%")
+
+
+def _header_name(key: str) -> str:
+    return HEADER_PREFIX + "-".join(part.capitalize() for part in key.split("_"))
+
+
+def _header_value(value: Any) -> Optional[str]:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        return quote(value, safe=_HEADER_SAFE)
+    return None
+
+
+def result_headers(payload: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Scalar fields become ``X-Result-<Field-Name>`` headers; one level of
+    nested dicts is flattened (``dimensions.width`` → ``X-Result-Dimensions-Width``).
+    Lists and deeper structures are only available in multipart mode.
+    """
+    headers = {}
+    for key, value in payload.items():
+        if isinstance(value, dict):
+            items = [(f"{key}_{sub_key}", sub_value) for sub_key, sub_value in value.items()]
+        else:
+            items = [(key, value)]
+
+        for name, item in items:
+            header_value = _header_value(item)
+            if header_value is not None and len(header_value) <= MAX_HEADER_VALUE:
+                headers[_header_name(name)] = header_value
+    return headers
+
+
+def image_response(data: bytes, media_type: str, payload: Dict[str, Any], filename: str) -> Response:
+    headers = result_headers(payload)
+    headers["Content-Disposition"] = f'inline; filename="{filename}"'
+    return Response(content=data, media_type=media_type, headers=headers)
+
+
+def multipart_response(data: bytes, media_type: str, payload: Dict[str, Any], filename: str) -> Response:
+    boundary = uuid.uuid4().hex
+    json_part = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    body = b"".join([
+        f"--{boundary}\r\n".encode(),
+        b"Content-Type: application/json; charset=utf-8\r\n\r\n",
+        json_part,
+        f"\r\n--{boundary}\r\n".encode(),
+        f"Content-Type: {media_type}\r\n".encode(),
+        f'Content-Disposition: inline; filename="{filename}"\r\n\r\n'.encode(),
+        data,
+        f"\r\n--{boundary}--\r\n".encode(),
+    ])
+    return Response(content=body, media_type=f"multipart/mixed; boundary={boundary}")
+
+
+def build_result_response(response_mode: str, data: bytes, media_type: str,
+                          payload: Dict[str, Any], filename: str) -> Response:
+    if response_mode == "multipart":
+        return multipart_response(data, media_type, payload, filename)
+    return image_response(data, media_type, payload, filename)
@@ -0,0 +1,217 @@
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Tuple
+import gzip
+import json
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+
+from app.utils.env import env_flag
+from app.utils.file_serving import GENERATED_FILENAME_RE
+from app.utils.request_logging import get_logger
+
+log = get_logger(__name__)
+
+# Keep a gzipped JSON record of every result; 0 turns records off
+RESULT_RECORDS = env_flag("RESULT_RECORDS", True)
+# Generated images, overlays and records older than this are deleted; 0 keeps them forever
+OUTPUT_RETENTION_SECONDS = float(os.environ.get("OUTPUT_RETENTION_SECONDS", "0"))
+RETENTION_SWEEP_INTERVAL = float(os.environ.get("RETENTION_SWEEP_INTERVAL", "300"))
+RECORD_BATCH_SIZE = 64
+RECORD_FLUSH_SECONDS = 0.5
+RECORD_SUFFIX = ".result.json.gz"
+
+RECORD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+# Record ids are issued here rather than taken from X-Request-ID, so a client
+# reusing an id can neither overwrite nor read someone else's record
+_record_var: ContextVar[Optional[Dict[str, Any]]] = ContextVar("result_record", default=None)
+
+
+def bind_record():
+    return _record_var.set({"id": uuid.uuid4().hex, "used": False})
+
+
+def reset_record(token) -> None:
+    _record_var.reset(token)
+
+
+def claim_record_id() -> str:
+    """The record id of the current request, marked as used; a fresh id outside a request."""
+    record = _record_var.get()
+    if record is None:
+        return uuid.uuid4().hex
+    record["used"] = True
+    return record["id"]
+
+
+def used_record_id() -> Optional[str]:
+    """The current request's record id if a record was saved under it."""
+    record = _record_var.get()
+    return record["id"] if record is not None and record["used"] else None
+
+
+def record_filename(record_id: str) -> str:
+    return f"{record_id}{RECORD_SUFFIX}"
+
+
+def encode_record(record: Dict[str, Any]) -> bytes:
+    data = json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+    # Level 6 is within a few percent of 9 on JSON at a fraction of the time
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def decode_record(data: bytes) -> Dict[str, Any]:
+    return json.loads(gzip.decompress(data))
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def sweep_expired(output_folder: str, records_folder: str, max_age: float, now: Optional[float] = None) -> int:
+    """
+    Deletes generated outputs (images and overlays) and result records
+    last modified more than ``max_age`` seconds ago. Files the service did
+    not generate are left alone. Returns how many files were removed.
+    """
+    now = time.time() if now is None else now
+    removed = 0
+    for folder, matches in ((output_folder, GENERATED_FILENAME_RE.match),
+                            (records_folder, lambda name: name.endswith(RECORD_SUFFIX))):
+        try:
+            entries = list(os.scandir(folder))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            if not entry.is_file() or not matches(entry.name):
+                continue
+            try:
+                if now - entry.stat().st_mtime > max_age:
+                    os.unlink(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+class ResultRecorder:
+    """
+    Writes result records from a background thread so the response does
+    not wait on gzip or the disk. Records are queued and written in
+    batches; until a record is on disk it is served from memory. The same
+    thread deletes expired outputs and records every ``sweep_interval``
+    seconds when ``retention`` is set.
+    """
+
+    def __init__(self, output_folder: str, records_folder: str = None, retention: float = None,
+                 sweep_interval: float = None):
+        self.output_folder = output_folder
+        self.records_folder = records_folder or os.path.join(output_folder, "results")
+        self.retention = OUTPUT_RETENTION_SECONDS if retention is None else retention
+        self.sweep_interval = RETENTION_SWEEP_INTERVAL if sweep_interval is None else sweep_interval
+        self._queue: "queue.Queue[Optional[Tuple[str, Dict[str, Any]]]]" = queue.Queue()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._last_sweep = 0.0
+        os.makedirs(self.records_folder, exist_ok=True)
+
+    def path(self, record_id: str) -> str:
+        return os.path.join(self.records_folder, record_filename(record_id))
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="result-recorder", daemon=True)
+            self._thread.start()
+
+    def start(self) -> None:
+        """Starts the writer thread, which also runs the retention sweep."""
+        with self._lock:
+            self._ensure_thread()
+
+    def submit(self, record_id: str, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._pending[record_id] = record
+            self._ensure_thread()
+        self._queue.put((record_id, record))
+
+    def get(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """A record not yet written, else None; use read() for records on disk."""
+        with self._lock:
+            return self._pending.get(record_id)
+
+    def read(self, record_id: str) -> Optional[bytes]:
+        """The gzipped record as stored, or None."""
+        try:
+            with open(self.path(record_id), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_batch(self, batch) -> None:
+        for record_id, record in batch:
+            try:
+                _write_atomic(self.path(record_id), encode_record(record))
+            except Exception as e:
+                log.error("result_record_write_failed", record_id=record_id, error=str(e))
+            finally:
+                with self._lock:
+                    # A newer record under the same id stays pending until it is written
+                    if self._pending.get(record_id) is record:
+                        del self._pending[record_id]
+
+    def _maybe_sweep(self) -> None:
+        if self.retention <= 0 or time.time() - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = time.time()
+        removed = sweep_expired(self.output_folder, self.records_folder, self.retention)
+        if removed:
+            log.info("output_retention_sweep", removed=removed, retention_seconds=self.retention)
+
+    def _run(self) -> None:
+        self._maybe_sweep()
+        stop = False
+        while not stop:
+            timeout = self.sweep_interval if self.retention > 0 else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._maybe_sweep()
+                continue
+
+            batch = []
+            deadline = time.monotonic() + RECORD_FLUSH_SECONDS
+            while True:
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= RECORD_BATCH_SIZE:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+
+            self._write_batch(batch)
+            for _ in range(len(batch) + (1 if stop else 0)):
+                self._queue.task_done()
+            self._maybe_sweep()
+
+    def flush(self) -> None:
+        """Blocks until every submitted record is on disk."""
+        self._queue.join()
+
+    def close(self) -> None:
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join()
@@ -0,0 +1,154 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from app.utils.deadline import DeadlineExceeded, current_deadline
+from app.utils.metrics import metrics
+from app.utils.worker_pool import WORKER_PROCESSES
+
+# Engine runs allowed at once, by default one per worker process (CPU core);
+# 0 turns the scheduler off
+SCHEDULER_CONCURRENCY = int(os.environ.get("SCHEDULER_CONCURRENCY", str(WORKER_PROCESSES)))
+# Seconds of estimated cost that one second of waiting is worth. Higher
+# values move towards FIFO, 0 is pure shortest-job-first and can starve
+# large jobs.
+SCHEDULER_AGING = float(os.environ.get("SCHEDULER_AGING", "1.0"))
+EWMA_ALPHA = 0.2
+# Tiny images still pay for request setup
+MIN_MEGAPIXELS = 0.1
+
+# Seconds per megapixel before any timings are observed
+INITIAL_RATES: Dict[Tuple[str, Optional[str]], float] = {
+    ("ocr", "accurate"): 0.5,
+    ("ocr", "fast"): 0.12,
+    ("face", None): 0.04,
+    ("card", None): 0.05,
+    ("card_ocr", "accurate"): 1.0,
+    ("card_ocr", "fast"): 0.3,
+}
+DEFAULT_RATE = 0.2
+
+
+def megapixels(width: int, height: int) -> float:
+    return width * height / 1_000_000
+
+
+class CostModel:
+    """
+    Expected run time of an engine call as seconds per megapixel for each
+    endpoint and recognition level, moved towards observed timings by an
+    exponential moving average.
+    """
+
+    def __init__(self, rates: Dict[Tuple[str, Optional[str]], float] = None):
+        self.rates = dict(INITIAL_RATES if rates is None else rates)
+        self._lock = threading.Lock()
+
+    def estimate(self, key: Tuple[str, Optional[str]], mp: float) -> float:
+        with self._lock:
+            return self.rates.get(key, DEFAULT_RATE) * max(mp, MIN_MEGAPIXELS)
+
+    def observe(self, key: Tuple[str, Optional[str]], mp: float, seconds: float) -> None:
+        rate = seconds / max(mp, MIN_MEGAPIXELS)
+        with self._lock:
+            current = self.rates.get(key, DEFAULT_RATE)
+            self.rates[key] = current + EWMA_ALPHA * (rate - current)
+
+
+class CostScheduler:
+    """
+    Admits at most ``concurrency`` engine runs at a time. Waiting jobs are
+    started in order of estimated cost plus ``aging`` times their arrival
+    time, which is shortest-expected-job-first where every second spent
+    waiting counts against ``aging`` seconds of cost, so large jobs are
+    delayed by a bounded amount instead of starving. Runs on one event
+    loop.
+    """
+
+    def __init__(self, concurrency: int, aging: float = None, model: CostModel = None):
+        self.concurrency = concurrency
+        self.aging = SCHEDULER_AGING if aging is None else aging
+        self.model = model or CostModel()
+        self.running = 0
+        self.clock = time.monotonic
+        self._waiting: List[Tuple[float, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    @property
+    def enabled(self) -> bool:
+        return self.concurrency > 0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for _, _, waiter in self._waiting if not waiter.done())
+
+    def priority(self, cost: float, arrival: float) -> float:
+        return cost + self.aging * arrival
+
+    async def _acquire(self, cost: float) -> None:
+        if self.running < self.concurrency and not self.queued:
+            self.running += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (self.priority(cost, self.clock()), next(self._sequence), waiter))
+
+        deadline = current_deadline()
+        if deadline is not None:
+            deadline.on_cancel(lambda: waiter.done() or waiter.cancel())
+        remaining = deadline.remaining() if deadline is not None else None
+        try:
+            timeout = max(0.0, remaining) if remaining is not None else None
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as we gave up; hand it on
+                self._release()
+            else:
+                waiter.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                raise DeadlineExceeded("queue", "timeout")
+            if deadline is not None and deadline.expired:
+                raise DeadlineExceeded("queue", deadline.reason)
+            raise
+
+    def _release(self) -> None:
+        while self._waiting:
+            _, _, waiter = heapq.heappop(self._waiting)
+            if not waiter.done():
+                # The slot passes straight to the waiter
+                waiter.set_result(None)
+                return
+        self.running -= 1
+
+    @asynccontextmanager
+    async def slot(self, key: Tuple[str, Optional[str]], mp: float) -> AsyncIterator[float]:
+        """Waits for a turn, yields the cost estimate and learns from the run time."""
+        cost = self.model.estimate(key, mp)
+        if not self.enabled:
+            yield cost
+            return
+
+        queued_at = time.perf_counter()
+        await self._acquire(cost)
+        metrics.observe("scheduler_wait_seconds", time.perf_counter() - queued_at, endpoint=key[0])
+
+        started_at = time.perf_counter()
+        failed = False
+        try:
+            yield cost
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self._release()
+            if not failed:
+                self.model.observe(key, mp, time.perf_counter() - started_at)
+
+
+scheduler = CostScheduler(SCHEDULER_CONCURRENCY)
@@ -0,0 +1,99 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+import copy
+import hashlib
+
+from app.utils.deadline import Deadline, DeadlineExceeded, bind_deadline, current_deadline
+from app.utils.env import env_flag
+from app.utils.metrics import metrics
+
+# Identical requests arriving while the first is still running wait for it
+# instead of running their own Vision pass. 0 turns coalescing off.
+COALESCE_REQUESTS = env_flag("COALESCE_REQUESTS", True)
+
+
+def request_key(endpoint: str, data: bytes, **params) -> tuple:
+    """Content hash of the upload plus the parameters that change the result."""
+    return (endpoint, hashlib.sha256(data).hexdigest()) + tuple(sorted((k, repr(v)) for k, v in params.items()))
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task, deadline: Deadline):
+        self.task = task
+        self.deadline = deadline
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one computation per key at a time on the event loop.
+    Callers arriving while a computation for their key is in flight await
+    the same task and get a shallow copy of its result, so they can add
+    or delete keys without affecting each other.
+
+    The task runs under its own Deadline rather than the first caller's.
+    Each caller stops waiting when its own deadline expires or its client
+    disconnects; the shared Deadline is cancelled, dropping queued work,
+    only once the last caller has gone.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, _Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    def _start(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> _Flight:
+        deadline = Deadline()
+
+        async def shared():
+            # Set inside the task, so only the task's copy of the context sees it
+            bind_deadline(deadline)
+            return await compute()
+
+        flight = _Flight(asyncio.ensure_future(shared()), deadline)
+        self._inflight[key] = flight
+
+        def done(task: asyncio.Task) -> None:
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+            if not task.cancelled():
+                # Retrieved here in case every caller has already gone
+                task.exception()
+
+        flight.task.add_done_callback(done)
+        return flight
+
+    async def _wait(self, flight: _Flight) -> Any:
+        caller = current_deadline()
+        waiter = asyncio.shield(flight.task)
+        if caller is None:
+            return await waiter
+
+        caller.on_cancel(lambda: waiter.done() or waiter.cancel())
+        remaining = caller.remaining()
+        try:
+            return await asyncio.wait_for(waiter, timeout=max(0.0, remaining) if remaining is not None else None)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if isinstance(e, asyncio.TimeoutError) or caller.expired:
+                raise DeadlineExceeded("recognition", caller.reason or "timeout")
+            raise
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable[Any]], **labels) -> Any:
+        flight = self._inflight.get(key)
+        if flight is None or flight.deadline.expired:
+            # An abandoned run may still be finishing; it cannot be joined
+            flight = self._start(key, compute)
+        else:
+            metrics.increment("coalesced_requests", **labels)
+
+        flight.waiters += 1
+        try:
+            return copy.copy(await self._wait(flight))
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                flight.deadline.cancel()
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,142 @@
+from typing import Any, Dict, List, Optional, Union
+from xml.sax.saxutils import escape
+from PIL import Image, ImageDraw
+
+from app.utils.deadline import deadline_expired
+
+OVERLAY_STYLES = {
+    "ocr": {"color": "red", "width": 2},
+    "face": {"color": (0, 255, 0), "width": 3},
+    "card": {"color": (0, 255, 0), "width": 4},
+}
+
+OVERLAY_FORMATS = ("json", "svg")
+
+
+def build_overlay(kind: str, width: int, height: int, boxes: List[List[float]],
+                  labels: List[str], confidences: List[Optional[float]]) -> Dict[str, Any]:
+    """
+    Overlays are stored column-wise: ``boxes`` holds pixel x, y, width, height
+    with a top-left origin and ``labels``/``confidences`` line up with it.
+    """
+    return {
+        "kind": kind,
+        "width": int(width),
+        "height": int(height),
+        "boxes": [[round(float(v), 2) for v in box] for box in boxes],
+        "labels": list(labels),
+        "confidences": [round(float(c), 4) if c is not None else None for c in confidences],
+    }
+
+
+def ocr_overlay(observations, width: int, height: int) -> Dict[str, Any]:
+    return build_overlay("ocr", width, height, observations.boxes.tolist(),
+                         observations.texts, observations.confidences.tolist())
+
+
+def face_overlay(faces: List[Dict[str, Any]], width: int, height: int) -> Dict[str, Any]:
+    boxes = []
+    labels = []
+    confidences = []
+    for face in faces:
+        # Face boxes are normalized with a bottom-left origin
+        bbox = face["bbox"]
+        x = int(bbox["x"] * width)
+        y = int(bbox["y"] * height)
+        w = int(bbox["width"] * width)
+        h = int(bbox["height"] * height)
+        boxes.append([x, height - y - h, w, h])
+        score = face["quality_score"]
+        labels.append(f"Q: {score:.2f}" if score is not None else "Q: -")
+        confidences.append(score)
+    return build_overlay("face", width, height, boxes, labels, confidences)
+
+
+def card_overlay(cards: List[Dict[str, Any]], width: int, height: int) -> Dict[str, Any]:
+    boxes = []
+    labels = []
+    confidences = []
+    for card in cards:
+        pos = card["position"]
+        boxes.append([pos["x"], pos["y"], pos["width"], pos["height"]])
+        labels.append(f"Confidence: {card['confidence']:.2f}")
+        confidences.append(card["confidence"])
+    return build_overlay("card", width, height, boxes, labels, confidences)
+
+
+def _label_offset(kind: str, box_height: float) -> float:
+    if kind == "face":
+        return max(10, int(box_height / 10)) + 5
+    if kind == "card":
+        return 20
+    return 10
+
+
+def _label_text(kind: str, label: str) -> str:
+    if kind == "ocr" and len(label) > 10:
+        return label[:10] + "..."
+    return label
+
+
+def render_overlay(image: Image.Image, overlay: Dict[str, Any]) -> Image.Image:
+    kind = overlay["kind"]
+    style = OVERLAY_STYLES.get(kind, OVERLAY_STYLES["ocr"])
+
+    output_image = image.copy()
+    draw = ImageDraw.Draw(output_image)
+
+    for (x, y, w, h), label in zip(overlay["boxes"], overlay["labels"]):
+        draw.rectangle([x, y, x + w, y + h], outline=style["color"], width=style["width"])
+        if label:
+            draw.text((x, y - _label_offset(kind, h)), _label_text(kind, label), fill=style["color"])
+
+    return output_image
+
+
+def maybe_render(image: Image.Image, overlay: Dict[str, Any], visualize: bool) -> Optional[Image.Image]:
+    """
+    The overlay drawn on a copy of ``image`` when ``visualize`` is set, or
+    None. A request that is already out of time is not worth drawing for.
+    """
+    if visualize and not deadline_expired():
+        return render_overlay(image, overlay)
+    return None
+
+
+def _svg_color(color) -> str:
+    if isinstance(color, tuple):
+        return "rgb({},{},{})".format(*color)
+    return color
+
+
+def overlay_to_svg(overlay: Dict[str, Any]) -> str:
+    """
+    The SVG shares the image's pixel coordinate space, so clients can stack
+    it over the original image at any display size.
+    """
+    kind = overlay["kind"]
+    style = OVERLAY_STYLES.get(kind, OVERLAY_STYLES["ocr"])
+    color = _svg_color(style["color"])
+    width = overlay["width"]
+    height = overlay["height"]
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}">',
+        f'<g fill="none" stroke="{color}" stroke-width="{style["width"]}">',
+    ]
+    for x, y, w, h in overlay["boxes"]:
+        parts.append(f'<rect x="{x}" y="{y}" width="{w}" height="{h}"/>')
+    parts.append(f'</g><g fill="{color}" font-family="sans-serif" font-size="12">')
+    for (x, y, w, h), label in zip(overlay["boxes"], overlay["labels"]):
+        if label:
+            parts.append(f'<text x="{x}" y="{y - _label_offset(kind, h) + 10}">'
+                         f'{escape(_label_text(kind, label))}</text>')
+    parts.append("</g></svg>")
+    return "".join(parts)
+
+
+def format_overlay(overlay: Dict[str, Any], overlay_format: str) -> Union[Dict[str, Any], str]:
+    if overlay_format == "svg":
+        return overlay_to_svg(overlay)
+    return overlay
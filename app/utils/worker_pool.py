@@ -0,0 +1,262 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import os
+import pickle
+import sys
+import threading
+
+from PIL import Image, ImageFile
+
+from app.utils.deadline import Deadline, DeadlineExceeded, bind_deadline, reset_deadline, current_deadline
+from app.utils.metrics import metrics
+from app.utils.request_logging import get_logger
+
+log = get_logger(__name__)
+
+# inline runs engine functions in the API process; process hands them to a
+# pool of worker processes through shared memory
+WORKER_MODE = os.environ.get("WORKER_MODE", "inline")
+WORKER_PROCESSES = int(os.environ.get("WORKER_PROCESSES", "0")) or os.cpu_count() or 1
+WORKER_MAX_TASKS = int(os.environ.get("WORKER_MAX_TASKS", "200"))
+WORKER_MAX_RSS_MB = int(os.environ.get("WORKER_MAX_RSS_MB", "1024"))
+# Vision and Core Image do not survive fork, so workers start fresh
+WORKER_START_METHOD = os.environ.get("WORKER_START_METHOD", "spawn")
+
+# Modes Pillow can map onto a buffer without copying. RGB is stored with a
+# padding byte per pixel internally, so it is shared as opaque RGBA.
+SHARED_MODES = ("RGBA", "L")
+BYTES_PER_PIXEL = {"RGBA": 4, "L": 1}
+# Private Pillow hook for block-wise raw encoding; None on a Pillow without it
+_getencoder = getattr(Image, "_getencoder", None)
+
+
+def _pack_into(image: Image.Image, mode: str, buffer: memoryview) -> None:
+    """
+    Writes the pixels of ``image`` as raw ``mode`` straight into ``buffer``,
+    a block at a time, so no full-size bytes object is built on the way.
+    This drives Pillow's private raw encoder; a Pillow without it falls
+    back to one tobytes() copy.
+    """
+    if not image.width or not image.height:
+        return
+    image.load()
+    encoder = _getencoder(image.mode, "raw", mode) if _getencoder is not None else None
+    if not hasattr(encoder, "setimage"):
+        data = image.tobytes("raw", mode)
+        buffer[:len(data)] = data
+        return
+    encoder.setimage(image.im, (0, 0) + image.size)
+    block = max(ImageFile.MAXBLOCK, image.width * 4)
+    offset = 0
+    while True:
+        _, status, data = encoder.encode(block)
+        buffer[offset:offset + len(data)] = data
+        offset += len(data)
+        if status:
+            break
+    if status < 0:
+        raise RuntimeError(f"encoder error {status} while sharing image")
+
+
+def share_image(image: Image.Image) -> Tuple[Dict[str, Any], shared_memory.SharedMemory]:
+    """
+    Copies ``image`` into a new shared memory block. Returns a picklable
+    handle for attach_image and the block, which the caller must release.
+    """
+    source_mode = image.mode
+    if image.mode not in SHARED_MODES and image.mode != "RGB":
+        image = image.convert("RGBA")
+    # RGB packs to RGBA directly from its padded storage, alpha 255
+    mode = image.mode if image.mode in SHARED_MODES else "RGBA"
+    shm = shared_memory.SharedMemory(create=True, size=max(1, image.width * image.height * BYTES_PER_PIXEL[mode]))
+    try:
+        _pack_into(image, mode, shm.buf)
+    except BaseException:
+        release_image(shm)
+        raise
+    handle = {"name": shm.name, "mode": mode, "size": image.size, "source_mode": source_mode}
+    return handle, shm
+
+
+def attach_image(handle: Dict[str, Any]) -> Tuple[Image.Image, shared_memory.SharedMemory]:
+    """Maps a shared image without copying; the image is read-only."""
+    shm = shared_memory.SharedMemory(name=handle["name"])
+    mode = handle["mode"]
+    image = Image.frombuffer(mode, tuple(handle["size"]), shm.buf, "raw", mode, 0, 1)
+    return image, shm
+
+
+def release_image(shm: shared_memory.SharedMemory) -> None:
+    shm.close()
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def restore_mode(value: Any, source_mode: str) -> Any:
+    """Converts RGBA images in a result back to RGB when the input was RGB."""
+    if isinstance(value, Image.Image):
+        return value.convert("RGB") if source_mode == "RGB" and value.mode == "RGBA" else value
+    if isinstance(value, dict):
+        return {key: restore_mode(item, source_mode) for key, item in value.items()}
+    if isinstance(value, list):
+        return [restore_mode(item, source_mode) for item in value]
+    return value
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes (peak RSS where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and kilobytes on Linux
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _run_job(fn: Callable, handle: Dict[str, Any], args: Tuple, kwargs: Dict[str, Any],
+             expires_at: Optional[float] = None) -> Tuple[bytes, int]:
+    deadline = Deadline(expires_at)
+    # Jobs that waited in the queue past their request's deadline are dropped
+    deadline.check("queue")
+    token = bind_deadline(deadline)
+    image, shm = attach_image(handle)
+    try:
+        result = restore_mode(fn(image, *args, **kwargs), handle["source_mode"])
+        # Pickle before detaching: the result may still reference the mapping
+        payload = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+    finally:
+        reset_deadline(token)
+        result = image = None
+        try:
+            shm.close()
+        except BufferError:
+            # Something kept a view of the buffer; it goes away with the worker
+            pass
+    return payload, current_rss()
+
+
+class WorkerPool:
+    """
+    Runs engine functions on images in worker processes. The API process
+    copies each image into shared memory once and workers map it directly,
+    so the pixels never go through a pipe.
+
+    Each worker is its own single-process executor, so one can be replaced
+    without restarting the others: after ``max_tasks`` jobs, when it reports
+    more than ``max_rss_mb`` resident, or when it dies. Jobs already queued
+    on a retired worker still finish. New jobs go to the worker with the
+    fewest outstanding.
+
+    ``fn`` must be a module-level function taking the image first.
+    """
+
+    def __init__(self, processes: int = None, max_tasks: int = None, max_rss_mb: int = None,
+                 start_method: str = None):
+        self.processes = processes or WORKER_PROCESSES
+        self.max_tasks = WORKER_MAX_TASKS if max_tasks is None else max_tasks
+        self.max_rss = (WORKER_MAX_RSS_MB if max_rss_mb is None else max_rss_mb) * 1024 * 1024
+        self.start_method = start_method or WORKER_START_METHOD
+        self.recycles = 0
+        self._lock = threading.Lock()
+        self._workers: List[Optional[ProcessPoolExecutor]] = [None] * self.processes
+        self._jobs = [0] * self.processes
+        self._pending = [0] * self.processes
+
+    def _acquire_worker(self) -> Tuple[int, ProcessPoolExecutor, bool]:
+        """The least busy worker, and whether this job uses up its task budget."""
+        with self._lock:
+            index = min(range(self.processes), key=self._pending.__getitem__)
+            if self._workers[index] is None:
+                self._workers[index] = ProcessPoolExecutor(max_workers=1, mp_context=get_context(self.start_method))
+                self._jobs[index] = 0
+            self._jobs[index] += 1
+            self._pending[index] += 1
+            exhausted = bool(self.max_tasks) and self._jobs[index] >= self.max_tasks
+            return index, self._workers[index], exhausted
+
+    def _finished(self, index: int) -> None:
+        with self._lock:
+            self._pending[index] -= 1
+
+    def recycle(self, index: int, executor: ProcessPoolExecutor, reason: str) -> None:
+        """Retires one worker; the next job sent to its slot starts a fresh process."""
+        with self._lock:
+            if self._workers[index] is not executor:
+                return
+            self._workers[index] = None
+            self.recycles += 1
+        metrics.increment("worker_pool_recycled", reason=reason)
+        log.info("worker_recycled", reason=reason, worker=index, recycles=self.recycles)
+        executor.shutdown(wait=False)
+
+    def submit(self, fn: Callable, image: Image.Image, *args, **kwargs) -> Future:
+        deadline = current_deadline()
+        handle, shm = share_image(image)
+        index = None
+        try:
+            index, executor, exhausted = self._acquire_worker()
+            job = executor.submit(_run_job, fn, handle, args, kwargs, deadline.expires_at if deadline else None)
+        except BaseException:
+            if index is not None:
+                self._finished(index)
+            release_image(shm)
+            raise
+        if exhausted:
+            self.recycle(index, executor, "max_tasks")
+        if deadline is not None:
+            # A disconnected client drops the job if it has not started yet
+            deadline.on_cancel(job.cancel)
+
+        result = Future()
+
+        def finish(job: Future) -> None:
+            release_image(shm)
+            self._finished(index)
+            if job.cancelled():
+                result.set_exception(DeadlineExceeded("queue", deadline.reason if deadline else "cancelled"))
+                return
+            try:
+                payload, rss = job.result()
+            except BrokenProcessPool as e:
+                self.recycle(index, executor, "broken")
+                result.set_exception(e)
+                return
+            except BaseException as e:
+                result.set_exception(e)
+                return
+            if self.max_rss and rss > self.max_rss:
+                self.recycle(index, executor, "rss")
+            try:
+                result.set_result(pickle.loads(payload))
+            except BaseException as e:
+                result.set_exception(e)
+
+        job.add_done_callback(finish)
+        return result
+
+    def call(self, fn: Callable, image: Image.Image, *args, **kwargs) -> Any:
+        return self.submit(fn, image, *args, **kwargs).result()
+
+    async def run(self, fn: Callable, image: Image.Image, *args, **kwargs) -> Any:
+        return await asyncio.wrap_future(self.submit(fn, image, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executors, self._workers = self._workers, [None] * self.processes
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=wait)
+
+
+worker_pool = WorkerPool()
+
+
+def process_mode() -> bool:
+    return WORKER_MODE == "process"
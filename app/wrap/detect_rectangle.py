@@ -3,10 +3,20 @@ from Cocoa import CIImage
 from Quartz import CIVector
 from Foundation import NSError
 import objc
-import math
+import logging
+import numpy as np
 
-def detect_document_edges(image: CIImage):
-  
+from app.wrap.geometry import Quad, point_xy, score_quads, best_quad_index
+from app.utils.request_logging import get_logger
+
+log = get_logger(__name__)
+
+def detect_document_edges(image: CIImage, full_size=None):
+    """
+    ``image`` may be a downscaled proxy; corners are returned in pixels of
+    ``full_size`` (width, height) when given, else of ``image`` itself.
+    Vision's normalized coordinates make the mapping a plain rescale.
+    """
     try:
         handler = VNImageRequestHandler.alloc().initWithCIImage_options_(image, None)
         
@@ -22,201 +32,97 @@ def detect_document_edges(image: CIImage):
         
         if not success:
             if error_ptr is not objc.nil:
-                print(f"Vision request failed: {error_ptr}")
+                log.warning("rectangle_request_failed", error=error_ptr)
             raise ValueError("Document edge detection failed")
 
         results = request.results()
         if results and len(results) > 0:
-            print(f"Found {len(results)} rectangles")
+            log.debug("rectangles_found", count=len(results))
             
             best_observation = find_best_rectangle(results, image)
             
             if best_observation is None:
-                print("No reliable document rectangle found")
+                log.info("rectangle_not_reliable")
                 raise ValueError("No reliable document rectangle detected")
 
-            img_width = image.extent().size.width
-            img_height = image.extent().size.height
+            img_width, img_height = full_size or (image.extent().size.width, image.extent().size.height)
             
-            points = vision_to_ci_points(best_observation, img_width, img_height)
-            top_left, top_right, bottom_right, bottom_left = points
+            quad = Quad.from_vision(observation_corners(best_observation), img_width, img_height)
             
-            print(f"Document detection points: TL=({top_left.X()},{top_left.Y()}), " 
-                  f"TR=({top_right.X()},{top_right.Y()}), "
-                  f"BR=({bottom_right.X()},{bottom_right.Y()}), "
-                  f"BL=({bottom_left.X()},{bottom_left.Y()})")
-                  
-            is_valid = validate_quadrilateral(top_left, top_right, bottom_right, bottom_left, img_width, img_height)
+            log.debug("rectangle_detected", corners=quad.points)
             
-            if not is_valid:
-                print("Warning: Detected quadrilateral seems incorrect, using default rectangle")
+            reason = quad.validation_error(img_width, img_height)
+            if reason is not None:
+                log.info("rectangle_rejected", reason=reason, corners=quad.points)
                 return create_default_rectangle(img_width, img_height)
 
-            points = ensure_clockwise_order(top_left, top_right, bottom_right, bottom_left)
-            
-            return points
+            return quad_to_ci_vectors(quad.clockwise())
         else:
-            print("No rectangles detected")
+            log.info("rectangles_not_found")
             raise ValueError("Document edges not found in the image")
 
     except Exception as e:
-        print(f"Error detecting document edges: {str(e)}")
+        log.info("document_edges_fallback", error=str(e))
+        if full_size is not None:
+            return create_default_rectangle(*full_size)
         if hasattr(image, 'extent') and callable(image.extent):
             return create_default_rectangle(image.extent().size.width, image.extent().size.height)
         else:
-            print("Unable to get image dimensions, using fallback values")
+            log.warning("image_dimensions_unavailable")
             return create_default_rectangle(1000, 1000)  # Fallback dimensions
 
+def observation_corners(observation):
+    return [point_xy(corner) for corner in (observation.topLeft(), observation.topRight(),
+                                            observation.bottomRight(), observation.bottomLeft())]
+
+def quad_to_ci_vectors(quad: Quad):
+    return tuple(CIVector.vectorWithX_Y_(float(x), float(y)) for x, y in quad.points)
+
 def find_best_rectangle(observations, image):
-    best_observation = None
-    highest_score = 0.0
+    if not observations:
+        return None
     
-    img_width = image.extent().size.width
-    img_height = image.extent().size.height
-    img_area = img_width * img_height
+    corners = np.array([observation_corners(observation) for observation in observations])
+    confidences = np.array([observation.confidence() for observation in observations])
     
-    for observation in observations:
-        confidence = observation.confidence()
-        
-        top_left = observation.topLeft()
-        top_right = observation.topRight()
-        bottom_right = observation.bottomRight()
-        bottom_left = observation.bottomLeft()
-        
-        width = ((top_right.x - top_left.x) + (bottom_right.x - bottom_left.x)) / 2
-        height = ((bottom_left.y - top_left.y) + (bottom_right.y - top_right.y)) / 2
-        
-        area = width * height
-        
-        center_x = (top_left.x + top_right.x + bottom_right.x + bottom_left.x) / 4
-        center_y = (top_left.y + top_right.y + bottom_right.y + bottom_left.y) / 4
-        
-        dist_from_center = math.sqrt((center_x - 0.5)**2 + (center_y - 0.5)**2)
-        
-        confidence_score = confidence
-        
-        size_score = area * 2  #
-        
-        center_score = 1.0 - min(dist_from_center * 2, 0.8)  
-        
-        aspect = max(width, height) / min(width, height) if min(width, height) > 0 else 999
-        shape_score = 0.0
-        for target_ratio in [1.414, 1.5, 1.33, 1.77]:
-            ratio_diff = abs(aspect - target_ratio)
-            if ratio_diff < 0.5:  
-                shape_score = max(shape_score, 1.0 - ratio_diff)
-        
-        combined_score = (
-            confidence_score * 0.3 +  
-            size_score * 0.4 +        
-            center_score * 0.2 +      
-            shape_score * 0.1         
-        )
-        
-        print(f"Rectangle: confidence={confidence:.2f}, area={area:.4f}, center_dist={dist_from_center:.2f}, " +
-              f"aspect={aspect:.2f}, score={combined_score:.4f}")
-        
-        if combined_score > highest_score:
-            highest_score = combined_score
-            best_observation = observation
+    scored = score_quads(corners, confidences)
+    
+    if log.is_enabled(logging.DEBUG):
+        for i in range(len(confidences)):
+            log.debug("rectangle_scored", confidence=confidences[i], area=scored["area"][i],
+                      center_distance=scored["center_distance"][i], aspect=scored["aspect"][i],
+                      score=scored["score"][i])
     
-    if best_observation:
-        print(f"Selected best rectangle with score={highest_score:.4f}")
+    best_index = best_quad_index(scored["score"])
+    if best_index is None:
+        return None
     
-    return best_observation
+    log.debug("rectangle_selected", index=best_index, score=scored["score"][best_index])
+    return observations[best_index]
 
 def vision_to_ci_points(observation, img_width, img_height):
-    def vision_to_ci_point(point, width, height):
-        x = point.x * width
-        y = (1.0 - point.y) * height  
-        return CIVector.vectorWithX_Y_(x, y)
-
-    top_left = vision_to_ci_point(observation.topLeft(), img_width, img_height)
-    top_right = vision_to_ci_point(observation.topRight(), img_width, img_height)
-    bottom_right = vision_to_ci_point(observation.bottomRight(), img_width, img_height)
-    bottom_left = vision_to_ci_point(observation.bottomLeft(), img_width, img_height)
-    
-    return top_left, top_right, bottom_right, bottom_left
+    return quad_to_ci_vectors(Quad.from_vision(observation_corners(observation), img_width, img_height))
 
 def ensure_clockwise_order(tl, tr, br, bl):
-  
-    def cross_product(p1, p2, p3):
-        return (p2.X() - p1.X()) * (p3.Y() - p1.Y()) - (p2.Y() - p1.Y()) * (p3.X() - p1.X())
-    
-    cp = cross_product(tl, tr, br)
+    corners = (tl, tr, br, bl)
+    order = Quad.from_points(*corners).clockwise_order()
     
-    if cp >= 0:  
-        print("Points are in clockwise order")
-        return (tl, tr, br, bl)
-    else:  
-        print("Points are in counter-clockwise order, reversing...")
-        return (bl, tl, tr, br)  
+    log.debug("corner_order", clockwise=order == (0, 1, 2, 3))
+    return tuple(corners[i] for i in order)
 
 def validate_quadrilateral(tl, tr, br, bl, img_width, img_height):
-   
-    def distance(p1, p2):
-        return ((p1.X() - p2.X())**2 + (p1.Y() - p2.Y())**2)**0.5
-    
-    margin = 0.25  
-    for point in [tl, tr, br, bl]:
-        if (point.X() < -margin * img_width or point.X() > img_width * (1 + margin) or
-            point.Y() < -margin * img_height or point.Y() > img_height * (1 + margin)):
-            print(f"Point {point.X()},{point.Y()} is outside image bounds")
-            return False
-    
-    top = distance(tl, tr)
-    right = distance(tr, br)
-    bottom = distance(br, bl)
-    left = distance(bl, tl)
-    
-    min_side_ratio = 0.05  
-    min_side_length = min(img_width, img_height) * min_side_ratio
-    
-    if min(top, right, bottom, left) < min_side_length:
-        print(f"One side is too small: {min(top, right, bottom, left)} < {min_side_length}")
-        return False
-    
-    
-    aspect_ratio_max = 10.0  
-    width_avg = (top + bottom) / 2
-    height_avg = (left + right) / 2
-    
-    if max(width_avg / height_avg if height_avg > 0 else 999, 
-           height_avg / width_avg if width_avg > 0 else 999) > aspect_ratio_max:
-        print(f"Aspect ratio is extreme")
-        return False
-    
-    area = calculate_quadrilateral_area(tl, tr, br, bl)
-    min_area_ratio = 0.01  
-    min_area = img_width * img_height * min_area_ratio
-    
-    if area < min_area:
-        print(f"Quadrilateral area is too small: {area} < {min_area}")
+    reason = Quad.from_points(tl, tr, br, bl).validation_error(img_width, img_height)
+    if reason is not None:
+        log.info("rectangle_rejected", reason=reason)
         return False
-    
     return True
 
 def calculate_quadrilateral_area(p1, p2, p3, p4):
-    
-    def triangle_area(a, b, c):
-        return 0.5 * abs((b.X() - a.X()) * (c.Y() - a.Y()) - (c.X() - a.X()) * (b.Y() - a.Y()))
-    
-    area1 = triangle_area(p1, p2, p3)
-    area2 = triangle_area(p1, p3, p4)
-    return area1 + area2
+    return Quad.from_points(p1, p2, p3, p4).area()
 
 def create_default_rectangle(img_width, img_height):
-  
-    margin = 0.05  
-    top_left = CIVector.vectorWithX_Y_(img_width * margin, img_height * margin)
-    top_right = CIVector.vectorWithX_Y_(img_width * (1 - margin), img_height * margin)
-    bottom_right = CIVector.vectorWithX_Y_(img_width * (1 - margin), img_height * (1 - margin))
-    bottom_left = CIVector.vectorWithX_Y_(img_width * margin, img_height * (1 - margin))
+    quad = Quad.default(img_width, img_height)
+    
+    log.debug("default_rectangle", corners=quad.points)
     
-    print("Using default rectangle points")
-    print(f"Default rectangle: TL=({top_left.X()},{top_left.Y()}), " 
-          f"TR=({top_right.X()},{top_right.Y()}), "
-          f"BR=({bottom_right.X()},{bottom_right.Y()}), "
-          f"BL=({bottom_left.X()},{bottom_left.Y()})")
-          
-    return top_left, top_right, bottom_right, bottom_left
\ No newline at end of file
+    return quad_to_ci_vectors(quad)
@@ -1,7 +1,12 @@
-from Cocoa import CIImage, CIFilter
+from Cocoa import CIImage
 from Foundation import NSNumber
 import objc
 
+from app.utils.image_processing import render_cache
+from app.utils.request_logging import get_logger
+
+log = get_logger(__name__)
+
 def enhance_image(image: CIImage):
    
     if image is None:
@@ -11,7 +16,7 @@ def enhance_image(image: CIImage):
         enhanced_image = image
         
         # Sharpen image - try UnsharpMask first, fall back to SharpenLuminance
-        unsharp = CIFilter.filterWithName_("CIUnsharpMask")
+        unsharp = render_cache.filter("CIUnsharpMask")
         if unsharp is not None:
             unsharp.setValue_forKey_(enhanced_image, "inputImage")
             unsharp.setValue_forKey_(NSNumber.numberWithFloat_(0.7), "inputRadius")     
@@ -21,7 +26,7 @@ def enhance_image(image: CIImage):
             if output is not None:
                 enhanced_image = output
         else:
-            sharpen = CIFilter.filterWithName_("CISharpenLuminance")
+            sharpen = render_cache.filter("CISharpenLuminance")
             if sharpen is not None:
                 sharpen.setValue_forKey_(enhanced_image, "inputImage")
                 sharpen.setValue_forKey_(NSNumber.numberWithFloat_(0.6), "inputSharpness")
@@ -31,7 +36,7 @@ def enhance_image(image: CIImage):
                     enhanced_image = output
         
         # Noise reduction
-        noise_filter = CIFilter.filterWithName_("CINoiseReduction")
+        noise_filter = render_cache.filter("CINoiseReduction")
         if noise_filter is not None:
             noise_filter.setValue_forKey_(enhanced_image, "inputImage")
             noise_filter.setValue_forKey_(NSNumber.numberWithFloat_(0.02), "inputNoiseLevel")  
@@ -45,5 +50,5 @@ def enhance_image(image: CIImage):
         return enhanced_image
     
     except Exception as e:
-        print(f"Error enhancing image: {str(e)}")
+        log.warning("enhance_failed", error=str(e))
         return image
\ No newline at end of file
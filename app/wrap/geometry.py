@@ -0,0 +1,416 @@
+from typing import Any, Dict, Optional, Sequence, Tuple
+import numpy as np
+
+# Corner order used everywhere in app/wrap: top-left, top-right,
+# bottom-right, bottom-left.
+TL, TR, BR, BL = 0, 1, 2, 3
+
+DOCUMENT_ASPECT_RATIOS = (1.414, 1.5, 1.33, 1.77)
+
+
+def point_xy(point: Any) -> Tuple[float, float]:
+    """Reads x, y from a CIVector, CGPoint/VNPoint, dict or sequence."""
+    if hasattr(point, "X") and callable(point.X):
+        return float(point.X()), float(point.Y())
+    if hasattr(point, "x") and hasattr(point, "y"):
+        x, y = point.x, point.y
+        return float(x() if callable(x) else x), float(y() if callable(y) else y)
+    if isinstance(point, dict) and "x" in point and "y" in point:
+        return float(point["x"]), float(point["y"])
+    if hasattr(point, "__len__") and len(point) >= 2:
+        return float(point[0]), float(point[1])
+    raise TypeError(f"Unknown point type: {type(point)}")
+
+
+def _as_batch(quads) -> np.ndarray:
+    quads = np.asarray(quads, dtype=np.float64)
+    if quads.ndim == 2:
+        quads = quads[None]
+    if quads.shape[1:] != (4, 2):
+        raise ValueError(f"Expected quads of shape (n, 4, 2), got {quads.shape}")
+    return quads
+
+
+def side_lengths(quads) -> np.ndarray:
+    """(n, 4) lengths of the top, right, bottom and left sides."""
+    quads = _as_batch(quads)
+    return np.stack([
+        np.linalg.norm(quads[:, TR] - quads[:, TL], axis=1),
+        np.linalg.norm(quads[:, BR] - quads[:, TR], axis=1),
+        np.linalg.norm(quads[:, BR] - quads[:, BL], axis=1),
+        np.linalg.norm(quads[:, BL] - quads[:, TL], axis=1),
+    ], axis=1)
+
+
+def dimensions(quads) -> np.ndarray:
+    """(n, 2) width and height, each the mean of the two opposite sides."""
+    sides = side_lengths(quads)
+    return np.stack([(sides[:, 0] + sides[:, 2]) / 2, (sides[:, 1] + sides[:, 3]) / 2], axis=1)
+
+
+def _cross(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    return (b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1]) - (b[:, 1] - a[:, 1]) * (c[:, 0] - a[:, 0])
+
+
+def areas(quads) -> np.ndarray:
+    """Sum of triangles (p1, p2, p3) and (p1, p3, p4), each taken as an absolute area."""
+    quads = _as_batch(quads)
+    return 0.5 * (np.abs(_cross(quads[:, TL], quads[:, TR], quads[:, BR]))
+                  + np.abs(_cross(quads[:, TL], quads[:, BR], quads[:, BL])))
+
+
+def clockwise(quads) -> np.ndarray:
+    """True where the turn tl → tr → br is clockwise in image coordinates."""
+    quads = _as_batch(quads)
+    return _cross(quads[:, TL], quads[:, TR], quads[:, BR]) >= 0
+
+
+def edge_angles(quads) -> np.ndarray:
+    """(n, 4) angles in degrees of tl→tr, tr→br, bl→br and tl→bl."""
+    quads = _as_batch(quads)
+    vectors = np.stack([
+        quads[:, TR] - quads[:, TL],
+        quads[:, BR] - quads[:, TR],
+        quads[:, BR] - quads[:, BL],
+        quads[:, BL] - quads[:, TL],
+    ], axis=1)
+    return np.degrees(np.arctan2(vectors[..., 1], vectors[..., 0]))
+
+
+def _safe_ratio(numerator: np.ndarray, denominator: np.ndarray, fallback: float) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1.0), fallback)
+
+
+def validate_quads(quads, img_width: float, img_height: float, margin: float = 0.25,
+                   min_side_ratio: float = 0.05, max_aspect_ratio: float = 10.0,
+                   min_area_ratio: float = 0.01) -> np.ndarray:
+    """Boolean mask of quads that pass all of Quad.validation_error's checks."""
+    quads = _as_batch(quads)
+    x = quads[..., 0]
+    y = quads[..., 1]
+    in_bounds = np.all((x >= -margin * img_width) & (x <= img_width * (1 + margin))
+                       & (y >= -margin * img_height) & (y <= img_height * (1 + margin)), axis=1)
+
+    sides = side_lengths(quads)
+    long_enough = sides.min(axis=1) >= min(img_width, img_height) * min_side_ratio
+
+    width = (sides[:, 0] + sides[:, 2]) / 2
+    height = (sides[:, 1] + sides[:, 3]) / 2
+    aspect = np.maximum(_safe_ratio(width, height, 999.0), _safe_ratio(height, width, 999.0))
+    aspect_ok = aspect <= max_aspect_ratio
+
+    large_enough = areas(quads) >= img_width * img_height * min_area_ratio
+
+    return in_bounds & long_enough & aspect_ok & large_enough
+
+
+def score_quads(quads, confidences) -> Dict[str, np.ndarray]:
+    """
+    Scores candidate rectangles in Vision's normalized coordinates, as
+    find_best_rectangle always has. Width and height are the signed means
+    of the opposite edges' x and y extents, so with Vision's bottom-left
+    origin height (and therefore area) are usually negative and the aspect
+    falls back to 999; that is kept so rankings do not change.
+    """
+    quads = _as_batch(quads)
+    confidences = np.asarray(confidences, dtype=np.float64).reshape(-1)
+
+    width = ((quads[:, TR, 0] - quads[:, TL, 0]) + (quads[:, BR, 0] - quads[:, BL, 0])) / 2
+    height = ((quads[:, BL, 1] - quads[:, TL, 1]) + (quads[:, BR, 1] - quads[:, TR, 1])) / 2
+    area = width * height
+
+    center = quads.mean(axis=1)
+    center_distance = np.hypot(center[:, 0] - 0.5, center[:, 1] - 0.5)
+
+    shorter = np.minimum(width, height)
+    aspect = _safe_ratio(np.maximum(width, height), shorter, 999.0)
+
+    ratio_diff = np.abs(aspect[:, None] - np.asarray(DOCUMENT_ASPECT_RATIOS)[None, :])
+    shape_score = np.where(ratio_diff < 0.5, 1.0 - ratio_diff, 0.0).max(axis=1).clip(min=0.0)
+
+    size_score = area * 2
+    center_score = 1.0 - np.minimum(center_distance * 2, 0.8)
+
+    score = confidences * 0.3 + size_score * 0.4 + center_score * 0.2 + shape_score * 0.1
+
+    return {
+        "area": area,
+        "center_distance": center_distance,
+        "aspect": aspect,
+        "score": score,
+    }
+
+
+def best_quad_index(scores: np.ndarray) -> Optional[int]:
+    """Index of the first highest score, or None unless it is positive."""
+    if len(scores) == 0:
+        return None
+    index = int(np.argmax(scores))
+    return index if scores[index] > 0.0 else None
+
+
+class Quad:
+    """
+    A quadrilateral as a (4, 2) float array in tl, tr, br, bl order.
+
+    All document geometry in app/wrap goes through this type; CIVectors
+    are only created when a filter needs them.
+    """
+
+    __slots__ = ("points",)
+
+    def __init__(self, points):
+        self.points = np.asarray(points, dtype=np.float64).reshape(4, 2)
+
+    @classmethod
+    def from_points(cls, top_left, top_right, bottom_right, bottom_left) -> "Quad":
+        return cls([point_xy(p) for p in (top_left, top_right, bottom_right, bottom_left)])
+
+    @classmethod
+    def from_vision(cls, normalized: Sequence, width: float, height: float) -> "Quad":
+        """Converts Vision's normalized bottom-left-origin corners to pixels."""
+        points = np.asarray(normalized, dtype=np.float64).reshape(4, 2)
+        return cls(np.column_stack([points[:, 0] * width, (1.0 - points[:, 1]) * height]))
+
+    @classmethod
+    def default(cls, img_width: float, img_height: float, margin: float = 0.05) -> "Quad":
+        return cls([
+            [img_width * margin, img_height * margin],
+            [img_width * (1 - margin), img_height * margin],
+            [img_width * (1 - margin), img_height * (1 - margin)],
+            [img_width * margin, img_height * (1 - margin)],
+        ])
+
+    @property
+    def top_left(self) -> Tuple[float, float]:
+        return tuple(self.points[TL])
+
+    @property
+    def top_right(self) -> Tuple[float, float]:
+        return tuple(self.points[TR])
+
+    @property
+    def bottom_right(self) -> Tuple[float, float]:
+        return tuple(self.points[BR])
+
+    @property
+    def bottom_left(self) -> Tuple[float, float]:
+        return tuple(self.points[BL])
+
+    def side_lengths(self) -> np.ndarray:
+        return side_lengths(self.points)[0]
+
+    def dimensions(self) -> Tuple[float, float]:
+        width, height = dimensions(self.points)[0]
+        return float(width), float(height)
+
+    def aspect_ratio(self) -> float:
+        width, height = self.dimensions()
+        return max(width, height) / min(width, height) if min(width, height) > 0 else 1.0
+
+    def area(self) -> float:
+        return float(areas(self.points)[0])
+
+    def is_clockwise(self) -> bool:
+        return bool(clockwise(self.points)[0])
+
+    def clockwise_order(self) -> Tuple[int, int, int, int]:
+        """Corner indices that put this quad in clockwise order."""
+        return (TL, TR, BR, BL) if self.is_clockwise() else (BL, TL, TR, BR)
+
+    def clockwise(self) -> "Quad":
+        return Quad(self.points[list(self.clockwise_order())])
+
+    def edge_angles(self) -> np.ndarray:
+        return edge_angles(self.points)[0]
+
+    def orientation(self) -> Tuple[str, float]:
+        """
+        Returns (orientation, aspect_ratio) where orientation is one of
+        normal, upside_down, rotated_90_cw, rotated_90_ccw or check_rotation.
+        """
+        width, height = self.dimensions()
+        aspect_ratio = self.aspect_ratio()
+
+        top_angle, right_angle, bottom_angle, left_angle = self.edge_angles()
+        horizontal_angle = (top_angle + bottom_angle) / 2
+        vertical_angle = (right_angle + left_angle) / 2
+
+        # Upside down when the bottom edge sits above the top edge
+        top_y = (self.points[TL, 1] + self.points[TR, 1]) / 2
+        bottom_y = (self.points[BL, 1] + self.points[BR, 1]) / 2
+        if bottom_y < top_y:
+            return "upside_down", aspect_ratio
+
+        if abs(horizontal_angle) < 45 and abs(vertical_angle - 90) < 45:
+            orientation = "normal"
+        elif abs(horizontal_angle - 90) < 45 and abs(vertical_angle) < 45:
+            orientation = "rotated_90_ccw" if right_angle < 0 else "rotated_90_cw"
+        elif abs(horizontal_angle - 180) < 45 and abs(vertical_angle - 270) < 45:
+            orientation = "upside_down"
+        else:
+            orientation = "normal"
+
+        if orientation == "normal" and width > height and aspect_ratio > 1.3:
+            orientation = "check_rotation"
+
+        return orientation, aspect_ratio
+
+    def validation_error(self, img_width: float, img_height: float, margin: float = 0.25,
+                         min_side_ratio: float = 0.05, max_aspect_ratio: float = 10.0,
+                         min_area_ratio: float = 0.01) -> Optional[str]:
+        """Returns why the quad is not a plausible document, or None if it is."""
+        for x, y in self.points:
+            if (x < -margin * img_width or x > img_width * (1 + margin) or
+                    y < -margin * img_height or y > img_height * (1 + margin)):
+                return f"Point {x},{y} is outside image bounds"
+
+        sides = self.side_lengths()
+        min_side_length = min(img_width, img_height) * min_side_ratio
+        if sides.min() < min_side_length:
+            return f"One side is too small: {sides.min()} < {min_side_length}"
+
+        width = (sides[0] + sides[2]) / 2
+        height = (sides[1] + sides[3]) / 2
+        if max(width / height if height > 0 else 999, height / width if width > 0 else 999) > max_aspect_ratio:
+            return "Aspect ratio is extreme"
+
+        area = self.area()
+        min_area = img_width * img_height * min_area_ratio
+        if area < min_area:
+            return f"Quadrilateral area is too small: {area} < {min_area}"
+
+        return None
+
+    def is_valid(self, img_width: float, img_height: float, **limits) -> bool:
+        return self.validation_error(img_width, img_height, **limits) is None
+
+    def __repr__(self) -> str:
+        corners = ", ".join(f"({x:.1f}, {y:.1f})" for x, y in self.points)
+        return f"Quad({corners})"
+
+
+# --- Render planning -------------------------------------------------------
+#
+# Matrices are 3x3 in column-vector form, [[a, c, tx], [b, d, ty], [0, 0, 1]],
+# matching CGAffineTransformMake(a, b, c, d, tx, ty).
+
+PORTRAIT_RATIOS = (1.414, 1.59, 1.294)
+
+
+def affine_matrix(angle: float = 0.0, tx: float = 0.0, ty: float = 0.0) -> np.ndarray:
+    """Rotation by ``angle`` radians followed by a translation, like CGAffineTransformConcat(rotation, translation)."""
+    cos = np.cos(angle)
+    sin = np.sin(angle)
+    # Quarter turns come out exact instead of carrying 6e-17 into extents
+    return np.round(np.array([[cos, -sin, tx], [sin, cos, ty], [0.0, 0.0, 1.0]]), 12)
+
+
+def to_cg_affine(matrix: np.ndarray) -> Tuple[float, float, float, float, float, float]:
+    """(a, b, c, d, tx, ty) for CGAffineTransformMake."""
+    return (float(matrix[0, 0]), float(matrix[1, 0]), float(matrix[0, 1]),
+            float(matrix[1, 1]), float(matrix[0, 2]), float(matrix[1, 2]))
+
+
+def transform_extent(matrix: np.ndarray, width: float, height: float,
+                     origin: Tuple[float, float] = (0.0, 0.0)) -> Tuple[float, float, float, float]:
+    """Bounding box (x, y, width, height) of a rectangle after ``matrix``."""
+    x0, y0 = origin
+    corners = np.array([[x0, y0, 1], [x0 + width, y0, 1], [x0, y0 + height, 1], [x0 + width, y0 + height, 1]]).T
+    moved = (matrix @ corners)[:2]
+    low = moved.min(axis=1)
+    high = moved.max(axis=1)
+    return float(low[0]), float(low[1]), float(high[0] - low[0]), float(high[1] - low[1])
+
+
+def _needs_aspect_rotation(image_aspect: float, document_aspect: float) -> bool:
+    if (image_aspect < 1.0 and document_aspect > 1.3) or (image_aspect > 1.3 and document_aspect < 1.0):
+        return True
+    for ratio in PORTRAIT_RATIOS:
+        if abs(image_aspect - ratio) < 0.1:
+            return False
+        if abs(image_aspect - (1 / ratio)) < 0.1:
+            return True
+    return False
+
+
+def orientation_steps(orientation: str, document_aspect: float, width: float, height: float):
+    """
+    The quarter turns correct_perspective applies after CIPerspectiveCorrection:
+    first one for the detected orientation, then one more if the result's
+    aspect still disagrees with the document's. Returns a list of
+    (angle, tx, ty) steps and the final (width, height).
+    """
+    steps = []
+
+    def quarter_turn(angle, tx, ty):
+        nonlocal width, height
+        steps.append((angle, tx, ty))
+        if abs(angle) != np.pi:
+            width, height = height, width
+
+    if orientation == "upside_down":
+        quarter_turn(np.pi, width, height)
+    elif orientation == "rotated_90_cw":
+        quarter_turn(-np.pi / 2, 0.0, width)
+    elif orientation == "rotated_90_ccw":
+        quarter_turn(np.pi / 2, height, 0.0)
+    elif orientation == "check_rotation" and height > 0 and width / height > 1.3:
+        quarter_turn(np.pi / 2, height, 0.0)
+
+    image_aspect = width / height if height > 0 else 1.0
+    if _needs_aspect_rotation(image_aspect, document_aspect):
+        quarter_turn(np.pi / 2, height, 0.0)
+
+    return steps, (width, height)
+
+
+def plan_render(width: float, height: float, orientation: str, document_aspect: float,
+                output_width: Optional[int] = None, output_height: Optional[int] = None,
+                origin: Tuple[float, float] = (0.0, 0.0)) -> Dict[str, Any]:
+    """
+    Folds the orientation turns into one affine ``matrix`` (identity when no
+    turn is needed) and works out the Lanczos scale that lands the rotated
+    image on output_width x output_height. Resizing only happens when both
+    output dimensions are given.
+    """
+    matrix = affine_matrix(0.0, -origin[0], -origin[1])
+    steps, (rotated_width, rotated_height) = orientation_steps(orientation, document_aspect, width, height)
+    for angle, tx, ty in steps:
+        matrix = affine_matrix(angle, tx, ty) @ matrix
+
+    scale = None
+    output_size = (int(round(rotated_width)), int(round(rotated_height)))
+    if output_width and output_height and rotated_width > 0 and rotated_height > 0:
+        scale_y = output_height / rotated_height
+        scale_x = output_width / rotated_width
+        scale = {"scale": scale_y, "aspect_ratio": scale_x / scale_y}
+        output_size = (int(output_width), int(output_height))
+
+    return {
+        "matrix": matrix,
+        "identity": bool(np.allclose(matrix, np.eye(3))),
+        "turns": len(steps),
+        "rotated_size": (rotated_width, rotated_height),
+        "scale": scale,
+        "output_size": output_size,
+    }
+
+
+def perspective_coefficients(quad: "Quad", width: float, height: float) -> Tuple[float, ...]:
+    """
+    The eight coefficients of the homography taking the output rectangle
+    (0, 0)-(width, height) onto ``quad``, in the form PIL's
+    Image.transform(..., Image.PERSPECTIVE, ...) expects.
+    """
+    targets = quad.points
+    sources = np.array([[0.0, 0.0], [width, 0.0], [width, height], [0.0, height]])
+    system = np.zeros((8, 8))
+    rhs = np.zeros(8)
+    for i, ((x, y), (u, v)) in enumerate(zip(sources, targets)):
+        system[2 * i] = [x, y, 1, 0, 0, 0, -u * x, -u * y]
+        system[2 * i + 1] = [0, 0, 0, x, y, 1, -v * x, -v * y]
+        rhs[2 * i] = u
+        rhs[2 * i + 1] = v
+    return tuple(float(c) for c in np.linalg.solve(system, rhs))
@@ -0,0 +1,77 @@
+from Cocoa import CIImage
+from Quartz import CGRectMake
+from Foundation import NSNumber
+from PIL import Image
+from typing import Optional
+
+from app.wrap.correct_perspective import perspective_correction, plan_orientation, apply_affine
+from app.wrap.enhance_image import enhance_image
+from app.utils.image_processing import ci_to_pil_image, render_cache
+from app.utils.request_logging import get_logger
+
+log = get_logger(__name__)
+
+
+class PerspectivePipeline:
+    """
+    Perspective correction, orientation fix, enhancement and resize as one
+    Core Image graph. Nothing is rendered until render(), which produces the
+    final image at output_width x output_height in a single pass.
+    """
+
+    def __init__(self, image: CIImage, corners, output_width: Optional[int] = None,
+                 output_height: Optional[int] = None, enhance: bool = True):
+        self.image = image
+        self.corners = corners
+        self.output_width = output_width
+        self.output_height = output_height
+        self.enhance = enhance
+        self.plan = None
+
+    def build(self) -> CIImage:
+        """Returns the unrendered graph. Raises if perspective correction cannot be set up."""
+        corrected, quad = perspective_correction(self.image, *self.corners)
+        self.plan = plan_orientation(corrected, quad, self.output_width, self.output_height)
+
+        graph = apply_affine(corrected, self.plan["matrix"])
+        if self.enhance:
+            graph = enhance_image(graph)
+        width, height = (int(round(size)) for size in self.plan["rotated_size"])
+        if self.plan["scale"] is not None:
+            scaled = lanczos_scale(graph, self.plan["scale"]["scale"], self.plan["scale"]["aspect_ratio"])
+            if scaled is not graph:
+                graph = scaled
+                width, height = self.plan["output_size"]
+
+        # Sharpening and noise reduction sample past the edges; crop back to
+        # the planned rectangle so the render is the final size.
+        return graph.imageByCroppingToRect_(CGRectMake(0, 0, width, height))
+
+    def render(self, graph: Optional[CIImage] = None) -> Image.Image:
+        if graph is None:
+            graph = self.build()
+        result = ci_to_pil_image(graph)
+
+        output_size = self.plan["output_size"]
+        if result.size != output_size:
+            # Rounding of the Lanczos extent, or no Lanczos filter at all
+            log.debug("render_size_mismatch", rendered=result.size, expected=output_size)
+            result = result.resize(output_size, Image.LANCZOS)
+        return result
+
+
+def lanczos_scale(image: CIImage, scale: float, aspect_ratio: float) -> CIImage:
+    scaler = render_cache.filter("CILanczosScaleTransform")
+    if scaler is None:
+        log.warning("filter_unavailable", filter="CILanczosScaleTransform")
+        return image
+
+    scaler.setValue_forKey_(image, "inputImage")
+    scaler.setValue_forKey_(NSNumber.numberWithFloat_(scale), "inputScale")
+    scaler.setValue_forKey_(NSNumber.numberWithFloat_(aspect_ratio), "inputAspectRatio")
+
+    output = scaler.valueForKey_("outputImage")
+    if output is None:
+        log.warning("scale_failed", scale=scale, aspect_ratio=aspect_ratio)
+        return image
+    return output
@@ -0,0 +1,71 @@
+"""
+Benchmark document classification on large pages.
+
+Compares the previous per-pattern ``re.search`` loop with the compiled
+single-pass DocumentClassifier. The layout fallback dominates on pages
+with many elements and no primary keyword, which is the worst case.
+
+    python benchmarks/bench_document_classifier.py
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ocr.document_classifier import get_document_classifier
+
+
+def legacy_classify(text, text_elements):
+    text = text.lower()
+    for label, patterns in [
+        ("card_id", [r"บัตรประจำตัวประชาชน", r"identification card", r"thai national id",
+                     r"\d-\d{4}-\d{5}-\d{2}-\d", r"\d{13}"]),
+        ("passport", [r"passport", r"หนังสือเดินทาง", r"nationality", r"สัญชาติ"]),
+        ("driving_license", [r"driving licence", r"driver('s)? license", r"ใบอนุญาตขับขี่", r"ใบขับขี่"]),
+    ]:
+        for pattern in patterns:
+            if re.search(pattern, text):
+                return label
+    if text_elements and len(text_elements) > 5:
+        name_patterns = [r"name", r"ชื่อ", r"นาย", r"นาง", r"นางสาว"]
+        date_patterns = [r"เกิดวันที่", r"date of birth", r"issue", r"วันออกบัตร"]
+        for pattern in name_patterns + date_patterns:
+            for element in text_elements:
+                if re.search(pattern, element["text"].lower()):
+                    return "card_id"
+    return "unknown"
+
+
+def make_page(count, keyword=None):
+    elements = [{"text": f"ข้อความ ตัวอย่าง บรรทัดที่ {i} lorem ipsum dolor"} for i in range(count)]
+    if keyword:
+        elements[-1] = {"text": keyword}
+    return "\n".join(e["text"] for e in elements), elements
+
+
+def best_of(fn, *args, repeat=5):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    classifier = get_document_classifier()
+    print(f"{'elements':>10} {'case':>12} {'legacy ms':>10} {'compiled ms':>12} {'label':>10}")
+    for count in (100, 1000, 5000):
+        for case, keyword in (("no match", None), ("layout", "วันออกบัตร 1 ม.ค. 2560"), ("passport", "PASSPORT")):
+            text, elements = make_page(count, keyword)
+            legacy, legacy_time = best_of(legacy_classify, text, elements)
+            label, compiled_time = best_of(classifier.classify, text, elements)
+            assert legacy == label, (legacy, label)
+            print(f"{count:>10} {case:>12} {legacy_time * 1000:>10.2f} {compiled_time * 1000:>12.2f} {label:>10}")
+
+
+if __name__ == "__main__":
+    main()
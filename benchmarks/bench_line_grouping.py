@@ -0,0 +1,101 @@
+"""
+Benchmark line grouping for dense pages.
+
+Compares the NumPy sweep in app/ocr/line_grouping.py with the previous
+fixed-threshold grouping on synthetic pages of 1k-10k word boxes.
+
+    python benchmarks/bench_line_grouping.py
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ocr.line_grouping import build_text_lines
+
+
+def make_elements(count, columns=2, words_per_line=10, height=30.0, seed=0):
+    rng = np.random.default_rng(seed)
+    elements = []
+    rows = count // (columns * words_per_line)
+    column_width = words_per_line * 100.0
+    for row in range(rows):
+        for column in range(columns):
+            for word in range(words_per_line):
+                elements.append({
+                    "text": f"r{row}c{column}w{word}",
+                    "confidence": float(rng.uniform(0.5, 1.0)),
+                    "position": {
+                        "x": column * (column_width + 6 * height) + word * 100.0,
+                        "y": row * height * 1.5 + float(rng.uniform(-0.2, 0.2)) * height,
+                        "width": 90.0,
+                        "height": height,
+                    }
+                })
+    return elements
+
+
+def legacy_grouping(text_elements):
+    sorted_elements = sorted(text_elements, key=lambda x: x["position"]["y"])
+    lines = []
+    current_line = [sorted_elements[0]]
+    current_y = sorted_elements[0]["position"]["y"]
+    for element in sorted_elements[1:]:
+        if abs(element["position"]["y"] - current_y) < 20:
+            current_line.append(element)
+        else:
+            lines.append(current_line)
+            current_line = [element]
+            current_y = element["position"]["y"]
+    lines.append(current_line)
+
+    text_lines = {}
+    for i, line in enumerate(lines):
+        line_elements = sorted(line, key=lambda x: x["position"]["x"])
+        min_x = min([elem["position"]["x"] for elem in line_elements])
+        min_y = min([elem["position"]["y"] for elem in line_elements])
+        max_x = max([elem["position"]["x"] + elem["position"]["width"] for elem in line_elements])
+        max_y = max([elem["position"]["y"] + elem["position"]["height"] for elem in line_elements])
+        text_lines[f"line_{i+1}"] = {
+            "text": " ".join([elem["text"] for elem in line_elements]),
+            "confidence": sum([elem["confidence"] for elem in line_elements]) / len(line_elements),
+            "position": {"x": min_x, "y": min_y, "width": max_x - min_x, "height": max_y - min_y},
+        }
+    return text_lines
+
+
+def grouped(text_elements):
+    boxes = np.array([[e["position"]["x"], e["position"]["y"], e["position"]["width"], e["position"]["height"]]
+                      for e in text_elements])
+    confidences = np.array([e["confidence"] for e in text_elements])
+    texts = [e["text"] for e in text_elements]
+
+    start = time.perf_counter()
+    result = build_text_lines(boxes, confidences, texts)
+    return result, time.perf_counter() - start
+
+
+def best_of(fn, *args, repeat=5):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    print(f"{'elements':>10} {'legacy ms':>10} {'lines':>6} {'+arrays ms':>10} {'grouping ms':>12} {'lines':>6}")
+    for count in (1000, 5000, 10000):
+        elements = make_elements(count)
+        legacy, legacy_time = best_of(legacy_grouping, elements)
+        (lines, grouping_time), total_time = best_of(grouped, elements)
+        print(f"{len(elements):>10} {legacy_time * 1000:>10.2f} {len(legacy):>6} "
+              f"{total_time * 1000:>10.2f} {grouping_time * 1000:>12.2f} {len(lines):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark memory and grouping time for text observations.
+
+Compares per-element dicts with a nested ``position`` dict (the previous
+representation) against the columnar TextObservations container.
+
+    python benchmarks/bench_observations.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.ocr.line_grouping import build_text_lines
+from app.ocr.observations import TextObservations
+
+
+def make_normalized(count, seed=0):
+    rng = np.random.default_rng(seed)
+    boxes = np.column_stack([
+        rng.uniform(0.0, 0.9, count),
+        rng.uniform(0.0, 0.98, count),
+        np.full(count, 0.05),
+        np.full(count, 0.01),
+    ])
+    confidences = rng.uniform(0.5, 1.0, count)
+    texts = [f"word{i}" for i in range(count)]
+    return boxes, confidences, texts
+
+
+def as_dicts(boxes, confidences, texts, width, height):
+    elements = []
+    for idx, (box, confidence, text) in enumerate(zip(boxes.tolist(), confidences.tolist(), texts)):
+        elements.append({
+            "id": f"element_{idx+1}",
+            "text": text,
+            "confidence": float(confidence),
+            "position": {
+                "x": float(box[0] * width),
+                "y": float((1 - box[1] - box[3]) * height),
+                "width": float(box[2] * width),
+                "height": float(box[3] * height),
+                "unit": "pixel"
+            }
+        })
+    return elements
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, elapsed
+
+
+def main():
+    width, height = 3000, 4000
+    print(f"{'elements':>10} {'dict B/elem':>12} {'cols B/elem':>12} {'dict group ms':>14} {'cols group ms':>14}")
+    for count in (1000, 10000, 50000):
+        boxes, confidences, texts = make_normalized(count)
+
+        elements, dict_bytes, _ = measure(lambda: as_dicts(boxes, confidences, texts, width, height))
+        observations, cols_bytes, _ = measure(
+            lambda: TextObservations.from_normalized(boxes.copy(), confidences.copy(), list(texts), width, height)
+        )
+
+        start = time.perf_counter()
+        dict_boxes = TextObservations.from_elements(elements)
+        build_text_lines(dict_boxes.boxes, dict_boxes.confidences, dict_boxes.texts)
+        dict_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        build_text_lines(observations.boxes, observations.confidences, observations.texts)
+        cols_time = time.perf_counter() - start
+
+        print(f"{count:>10} {dict_bytes / count:>12.1f} {cols_bytes / count:>12.1f} "
+              f"{dict_time * 1000:>14.2f} {cols_time * 1000:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
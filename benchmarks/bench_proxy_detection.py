@@ -0,0 +1,98 @@
+"""
+Benchmark detection latency against accuracy at several proxy resolutions.
+
+Runs card detection, face quality and document-edge detection on each image
+at full resolution and at every proxy size, and reports the mean latency and
+how far the results move from the full-resolution ones: box IoU for cards,
+best-face quality score difference, and mean corner distance in
+full-resolution pixels for document edges. Needs macOS (Vision).
+
+    python benchmarks/bench_proxy_detection.py photo1.jpg photo2.jpg
+    python benchmarks/bench_proxy_detection.py --sizes 2048,1024,768,512 images/*.jpg
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.card.detector import detect_card
+from app.face.quality_detection import detect_face_quality
+from app.utils.image_processing import convert_to_supported_format, pil_to_ci_image
+from app.utils.proxy import make_proxy
+from app.wrap.detect_rectangle import detect_document_edges
+from app.wrap.geometry import Quad
+
+
+def iou(a, b):
+    if a is None or b is None:
+        return float("nan")
+    x1, y1 = max(a["x"], b["x"]), max(a["y"], b["y"])
+    x2 = min(a["x"] + a["width"], b["x"] + b["width"])
+    y2 = min(a["y"] + a["height"], b["y"] + b["height"])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = a["width"] * a["height"] + b["width"] * b["height"] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def document_corners(image, max_side):
+    proxy = make_proxy(image, max_side)
+    corners = detect_document_edges(pil_to_ci_image(proxy.image), full_size=(proxy.full_width, proxy.full_height))
+    return Quad.from_points(*corners).points
+
+
+def timed(fn, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, min(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--sizes", default="2048,1024,768,512")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    sizes = [0] + [int(s) for s in args.sizes.split(",")]
+
+    rows = {size: {"card_ms": [], "card_iou": [], "face_ms": [], "face_delta": [], "edge_ms": [], "edge_px": []}
+            for size in sizes}
+
+    for path in args.images:
+        image = convert_to_supported_format(Image.open(path))
+        reference = {}
+        for size in sizes:
+            card, card_ms = timed(lambda: detect_card(image, proxy_max_side=size), args.repeat)
+            face, face_ms = timed(lambda: detect_face_quality(image, proxy_max_side=size), args.repeat)
+            edges, edge_ms = timed(lambda: document_corners(image, size), args.repeat)
+
+            if size == 0:
+                reference = {"card": card["position"], "face": face["quality_score"], "edges": edges}
+
+            row = rows[size]
+            row["card_ms"].append(card_ms)
+            row["face_ms"].append(face_ms)
+            row["edge_ms"].append(edge_ms)
+            row["card_iou"].append(iou(reference["card"], card["position"]))
+            if reference["face"] is not None and face["quality_score"] is not None:
+                row["face_delta"].append(abs(reference["face"] - face["quality_score"]))
+            row["edge_px"].append(float(np.linalg.norm(reference["edges"] - edges, axis=1).mean()))
+
+    print(f"{len(args.images)} image(s); proxy 0 = full resolution")
+    print(f"{'proxy':>6} {'card ms':>9} {'card IoU':>9} {'face ms':>9} {'face dQ':>8} {'edge ms':>9} {'edge px':>8}")
+    for size in sizes:
+        row = rows[size]
+        mean = lambda key: float(np.nanmean(row[key])) if row[key] else float("nan")
+        print(f"{size:>6} {mean('card_ms'):>9.1f} {mean('card_iou'):>9.3f} {mean('face_ms'):>9.1f} "
+              f"{mean('face_delta'):>8.3f} {mean('edge_ms'):>9.1f} {mean('edge_px'):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -87,6 +87,42 @@ class TestOCREndpoint:
         )
         
         assert response.status_code in [200, 500]
+    
+    def test_ocr_invalid_output_format(self):
+        """Test that an unsupported output format is rejected"""
+        image_data = create_test_image()
+        
+        response = client.post(
+            "/ocr",
+            files={"file": ("test.png", image_data, "image/png")},
+            data={"output_format": "bmp"}
+        )
+        
+        assert response.status_code == 400
+    
+    def test_ocr_invalid_response_mode(self):
+        """Test that an unknown response mode is rejected"""
+        image_data = create_test_image()
+        
+        response = client.post(
+            "/ocr",
+            files={"file": ("test.png", image_data, "image/png")},
+            data={"response_mode": "xml"}
+        )
+        
+        assert response.status_code == 400
+    
+    def test_ocr_invalid_overlay_format(self):
+        """Test that an unknown overlay format is rejected"""
+        image_data = create_test_image()
+        
+        response = client.post(
+            "/ocr",
+            files={"file": ("test.png", image_data, "image/png")},
+            data={"overlay": "pdf"}
+        )
+        
+        assert response.status_code == 400
 
 
 class TestFaceQualityEndpoint:
@@ -122,6 +158,23 @@ class TestFaceQualityEndpoint:
         assert response.status_code in [200, 500]
 
 
+class TestFaceQualityStream:
+    """Test cases for /ws/face-quality websocket endpoint"""
+    
+    def test_stream_returns_frame_result(self):
+        """Test that a streamed frame produces a compact result"""
+        image_data = create_test_image().getvalue()
+        
+        with client.websocket_connect("/ws/face-quality") as websocket:
+            websocket.send_bytes(image_data)
+            result = websocket.receive_json()
+        
+        assert result["frame"] == 1
+        assert "has_face" in result
+        assert "dropped_frames" in result
+        assert result["latency"]["count"] == 1
+
+
 class TestCardDetectionEndpoint:
     """Test cases for /card-detect endpoint"""
     
@@ -155,6 +208,53 @@ class TestCardDetectionEndpoint:
             data = response.json()
             assert "has_card" in data
             assert "card_count" in data
+    
+    def test_card_detection_image_mode(self):
+        """Test that image mode returns the image with metadata headers"""
+        image_data = create_test_image()
+        
+        response = client.post(
+            "/card-detect",
+            files={"file": ("test.png", image_data, "image/png")},
+            data={"response_mode": "image", "output_format": "jpeg"}
+        )
+        
+        assert response.status_code in [200, 500]
+        if response.status_code == 200:
+            assert response.headers["content-type"] == "image/jpeg"
+            assert "x-result-has-card" in response.headers
+            assert Image.open(io.BytesIO(response.content)).format == "JPEG"
+
+
+class TestCardOCREndpoint:
+    """Test cases for /card-detect/ocr endpoint"""
+    
+    def test_card_ocr_accepts_image(self):
+        """Test that the sheet pipeline accepts an image"""
+        response = client.post(
+            "/card-detect/ocr",
+            files={"file": ("test.png", create_test_image(), "image/png")},
+            data={"languages": "en-US", "recognition_level": "fast"}
+        )
+        assert response.status_code in [200, 500]
+        if response.status_code == 200:
+            data = response.json()
+            assert data["card_count"] == len(data["cards"])
+    
+    def test_card_ocr_requires_file(self):
+        """Test that the sheet pipeline requires file parameter"""
+        response = client.post("/card-detect/ocr")
+        assert response.status_code == 422
+    
+    @pytest.mark.parametrize("max_cards", ["0", "9"])
+    def test_card_ocr_max_cards_range(self, max_cards):
+        """Test that max_cards outside 1-8 is rejected"""
+        response = client.post(
+            "/card-detect/ocr",
+            files={"file": ("test.png", create_test_image(), "image/png")},
+            data={"max_cards": max_cards}
+        )
+        assert response.status_code == 400
 
 
 class TestPerspectiveEndpoint:
@@ -192,6 +292,55 @@ class TestPerspectiveEndpoint:
         assert response.status_code == 422
 
 
+class TestPerspectiveAutoEndpoint:
+    """Test cases for /perspective/auto endpoint"""
+    
+    def test_auto_accepts_image_without_points(self):
+        """Test that points are optional"""
+        image_data = create_test_image(200, 200)
+        
+        response = client.post(
+            "/perspective/auto",
+            files={"file": ("test.png", image_data, "image/png")}
+        )
+        
+        assert response.status_code in [200, 500]
+        if response.status_code == 200:
+            assert "points" in response.json()
+    
+    def test_auto_with_point_override(self):
+        """Test that explicit points are used and echoed back"""
+        image_data = create_test_image(200, 200)
+        points = '[{"x": 0, "y": 0}, {"x": 200, "y": 0}, {"x": 200, "y": 200}, {"x": 0, "y": 200}]'
+        
+        response = client.post(
+            "/perspective/auto",
+            files={"file": ("test.png", image_data, "image/png")},
+            data={"points": points}
+        )
+        
+        assert response.status_code in [200, 500]
+        if response.status_code == 200:
+            assert response.json()["points"][1] == {"x": 200.0, "y": 0.0}
+    
+    def test_auto_rejects_bad_points(self):
+        """Test that malformed points are a client error"""
+        image_data = create_test_image(200, 200)
+        
+        response = client.post(
+            "/perspective/auto",
+            files={"file": ("test.png", image_data, "image/png")},
+            data={"points": '[{"x": 0, "y": 0}]'}
+        )
+        
+        assert response.status_code == 400
+    
+    def test_auto_requires_file(self):
+        """Test that auto endpoint requires file parameter"""
+        response = client.post("/perspective/auto")
+        assert response.status_code == 422
+
+
 class TestOutputEndpoint:
     """Test cases for /output/{filename} endpoint"""
     
@@ -220,6 +369,446 @@ class TestOutputEndpoint:
             # Cleanup
             if os.path.exists(test_path):
                 os.remove(test_path)
+    
+    def test_output_rejects_unsafe_names(self):
+        """Test that path traversal is refused"""
+        response = client.get("/output/..%2Frequirements.txt")
+        assert response.status_code == 404
+    
+    def test_output_caching_and_range(self):
+        """Test ETag, 304, immutable Cache-Control and range requests"""
+        output_folder = "output"
+        os.makedirs(output_folder, exist_ok=True)
+        
+        test_filename = "card_20250101_120000_abcdef12.png"
+        test_path = os.path.join(output_folder, test_filename)
+        Image.new('RGB', (100, 100), color='red').save(test_path)
+        
+        try:
+            response = client.get(f"/output/{test_filename}")
+            assert response.status_code == 200
+            assert "immutable" in response.headers["cache-control"]
+            etag = response.headers["etag"]
+            full = response.content
+            
+            response = client.get(f"/output/{test_filename}", headers={"If-None-Match": etag})
+            assert response.status_code == 304
+            
+            response = client.get(f"/output/{test_filename}", headers={"Range": "bytes=0-9"})
+            assert response.status_code == 206
+            assert response.content == full[:10]
+        finally:
+            if os.path.exists(test_path):
+                os.remove(test_path)
+
+
+class TestRenderEndpoint:
+    """Test cases for /render/{filename} endpoint"""
+    
+    def test_render_not_found(self):
+        """Test that a missing image or overlay returns 404"""
+        response = client.get("/render/nonexistent_file.png")
+        assert response.status_code == 404
+    
+    def test_render_from_stored_overlay(self):
+        """Test that a stored overlay is drawn on demand"""
+        output_folder = "output"
+        os.makedirs(output_folder, exist_ok=True)
+        
+        image_path = os.path.join(output_folder, "test_render.png")
+        overlay_path = os.path.join(output_folder, "test_render.overlay.json")
+        Image.new('RGB', (100, 100), color='white').save(image_path)
+        with open(overlay_path, "w") as f:
+            f.write('{"kind":"card","width":100,"height":100,"boxes":[[10,10,50,50]],'
+                    '"labels":["Confidence: 0.90"],"confidences":[0.9],"rendered":false}')
+        
+        try:
+            response = client.get("/render/test_render.png")
+            assert response.status_code == 200
+            assert response.headers["content-type"] == "image/png"
+            
+            rendered = Image.open(io.BytesIO(response.content))
+            assert rendered.getpixel((10, 30)) == (0, 255, 0)
+            
+            response = client.get("/render/test_render.png?format=json")
+            assert response.status_code == 200
+            assert response.json()["boxes"] == [[10, 10, 50, 50]]
+            assert "rendered" not in response.json()
+            
+            response = client.get("/render/test_render.png?format=svg")
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("image/svg+xml")
+            assert "<rect " in response.text
+            
+            response = client.get("/render/test_render.png?format=gif")
+            assert response.status_code == 400
+        finally:
+            for path in (image_path, overlay_path):
+                if os.path.exists(path):
+                    os.remove(path)
+    
+    def test_render_rendered_webp_as_png(self):
+        """Test that an already rendered webp output is re-encoded when png is requested"""
+        output_folder = "output"
+        os.makedirs(output_folder, exist_ok=True)
+        
+        image_path = os.path.join(output_folder, "test_render_webp.webp")
+        overlay_path = os.path.join(output_folder, "test_render_webp.overlay.json")
+        Image.new('RGB', (100, 100), color='white').save(image_path, "WEBP")
+        with open(overlay_path, "w") as f:
+            f.write('{"kind":"card","width":100,"height":100,"boxes":[],"labels":[],'
+                    '"confidences":[],"rendered":true}')
+        
+        try:
+            response = client.get("/render/test_render_webp.webp?format=png")
+            assert response.status_code == 200
+            assert response.headers["content-type"] == "image/png"
+            assert Image.open(io.BytesIO(response.content)).format == "PNG"
+        finally:
+            for path in (image_path, overlay_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+class TestRequestId:
+    """Test cases for request id propagation"""
+    
+    def test_request_id_echoed(self):
+        """Test that a caller supplied request id is returned"""
+        response = client.get("/health", headers={"X-Request-ID": "trace-42"})
+        assert response.headers["x-request-id"] == "trace-42"
+    
+    def test_request_id_generated(self):
+        """Test that a request id is generated when missing"""
+        response = client.get("/health")
+        assert len(response.headers["x-request-id"]) == 32
+
+
+class TestPrescreen:
+    """Test cases for the optional pre-screen gate"""
+    
+    @pytest.mark.parametrize("path", ["/ocr", "/face-quality", "/card-detect"])
+    def test_unusable_image_rejected(self, path):
+        """Test that a tiny flat image is rejected with reasons"""
+        response = client.post(
+            path,
+            files={"file": ("test.png", create_test_image(color='black'), "image/png")},
+            data={"prescreen": "true"}
+        )
+        assert response.status_code == 422
+        detail = response.json()["detail"]
+        assert detail["error"] == "image_rejected"
+        codes = [reason["code"] for reason in detail["reasons"]]
+        assert "too_small" in codes
+        assert "too_dark" in codes
+        assert detail["metrics"]["min_side"] == 100
+    
+    def test_off_by_default(self):
+        """Test that the gate does not run unless asked"""
+        response = client.post(
+            "/card-detect",
+            files={"file": ("test.png", create_test_image(color='black'), "image/png")}
+        )
+        assert response.status_code != 422
+
+
+class TestDeadline:
+    """Test cases for per-request deadlines"""
+    
+    @pytest.mark.parametrize("path", ["/ocr", "/face-quality", "/card-detect"])
+    def test_expired_request_stops(self, path):
+        """Test that a request out of time stops with 504 instead of writing output"""
+        response = client.post(
+            path,
+            files={"file": ("test.png", create_test_image(), "image/png")},
+            headers={"X-Request-Timeout": "0.000001"}
+        )
+        assert response.status_code == 504
+        detail = response.json()["detail"]
+        assert detail["error"] == "deadline_exceeded"
+        assert detail["reason"] == "timeout"
+    
+    @pytest.mark.parametrize("path,data", [
+        ("/perspective", {"points": '[{"x": 0, "y": 0}, {"x": 200, "y": 0}, {"x": 200, "y": 200}, {"x": 0, "y": 200}]'}),
+        ("/perspective/auto", {}),
+    ])
+    def test_expired_perspective_stops(self, path, data):
+        """Test that perspective correction also stops once the request is out of time"""
+        response = client.post(
+            path,
+            files={"file": ("test.png", create_test_image(200, 200), "image/png")},
+            data=data,
+            headers={"X-Request-Timeout": "0.000001"}
+        )
+        assert response.status_code == 504
+        assert response.json()["detail"]["stage"] == "decode"
+    
+    def test_timeout_query_parameter(self):
+        """Test that the deadline can also be given as a query parameter"""
+        response = client.post(
+            "/card-detect?timeout=0.000001",
+            files={"file": ("test.png", create_test_image(), "image/png")}
+        )
+        assert response.status_code == 504
+
+
+class TestEngineDispatch:
+    """Test cases for where inline engine runs execute"""
+    
+    @pytest.mark.parametrize("coalesce", [True, False])
+    def test_engine_runs_off_event_loop(self, monkeypatch, coalesce):
+        """Test that the engine runs on the threadpool with coalescing on or off"""
+        import asyncio
+        from app import main
+        
+        monkeypatch.setattr(main, "COALESCE_REQUESTS", coalesce)
+        on_loop = []
+        
+        def engine(image):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return {"success": True}
+        
+        image = Image.new("RGB", (10, 10))
+        result = asyncio.run(main._run_coalesced(("face", None), b"engine-dispatch", engine, image))
+        assert result == {"success": True}
+        assert on_loop == [False]
+
+
+class TestOCRLatencyLearning:
+    """Test cases for what the auto level learns from /ocr"""
+    
+    def test_queue_wait_not_learned(self, monkeypatch):
+        """Test that time spent waiting for a scheduler slot is not fed to the level selector"""
+        import asyncio
+        from contextlib import asynccontextmanager
+        from app import main
+        from app.ocr.recognition_level import LevelSelector
+        
+        observed = []
+        selector = LevelSelector()
+        monkeypatch.setattr(selector, "observe", lambda level, seconds: observed.append((level, seconds)))
+        monkeypatch.setattr(main, "level_selector", selector)
+        
+        @asynccontextmanager
+        async def slow_slot(key, mp):
+            await asyncio.sleep(0.3)
+            yield 0.0
+        monkeypatch.setattr(main.scheduler, "slot", slow_slot)
+        
+        response = client.post(
+            "/ocr",
+            files={"file": ("test.png", create_test_image(), "image/png")},
+            data={"recognition_level": "fast"}
+        )
+        assert response.status_code in [200, 500]
+        if response.status_code == 200:
+            assert len(observed) == 1
+            level, seconds = observed[0]
+            assert level == "fast"
+            assert seconds < 0.3
+    
+    @pytest.mark.parametrize("endpoint", ["ocr", "card_ocr"])
+    def test_coalesced_run_counted_once(self, monkeypatch, endpoint):
+        """Test that duplicates sharing one engine run are tracked and observed once"""
+        import asyncio
+        import time
+        from app import main
+        from app.ocr.recognition_level import LevelSelector
+        
+        observed = []
+        selector = LevelSelector()
+        monkeypatch.setattr(selector, "observe", lambda level, seconds: observed.append(level))
+        monkeypatch.setattr(main, "level_selector", selector)
+        monkeypatch.setattr(main, "COALESCE_REQUESTS", True)
+        inflight = []
+        
+        def engine(image, level):
+            inflight.append(selector.inflight[level])
+            time.sleep(0.05)
+            return {}
+        
+        async def duplicates():
+            image = Image.new("RGB", (10, 10))
+            await asyncio.gather(*[
+                main._run_coalesced((endpoint, "fast"), b"same-upload", engine, image, "fast") for _ in range(3)
+            ])
+        
+        asyncio.run(duplicates())
+        assert inflight == [1]
+        assert observed == ["fast"]
+        assert selector.inflight["fast"] == 0
+
+
+class TestOCRResultStore:
+    """Test cases for searching and fetching stored OCR results"""
+    
+    @pytest.fixture
+    def store(self, monkeypatch, tmp_path):
+        from app.ocr import result_store
+        store = result_store.ResultStore(str(tmp_path / "ocr.db"))
+        monkeypatch.setattr(result_store, "OCR_RESULT_STORE", str(tmp_path / "ocr.db"))
+        monkeypatch.setattr(result_store, "_store", store)
+        yield store
+        store.close()
+    
+    def test_disabled(self, monkeypatch):
+        """Test that search is unavailable without a configured store"""
+        from app.ocr import result_store
+        monkeypatch.setattr(result_store, "OCR_RESULT_STORE", "")
+        assert client.get("/ocr/search", params={"q": "invoice"}).status_code == 503
+    
+    def test_search_and_fetch(self, store):
+        """Test that stored text is searchable and fetchable by key"""
+        store.save("abc123", {
+            "document_type": "card_id",
+            "recognized_text": "บัตรประจำตัวประชาชน",
+            "confidence": 0.9,
+            "dimensions": {"width": 100, "height": 60},
+            "text_lines": {"line_1": {"id": "line_1", "text": "บัตรประจำตัวประชาชน", "confidence": 0.9,
+                                      "position": {"x": 0.0, "y": 0.0, "width": 10.0, "height": 5.0}}}
+        }, request_id="req-1")
+        
+        response = client.get("/ocr/search", params={"q": "ประจำตัว"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 1
+        assert data["results"][0]["key"] == "abc123"
+        assert "query_time_ms" in data
+        
+        assert client.get("/ocr/documents/req-1").status_code == 404
+        document = client.get("/ocr/documents/abc123").json()
+        assert document["key"] == "abc123"
+        assert document["text_lines"][0]["text"] == "บัตรประจำตัวประชาชน"
+    
+    def test_two_character_query(self, store):
+        """Test that a query shorter than a trigram still finds the document"""
+        store.save("abc123", {
+            "recognized_text": "ขอบคุณจากใจ",
+            "text_lines": {}
+        })
+        data = client.get("/ocr/search", params={"q": "ใจ"}).json()
+        assert data["count"] == 1
+        assert data["results"][0]["key"] == "abc123"
+    
+    def test_unknown_document(self, store):
+        """Test that unknown keys return 404"""
+        assert client.get("/ocr/documents/missing").status_code == 404
+    
+    def test_error_result_not_stored(self, store, monkeypatch):
+        """Test that a result carrying an error is not indexed"""
+        import asyncio
+        from app import main
+        
+        saved = []
+        monkeypatch.setattr(store, "save", lambda *args: saved.append(args))
+        result = {"error": "Vision failed", "text_lines": {}}
+        asyncio.run(main._store_ocr_result(b"upload", ["en-US"], "fast", result))
+        assert saved == []
+        assert result["document_key"] is None
+    
+    def test_stored_once_per_flight(self, store, monkeypatch):
+        """Test that coalesced duplicates share one result-store write and key"""
+        import asyncio
+        import functools
+        import time
+        from app import main
+        
+        monkeypatch.setattr(main, "COALESCE_REQUESTS", True)
+        saved = []
+        monkeypatch.setattr(store, "save", lambda *args: saved.append(args))
+        
+        def engine(image, languages, level):
+            time.sleep(0.05)
+            return {"recognized_text": "invoice", "text_lines": {}}
+        
+        async def both():
+            image = Image.new("RGB", (10, 10))
+            finish = functools.partial(main._store_ocr_result, b"same-upload", ["en-US"], "fast")
+            return await asyncio.gather(*[
+                main._run_coalesced(("ocr", "fast"), b"same-upload", engine, image, ["en-US"], "fast", finish=finish)
+                for _ in range(2)
+            ])
+        
+        results = asyncio.run(both())
+        assert len(saved) == 1
+        assert results[0]["document_key"] == results[1]["document_key"] is not None
+
+
+class TestResultRecords:
+    """Test cases for fetching saved results"""
+    
+    def test_result_saved_under_record_id(self):
+        """Test that a response can be fetched again by the X-Record-ID it came with"""
+        response = client.post(
+            "/card-detect",
+            files={"file": ("test.png", create_test_image(), "image/png")},
+            headers={"X-Request-ID": "record-test-1"}
+        )
+        assert response.status_code == 200
+        result_id = response.headers["X-Record-ID"]
+        assert result_id != "record-test-1"
+        
+        record = client.get(f"/results/{result_id}")
+        assert record.status_code == 200
+        data = record.json()
+        assert data["id"] == result_id
+        assert data["endpoint"] == "card"
+        assert data["result"]["output_path"] == response.json()["output_path"]
+    
+    def test_reused_request_id_keeps_records_apart(self):
+        """Test that two requests with the same X-Request-ID get separate records"""
+        ids = []
+        for _ in range(2):
+            response = client.post(
+                "/card-detect",
+                files={"file": ("test.png", create_test_image(), "image/png")},
+                headers={"X-Request-ID": "test"}
+            )
+            ids.append(response.headers["X-Record-ID"])
+        assert ids[0] != ids[1]
+        assert client.get("/results/test").status_code == 404
+        assert all(client.get(f"/results/{result_id}").status_code == 200 for result_id in ids)
+    
+    def test_gzip_refused_gets_plain_json(self):
+        """Test that a client refusing gzip gets the record uncompressed"""
+        from app import main
+        response = client.post("/card-detect", files={"file": ("test.png", create_test_image(), "image/png")})
+        result_id = response.headers["X-Record-ID"]
+        main.result_recorder.flush()
+        
+        record = client.get(f"/results/{result_id}", headers={"Accept-Encoding": "gzip;q=0"})
+        assert record.status_code == 200
+        assert "content-encoding" not in record.headers
+        assert record.json()["id"] == result_id
+        
+        record = client.get(f"/results/{result_id}", headers={"Accept-Encoding": "gzip"})
+        assert record.headers["content-encoding"] == "gzip"
+        assert record.json()["id"] == result_id
+    
+    def test_no_record_id_without_record(self):
+        """Test that endpoints that save nothing send no X-Record-ID"""
+        assert "x-record-id" not in client.get("/health").headers
+    
+    def test_unknown_result(self):
+        """Test that unknown or malformed ids return 404"""
+        assert client.get("/results/" + "0" * 32).status_code == 404
+        assert client.get("/results/bad%20id").status_code == 404
+
+
+class TestMetricsEndpoint:
+    """Test cases for /metrics endpoint"""
+    
+    def test_metrics_shape(self):
+        """Test that metrics returns counters and summaries"""
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        data = response.json()
+        assert "counters" in data
+        assert "summaries" in data
 
 
 class TestCORSMiddleware:
@@ -0,0 +1,206 @@
+"""
+Unit tests for app/utils/bitmap_bridge.py
+"""
+import threading
+import pytest
+from PIL import Image
+from app.utils.bitmap_bridge import (
+    BitmapAdapter, RenderCache, pil_to_rgba, rgba_to_pil, render_bounds, pil_to_ci, ci_to_pil
+)
+
+
+class FakeImage:
+    """An in-memory 'CIImage': RGBA rows plus an extent"""
+
+    def __init__(self, data, width, height, bytes_per_row, origin=(0, 0)):
+        self.data = bytes(data)
+        self.width = width
+        self.height = height
+        self.bytes_per_row = bytes_per_row
+        self.origin = origin
+
+
+class FakeFilter:
+    """Records how often it was reset"""
+
+    def __init__(self, name):
+        self.name = name
+        self.resets = 0
+
+
+class FakeAdapter(BitmapAdapter):
+    """Counts calls so tests can check what gets created and reused"""
+
+    def __init__(self, known_filters=("CIAffineTransform",)):
+        self.known_filters = known_filters
+        self.contexts_created = 0
+        self.filters_created = 0
+        self.renders = 0
+
+    def create_context(self):
+        self.contexts_created += 1
+        return object()
+
+    def create_filter(self, name):
+        self.filters_created += 1
+        return FakeFilter(name) if name in self.known_filters else None
+
+    def reset_filter(self, filter):
+        filter.resets += 1
+
+    def image_from_rgba(self, data, width, height, bytes_per_row):
+        return FakeImage(data, width, height, bytes_per_row)
+
+    def extent(self, image):
+        return image.origin[0], image.origin[1], image.width, image.height
+
+    def render_rgba(self, context, image, bounds, buffer, bytes_per_row):
+        self.renders += 1
+        assert bounds == (image.origin[0], image.origin[1], image.width, image.height)
+        for row in range(image.height):
+            source = image.data[row * image.bytes_per_row:row * image.bytes_per_row + image.width * 4]
+            buffer[row * bytes_per_row:row * bytes_per_row + len(source)] = source
+
+
+class TestRgbaPacking:
+    """Test cases for packing and wrapping raw RGBA rows"""
+
+    def test_rgb_round_trip(self):
+        """Test that an RGB image survives packing and wrapping"""
+        image = Image.new("RGB", (3, 2), (10, 20, 30))
+        image.putpixel((2, 1), (200, 100, 50))
+        data, width, height, bytes_per_row = pil_to_rgba(image)
+
+        assert (width, height, bytes_per_row) == (3, 2, 12)
+        result = rgba_to_pil(bytearray(data), width, height, bytes_per_row)
+        assert result.mode == "RGBA"
+        assert result.convert("RGB").tobytes() == image.tobytes()
+
+    def test_opaque_result_shares_buffer(self):
+        """Test that opaque renders wrap the buffer without copying"""
+        buffer = bytearray(b"\x01\x02\x03\xff" * 4)
+        image = rgba_to_pil(buffer, 2, 2, 8)
+        buffer[0] = 99
+        assert image.getpixel((0, 0)) == (99, 2, 3, 255)
+
+    def test_translucent_pixels_are_premultiplied(self):
+        """Test premultiplication on the way in and its reversal on the way out"""
+        image = Image.new("RGBA", (1, 1), (200, 100, 50, 128))
+        data, width, height, bytes_per_row = pil_to_rgba(image)
+        assert data[3] == 128
+        assert data[0] == pytest.approx(100, abs=1)
+
+        result = rgba_to_pil(bytearray(data), width, height, bytes_per_row)
+        assert result.getpixel((0, 0)) == pytest.approx((200, 100, 50, 128), abs=2)
+
+    def test_row_padding(self):
+        """Test rows with more bytes than pixels"""
+        buffer = bytearray(b"\x05\x06\x07\xff\x00\x00\x00\x00" * 2)
+        image = rgba_to_pil(buffer, 1, 2, 8)
+        assert image.size == (1, 2)
+        assert image.getpixel((0, 1)) == (5, 6, 7, 255)
+
+
+class TestRenderBounds:
+    """Test cases for turning extents into render rectangles"""
+
+    def test_integral_extent(self):
+        """Test that whole-pixel extents are unchanged"""
+        assert render_bounds((0, 0, 100, 50)) == (0, 0, 100, 50)
+
+    def test_fractional_extent_rounds_out(self):
+        """Test that partial pixels are covered"""
+        assert render_bounds((0.5, -0.25, 10.0, 5.0)) == (0, -1, 11, 6)
+
+    @pytest.mark.parametrize("extent", [
+        (0, 0, float("inf"), 10),
+        (float("-inf"), 0, 10, 10),
+        (0, 0, 0, 10),
+    ])
+    def test_unrenderable(self, extent):
+        """Test infinite and empty extents"""
+        with pytest.raises(ValueError):
+            render_bounds(extent)
+
+
+class TestRenderCache:
+    """Test cases for per-thread contexts and filters"""
+
+    def test_adapter_is_abstract(self):
+        """Test that an adapter missing Core Image calls cannot be created"""
+        class PartialAdapter(BitmapAdapter):
+            def create_context(self):
+                return object()
+
+        with pytest.raises(TypeError):
+            PartialAdapter()
+
+    def test_context_created_once_per_thread(self):
+        """Test that repeated calls on a thread reuse its context"""
+        adapter = FakeAdapter()
+        cache = RenderCache(adapter)
+        first = cache.context()
+        assert cache.context() is first
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(cache.context()))
+        thread.start()
+        thread.join()
+
+        assert other[0] is not first
+        assert adapter.contexts_created == 2
+
+    def test_filter_reused_and_reset(self):
+        """Test that a cached filter comes back with its defaults restored"""
+        adapter = FakeAdapter()
+        cache = RenderCache(adapter)
+        first = cache.filter("CIAffineTransform")
+        second = cache.filter("CIAffineTransform")
+
+        assert second is first
+        assert adapter.filters_created == 1
+        assert first.resets == 1
+
+    def test_unknown_filter_cached_as_none(self):
+        """Test that a missing filter is looked up only once"""
+        adapter = FakeAdapter()
+        cache = RenderCache(adapter)
+        assert cache.filter("CINoSuchFilter") is None
+        assert cache.filter("CINoSuchFilter") is None
+        assert adapter.filters_created == 1
+
+    def test_clear(self):
+        """Test that clear drops the thread's cached objects"""
+        adapter = FakeAdapter()
+        cache = RenderCache(adapter)
+        cache.context()
+        cache.clear()
+        cache.context()
+        assert adapter.contexts_created == 2
+
+
+class TestConversion:
+    """Test cases for the PIL <-> adapter image round trip"""
+
+    def test_round_trip(self):
+        """Test that pixels survive pil_to_ci then ci_to_pil with one render"""
+        adapter = FakeAdapter()
+        cache = RenderCache(adapter)
+        image = Image.new("RGB", (4, 3), (0, 128, 255))
+        image.putpixel((1, 2), (9, 8, 7))
+
+        result = ci_to_pil(pil_to_ci(image, adapter), cache)
+
+        assert result.size == (4, 3)
+        assert result.convert("RGB").tobytes() == image.tobytes()
+        assert adapter.renders == 1
+
+    def test_repeated_conversions_share_context(self):
+        """Test that many conversions create one context"""
+        adapter = FakeAdapter()
+        cache = RenderCache(adapter)
+        ci_image = pil_to_ci(Image.new("RGB", (2, 2)), adapter)
+        for _ in range(5):
+            ci_to_pil(ci_image, cache)
+        assert adapter.contexts_created == 1
+        assert adapter.renders == 5
@@ -0,0 +1,72 @@
+"""
+Unit tests for app/card/crops.py
+"""
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+from app.card.crops import rectify
+from app.wrap.geometry import Quad, perspective_coefficients
+
+
+def sheet_with_card(quad, size=(800, 600)):
+    """A grey sheet with a white card whose left half is red"""
+    image = Image.new("RGB", size, (90, 90, 90))
+    draw = ImageDraw.Draw(image)
+    tl, tr, br, bl = [tuple(p) for p in quad]
+    draw.polygon([tl, tr, br, bl], fill=(255, 255, 255))
+    top_mid = ((tl[0] + tr[0]) / 2, (tl[1] + tr[1]) / 2)
+    bottom_mid = ((bl[0] + br[0]) / 2, (bl[1] + br[1]) / 2)
+    draw.polygon([tl, top_mid, bottom_mid, bl], fill=(255, 0, 0))
+    return image
+
+
+class TestPerspectiveCoefficients:
+    """Test cases for the output-to-input homography"""
+
+    def test_maps_rectangle_corners_onto_quad(self):
+        """Test that the output corners land on the quad corners"""
+        quad = Quad([[110, 80], [420, 120], [400, 330], [90, 300]])
+        a, b, c, d, e, f, g, h = perspective_coefficients(quad, 300, 200)
+        for (x, y), expected in zip([(0, 0), (300, 0), (300, 200), (0, 200)], quad.points):
+            w = g * x + h * y + 1
+            assert ((a * x + b * y + c) / w, (d * x + e * y + f) / w) == pytest.approx(tuple(expected))
+
+
+class TestRectify:
+    """Test cases for cropping cards upright"""
+
+    def test_axis_aligned_crop(self):
+        """Test that an upright card is cut out at its own size"""
+        quad = [[100, 100], [400, 100], [400, 290], [100, 290]]
+        crop = rectify(sheet_with_card(quad), quad)
+        assert crop.size == (300, 190)
+        assert crop.getpixel((50, 95)) == (255, 0, 0)
+        assert crop.getpixel((250, 95)) == (255, 255, 255)
+
+    def test_skewed_card(self):
+        """Test that a tilted card comes out rectangular with no background"""
+        quad = [[150, 100], [450, 150], [420, 340], [120, 290]]
+        crop = np.asarray(rectify(sheet_with_card(quad), quad))
+        inner = crop[5:-5, 5:-5]
+        assert not np.any(np.all(inner == 90, axis=-1))
+        assert inner[:, :inner.shape[1] // 3, 0].mean() > 200
+        assert inner[:, :inner.shape[1] // 3, 1].mean() < 60
+
+    def test_counter_clockwise_corners(self):
+        """Test that corner winding does not mirror the crop"""
+        quad = [[100, 100], [400, 100], [400, 290], [100, 290]]
+        crop = rectify(sheet_with_card(quad), [quad[0], quad[3], quad[2], quad[1]])
+        assert crop.getpixel((50, 95)) == (255, 0, 0)
+
+    def test_portrait_card_turned_landscape(self):
+        """Test that a card on its short side is rotated to landscape"""
+        quad = [[100, 100], [290, 100], [290, 400], [100, 400]]
+        crop = rectify(sheet_with_card(quad), quad)
+        assert crop.width > crop.height
+
+    def test_max_side(self):
+        """Test that big crops are capped and small ones not upscaled"""
+        quad = [[0, 0], [700, 0], [700, 440], [0, 440]]
+        image = sheet_with_card(quad)
+        assert max(rectify(image, quad, max_side=350).size) == 350
+        assert rectify(image, quad, max_side=2000).size == (700, 440)
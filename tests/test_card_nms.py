@@ -0,0 +1,67 @@
+"""
+Unit tests for app/card/nms.py
+"""
+import numpy as np
+import pytest
+from app.card.nms import iou_matrix, nms, suppress_cards, boxes_array
+
+
+def card(x, y, confidence, w=100, h=60):
+    return {"position": {"x": x, "y": y, "width": w, "height": h}, "confidence": confidence}
+
+
+class TestIouMatrix:
+    """Test cases for pairwise IoU"""
+
+    def test_identical_and_disjoint(self):
+        """Test IoU of a box with itself and with a far away box"""
+        boxes = np.array([[0, 0, 10, 10], [100, 100, 10, 10]])
+        np.testing.assert_allclose(iou_matrix(boxes), [[1, 0], [0, 1]])
+
+    def test_half_overlap(self):
+        """Test two boxes sharing half their area"""
+        boxes = np.array([[0, 0, 10, 10], [5, 0, 10, 10]])
+        assert iou_matrix(boxes)[0, 1] == pytest.approx(50 / 150)
+
+    def test_degenerate_box(self):
+        """Test that zero-area boxes give zero IoU instead of NaN"""
+        assert iou_matrix(np.zeros((2, 4))).tolist() == [[0.0, 0.0], [0.0, 0.0]]
+
+    def test_matches_pairwise_loop(self):
+        """Test the vectorized matrix against a scalar loop"""
+        rng = np.random.default_rng(0)
+        boxes = np.column_stack([rng.uniform(0, 100, (30, 2)), rng.uniform(1, 50, (30, 2))])
+
+        def scalar(a, b):
+            x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+            x2, y2 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+            inter = max(0, x2 - x1) * max(0, y2 - y1)
+            return inter / (a[2] * a[3] + b[2] * b[3] - inter)
+
+        expected = [[scalar(a, b) for b in boxes] for a in boxes]
+        np.testing.assert_allclose(iou_matrix(boxes), expected)
+
+
+class TestNms:
+    """Test cases for greedy suppression"""
+
+    def test_suppresses_chain(self):
+        """Test that overlaps between non-best candidates are suppressed too"""
+        cards = [card(0, 0, 0.9), card(300, 0, 0.8), card(305, 2, 0.7), card(600, 0, 0.6)]
+        kept = suppress_cards(cards, iou_threshold=0.5)
+        assert [c["confidence"] for c in kept] == [0.9, 0.8, 0.6]
+
+    def test_order_and_ties(self):
+        """Test best-first order with the earlier box winning ties"""
+        boxes = boxes_array([c["position"] for c in [card(0, 0, 0.5), card(0, 0, 0.5), card(200, 0, 0.9)]])
+        assert nms(boxes, [0.5, 0.5, 0.9]).tolist() == [2, 0]
+
+    def test_max_results(self):
+        """Test that at most max_results boxes are kept"""
+        cards = [card(i * 200, 0, 1.0 - i * 0.1) for i in range(6)]
+        assert len(suppress_cards(cards, max_results=4)) == 4
+
+    def test_empty(self):
+        """Test that no candidates give no results"""
+        assert nms(np.zeros((0, 4)), []).tolist() == []
+        assert suppress_cards([]) == []
@@ -0,0 +1,69 @@
+"""
+Unit tests for app/card/pipeline.py
+"""
+import pytest
+from PIL import Image
+from app.card import pipeline
+from app.utils.deadline import Deadline, DeadlineExceeded, bind_deadline, reset_deadline, current_deadline
+from app.utils.request_logging import bind_request, reset_request, current_request_id
+
+
+def detected_cards(count):
+    cards = []
+    for i in range(count):
+        x = i * 100
+        cards.append({"confidence": 0.9, "position": {"x": x, "y": 0, "width": 80, "height": 50},
+                      "quad": [(x, 0), (x + 80, 0), (x + 80, 50), (x, 50)]})
+    return {"cards": cards, "dimensions": {"width": 400, "height": 100, "unit": "pixel"}}
+
+
+def fake_ocr(seen):
+    def ocr(crop, languages, recognition_level):
+        seen.append((current_request_id(), current_deadline()))
+        return {"document_type": "unknown", "recognized_text": "", "confidence": 0.0,
+                "text_lines": {}, "text_object_count": 0}
+    return ocr
+
+
+@pytest.fixture
+def sheet(monkeypatch):
+    monkeypatch.setattr(pipeline, "detect_card", lambda image, max_observations: detected_cards(3))
+    return Image.new("RGB", (400, 100), "white")
+
+
+class TestReadCards:
+    """Test cases for OCRing card crops on the thread pool"""
+
+    def test_crops_keep_request_context(self, sheet):
+        """Test that crop threads see the request id and deadline of the caller"""
+        seen = []
+        deadline = Deadline()
+        tokens = bind_request("sheet-1")
+        deadline_token = bind_deadline(deadline)
+        try:
+            result = pipeline.read_cards(sheet, ["en-US"], "fast", max_cards=3, max_workers=3, ocr=fake_ocr(seen))
+        finally:
+            reset_deadline(deadline_token)
+            reset_request(tokens)
+        assert result["card_count"] == 3
+        assert seen == [("sheet-1", deadline)] * 3
+
+    def test_expired_deadline_stops_crops(self, sheet):
+        """Test that the remaining crops are skipped once the request is out of time"""
+        seen = []
+        deadline = Deadline()
+        read = fake_ocr(seen)
+
+        def ocr(crop, languages, recognition_level):
+            # The client goes away while the first crop is being read
+            deadline.cancel()
+            return read(crop, languages, recognition_level)
+
+        token = bind_deadline(deadline)
+        try:
+            with pytest.raises(DeadlineExceeded) as exc_info:
+                pipeline.read_cards(sheet, ["en-US"], "fast", max_cards=3, max_workers=1, ocr=ocr)
+        finally:
+            reset_deadline(token)
+        assert exc_info.value.stage == "recognition"
+        assert len(seen) == 1
@@ -0,0 +1,133 @@
+"""
+Unit tests for app/utils/deadline.py
+"""
+import asyncio
+import pickle
+import time
+import pytest
+from app.utils import deadline as deadline_module
+from app.utils.deadline import (
+    Deadline, DeadlineExceeded, parse_timeout, bind_deadline, reset_deadline,
+    check_deadline, deadline_expired, call_before_deadline, current_deadline
+)
+
+
+class TestParseTimeout:
+    """Test cases for reading the client's timeout"""
+
+    def test_seconds(self):
+        """Test that a numeric header value is used as seconds"""
+        assert parse_timeout("10") == 10.0
+        assert parse_timeout("2.5") == 2.5
+
+    def test_capped(self):
+        """Test that very long timeouts are capped"""
+        assert parse_timeout("100000") == deadline_module.MAX_REQUEST_TIMEOUT_SECONDS
+
+    def test_missing_or_invalid_uses_default(self, monkeypatch):
+        """Test that missing and unparsable values fall back to the default"""
+        monkeypatch.setattr(deadline_module, "REQUEST_TIMEOUT_SECONDS", 30.0)
+        assert parse_timeout(None) == 30.0
+        assert parse_timeout("soon") == 30.0
+
+    def test_no_limit(self, monkeypatch):
+        """Test that zero means no deadline"""
+        monkeypatch.setattr(deadline_module, "REQUEST_TIMEOUT_SECONDS", 0.0)
+        assert parse_timeout(None) is None
+        assert parse_timeout("0") is None
+
+
+class TestDeadline:
+    """Test cases for the per-request deadline"""
+
+    def test_unlimited(self):
+        """Test that a deadline without expiry never runs out"""
+        deadline = Deadline.after(None)
+        assert deadline.remaining() is None
+        assert not deadline.expired
+        deadline.check("decode")
+
+    def test_expires(self):
+        """Test that a passed deadline raises at the next stage"""
+        deadline = Deadline(time.time() - 1)
+        assert deadline.expired
+        with pytest.raises(DeadlineExceeded) as exc_info:
+            deadline.check("recognition")
+        assert exc_info.value.stage == "recognition"
+        assert exc_info.value.reason == "timeout"
+
+    def test_remaining(self):
+        """Test that remaining counts down from the timeout"""
+        assert 9.0 < Deadline.after(10).remaining() <= 10.0
+
+    def test_cancel_runs_callbacks_once(self):
+        """Test that cancelling marks the reason and runs callbacks"""
+        deadline = Deadline.after(None)
+        calls = []
+        deadline.on_cancel(lambda: calls.append(1))
+        deadline.cancel()
+        deadline.cancel()
+        assert calls == [1]
+        with pytest.raises(DeadlineExceeded) as exc_info:
+            deadline.check("save")
+        assert exc_info.value.reason == "client_disconnected"
+
+    def test_exception_pickles(self):
+        """Test that the exception survives the trip back from a worker process"""
+        error = pickle.loads(pickle.dumps(DeadlineExceeded("queue", "timeout")))
+        assert (error.stage, error.reason) == ("queue", "timeout")
+        assert str(error) == "timeout before queue"
+
+    def test_watch_cancels_on_disconnect(self, monkeypatch):
+        """Test that the watcher cancels once the client is gone"""
+        monkeypatch.setattr(deadline_module, "DISCONNECT_POLL_SECONDS", 0.001)
+        deadline = Deadline.after(None)
+        polls = []
+
+        async def is_disconnected():
+            polls.append(1)
+            return len(polls) >= 3
+
+        async def main():
+            deadline.watch(is_disconnected)
+            for _ in range(100):
+                if deadline.expired:
+                    break
+                await asyncio.sleep(0.001)
+            deadline.close()
+
+        asyncio.run(main())
+        assert deadline.reason == "client_disconnected"
+        assert len(polls) == 3
+
+
+class TestCurrentDeadline:
+    """Test cases for the request-scoped deadline"""
+
+    def test_no_request_is_noop(self):
+        """Test that checks outside a request never raise"""
+        assert current_deadline() is None
+        check_deadline("decode")
+        assert not deadline_expired()
+
+    def test_bound_deadline(self):
+        """Test that checks use the bound deadline until it is reset"""
+        token = bind_deadline(Deadline(time.time() - 1))
+        try:
+            assert deadline_expired()
+            with pytest.raises(DeadlineExceeded):
+                check_deadline("decode")
+        finally:
+            reset_deadline(token)
+        assert current_deadline() is None
+
+    def test_call_before_deadline(self):
+        """Test that queued work is dropped once the deadline has passed"""
+        assert call_before_deadline(lambda x: x * 2, 21) == 42
+        token = bind_deadline(Deadline(time.time() - 1))
+        try:
+            with pytest.raises(DeadlineExceeded) as exc_info:
+                call_before_deadline(lambda: pytest.fail("should not run"))
+            assert exc_info.value.stage == "queue"
+        finally:
+            reset_deadline(token)
@@ -1,8 +1,13 @@
 """
 Unit tests for app/ocr/document_classifier.py
 """
+import json
 import pytest
-from app.ocr.document_classifier import classify_document_type
+import numpy as np
+from app.ocr.document_classifier import (
+    DocumentClassifier, DEFAULT_RULES_PATH, classify_document_type, score_document_types
+)
+from app.ocr.observations import TextObservations
 
 
 class TestThaiIDCardClassification:
@@ -187,3 +192,68 @@ class TestCaseInsensitivity:
         """Test mixed case driving text"""
         result = classify_document_type("DriViNg LiCeNcE", [])
         assert result == "driving_license"
+
+
+class TestDocumentScores:
+    """Test cases for scored classification"""
+    
+    def test_scores_count_distinct_rules(self):
+        """Test that each matching rule adds its weight once"""
+        scores = score_document_types("PASSPORT passport Nationality สัญชาติ", [])
+        assert scores == {"passport": 3.0}
+    
+    def test_highest_score_wins(self):
+        """Test that a passport with a 13-digit personal number is a passport"""
+        text = "PASSPORT หนังสือเดินทาง Nationality: THAI 1234567890123"
+        scores = score_document_types(text, [])
+        
+        assert list(scores) == ["passport", "card_id"]
+        assert classify_document_type(text, []) == "passport"
+    
+    def test_ties_follow_label_priority(self):
+        """Test that equal scores keep the rule file's label order"""
+        scores = score_document_types("passport 1234567890123", [])
+        assert list(scores) == ["card_id", "passport"]
+    
+    def test_overlapping_matches_are_all_found(self):
+        """Test rules whose matches overlap in the text"""
+        scores = score_document_types("thai national identification card", [])
+        assert scores["card_id"] == 2.0
+    
+    def test_layout_scores_with_observations(self):
+        """Test the layout fallback on a columnar container"""
+        texts = ["นาย สมชาย", "Date of Birth", "Line 3", "Line 4", "Line 5", "Line 6"]
+        observations = TextObservations(np.zeros((6, 4)), np.full(6, 0.9), texts)
+        scores = score_document_types("document info", observations)
+        
+        assert scores == {"card_id": 2.0}
+    
+    def test_layout_not_used_when_primary_matches(self):
+        """Test that layout rules only apply as a fallback"""
+        elements = [{"text": "ชื่อ นาย สมชาย"}] * 6
+        scores = score_document_types("ใบขับขี่", elements)
+        assert scores == {"driving_license": 1.0}
+
+
+class TestRulesFile:
+    """Test cases for loading rules from a data file"""
+    
+    def test_default_rules_load(self):
+        """Test that the bundled rules file is valid"""
+        classifier = DocumentClassifier.from_file(DEFAULT_RULES_PATH)
+        assert classifier.labels == ["card_id", "passport", "driving_license"]
+    
+    def test_custom_rules(self, tmp_path):
+        """Test a classifier built from a custom rules file"""
+        rules_path = tmp_path / "rules.json"
+        rules_path.write_text(json.dumps({
+            "labels": ["invoice"],
+            "rules": [
+                {"label": "invoice", "pattern": "invoice", "weight": 2.0},
+                {"label": "invoice", "pattern": "ใบแจ้งหนี้", "weight": 1.0}
+            ]
+        }), encoding="utf-8")
+        classifier = DocumentClassifier.from_file(str(rules_path))
+        
+        assert classifier.score("INVOICE ใบแจ้งหนี้", []) == {"invoice": 3.0}
+        assert classifier.classify("passport", []) == "unknown"
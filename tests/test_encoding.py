@@ -0,0 +1,112 @@
+"""
+Unit tests for app/utils/encoding.py
+"""
+import io
+import pytest
+from PIL import Image
+from app.utils.encoding import (
+    negotiate_output_format, encode_image, output_extension, output_media_type,
+    supported_output_formats, accepts_encoding
+)
+
+
+class TestNegotiateOutputFormat:
+    """Test cases for output format negotiation"""
+
+    def test_default_is_png(self):
+        """Test that no parameter and no Accept header gives the default"""
+        assert negotiate_output_format() == "png"
+
+    def test_explicit_format_wins(self):
+        """Test that the request parameter overrides the Accept header"""
+        assert negotiate_output_format("jpeg", "image/png") == "jpeg"
+
+    def test_jpg_alias(self):
+        """Test that jpg is accepted as an alias for jpeg"""
+        assert negotiate_output_format("JPG") == "jpeg"
+
+    def test_unsupported_format_raises(self):
+        """Test that an unknown explicit format raises ValueError"""
+        with pytest.raises(ValueError):
+            negotiate_output_format("bmp")
+
+    def test_accept_header_quality(self):
+        """Test that the highest q-value supported type is chosen"""
+        assert negotiate_output_format(None, "image/png;q=0.5, image/jpeg;q=0.9") == "jpeg"
+
+    def test_accept_header_order_breaks_ties(self):
+        """Test that earlier types win on equal q-values"""
+        assert negotiate_output_format(None, "image/jpeg, image/png") == "jpeg"
+
+    def test_accept_wildcards_ignored(self):
+        """Test that browser wildcard headers keep the default"""
+        assert negotiate_output_format(None, "text/html,*/*;q=0.8,image/*") == "png"
+
+    def test_accept_zero_quality_excluded(self):
+        """Test that q=0 types are never chosen"""
+        assert negotiate_output_format(None, "image/jpeg;q=0") == "png"
+
+    @pytest.mark.skipif("webp" not in supported_output_formats(), reason="Pillow built without WebP")
+    def test_accept_webp(self):
+        """Test WebP negotiation from the Accept header"""
+        assert negotiate_output_format(None, "image/webp,image/png;q=0.8") == "webp"
+
+
+class TestAcceptsEncoding:
+    """Test cases for Accept-Encoding negotiation"""
+
+    def test_listed(self):
+        """Test that a listed coding is accepted"""
+        assert accepts_encoding("gzip, deflate, br", "gzip")
+
+    def test_zero_quality_refused(self):
+        """Test that q=0 turns a coding off, even with a wildcard"""
+        assert not accepts_encoding("gzip;q=0", "gzip")
+        assert not accepts_encoding("gzip; q=0.0, *", "gzip")
+
+    def test_only_exact_coding(self):
+        """Test that x-gzip does not count as accepting gzip"""
+        assert not accepts_encoding("x-gzip", "gzip")
+
+    def test_wildcard(self):
+        """Test that * accepts codings that are not listed"""
+        assert accepts_encoding("br;q=1.0, *;q=0.1", "gzip")
+        assert not accepts_encoding("*;q=0", "gzip")
+
+    def test_missing_header(self):
+        """Test that no header means identity only"""
+        assert not accepts_encoding(None, "gzip")
+        assert not accepts_encoding("identity", "gzip")
+
+
+class TestEncodeImage:
+    """Test cases for image encoding"""
+
+    @pytest.mark.parametrize("output_format", supported_output_formats())
+    def test_roundtrip(self, output_format):
+        """Test that every supported format decodes back to the same size"""
+        image = Image.new("RGB", (64, 48), color="red")
+        data, seconds = encode_image(image, output_format)
+
+        assert seconds >= 0
+        decoded = Image.open(io.BytesIO(data))
+        assert decoded.size == (64, 48)
+        assert decoded.format == {"png": "PNG", "jpeg": "JPEG", "webp": "WEBP"}[output_format]
+
+    def test_jpeg_drops_alpha(self):
+        """Test that RGBA images can be saved as JPEG"""
+        image = Image.new("RGBA", (10, 10), color=(255, 0, 0, 128))
+        data, _ = encode_image(image, "jpeg")
+        assert Image.open(io.BytesIO(data)).mode == "RGB"
+
+    def test_quality_affects_size(self):
+        """Test that lower JPEG quality gives smaller output"""
+        image = Image.effect_noise((128, 128), 64).convert("RGB")
+        high, _ = encode_image(image, "jpeg", 95)
+        low, _ = encode_image(image, "jpeg", 20)
+        assert len(low) < len(high)
+
+    def test_extension_and_media_type(self):
+        """Test format metadata lookups"""
+        assert output_extension("jpeg") == "jpg"
+        assert output_media_type("webp") == "image/webp"
@@ -0,0 +1,27 @@
+"""
+Unit tests for app/utils/env.py
+"""
+import pytest
+from app.utils.env import env_flag
+
+
+class TestEnvFlag:
+    """Test cases for reading boolean environment variables"""
+
+    def test_unset_keeps_default(self, monkeypatch):
+        """Test that an unset variable returns the default"""
+        monkeypatch.delenv("TEST_ENV_FLAG", raising=False)
+        assert env_flag("TEST_ENV_FLAG", True) is True
+        assert env_flag("TEST_ENV_FLAG", False) is False
+
+    @pytest.mark.parametrize("value", ["1", "true", "TRUE", "Yes", "on", " On "])
+    def test_truthy_values(self, monkeypatch, value):
+        """Test that truthy values are recognised regardless of case"""
+        monkeypatch.setenv("TEST_ENV_FLAG", value)
+        assert env_flag("TEST_ENV_FLAG", False) is True
+
+    @pytest.mark.parametrize("value", ["0", "false", "FALSE", "No", "off", ""])
+    def test_other_values_are_false(self, monkeypatch, value):
+        """Test that anything else turns a default-on flag off"""
+        monkeypatch.setenv("TEST_ENV_FLAG", value)
+        assert env_flag("TEST_ENV_FLAG", True) is False
@@ -0,0 +1,146 @@
+"""
+Unit tests for app/face/batch.py
+"""
+import pytest
+from app.face.batch import analyze_faces, best_face, match_results
+from app.utils.visualization import face_overlay
+
+
+class FakeRect:
+    """Stands in for a CGRect"""
+
+    class _Pair:
+        def __init__(self, a, b, names):
+            setattr(self, names[0], a)
+            setattr(self, names[1], b)
+
+    def __init__(self, x, y, w, h):
+        self.origin = self._Pair(x, y, ("x", "y"))
+        self.size = self._Pair(w, h, ("width", "height"))
+
+
+class FakeFace:
+    """Stands in for a VNFaceObservation"""
+
+    def __init__(self, index, quality=None, landmarks=None):
+        self.index = index
+        self.quality = quality
+        self._landmarks = landmarks
+
+    def boundingBox(self):
+        return FakeRect(0.05 * self.index, 0.1, 0.04, 0.05)
+
+    def faceCaptureQuality(self):
+        return self.quality
+
+    def landmarks(self):
+        return self._landmarks
+
+
+class FakeRequest:
+    """Stands in for a Vision face request; produces one result per input face"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.inputs = []
+        self._results = None
+
+    def setInputFaceObservations_(self, observations):
+        self.inputs = list(observations)
+
+    def perform(self):
+        if self.kind == "quality":
+            self._results = [FakeFace(face.index, quality=0.1 * face.index) for face in self.inputs]
+        else:
+            self._results = [FakeFace(face.index, landmarks=object()) for face in self.inputs]
+        # Vision gives no ordering guarantee
+        self._results.reverse()
+
+    def results(self):
+        return self._results
+
+
+class CountingHandler:
+    """Stands in for VNImageRequestHandler and counts framework calls"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def performRequests_error_(self, requests, error):
+        self.calls += 1
+        for request in requests:
+            request.perform()
+        return True
+
+
+class TestAnalyzeFaces:
+    """Test cases for batched quality and landmark analysis"""
+
+    @pytest.mark.parametrize("face_count", [1, 2, 10, 50])
+    def test_call_count_constant(self, face_count):
+        """Test that one framework call covers every face"""
+        handler = CountingHandler()
+        faces = [FakeFace(i) for i in range(1, face_count + 1)]
+        analyze_faces(handler, faces, FakeRequest("quality"), FakeRequest("landmarks"))
+        assert handler.calls == 1
+
+    def test_no_faces_no_calls(self):
+        """Test that an empty batch does not touch the handler"""
+        handler = CountingHandler()
+        assert analyze_faces(handler, [], FakeRequest("quality")) == []
+        assert handler.calls == 0
+
+    def test_results_matched_to_faces(self):
+        """Test that reordered results land on the right face"""
+        faces = [FakeFace(i) for i in range(1, 4)]
+        results = analyze_faces(CountingHandler(), faces, FakeRequest("quality"), FakeRequest("landmarks"))
+
+        assert [r["id"] for r in results] == ["1", "2", "3"]
+        assert [r["quality_score"] for r in results] == pytest.approx([0.1, 0.2, 0.3])
+        assert all(r["has_landmarks"] for r in results)
+
+    def test_landmarks_opt_in(self):
+        """Test that landmarks are left out unless a request is given"""
+        quality_request = FakeRequest("quality")
+        results = analyze_faces(CountingHandler(), [FakeFace(1)], quality_request)
+        assert results[0]["has_landmarks"] is None
+        assert results[0]["quality_score"] == pytest.approx(0.1)
+
+    def test_missing_quality(self):
+        """Test a face the quality request returned nothing for"""
+        class EmptyRequest(FakeRequest):
+            def perform(self):
+                self._results = []
+
+        results = analyze_faces(CountingHandler(), [FakeFace(1)], EmptyRequest("quality"))
+        assert results[0]["quality_score"] is None
+        assert best_face(results) == (None, None)
+        assert face_overlay(results, 100, 100)["labels"] == ["Q: -"]
+
+
+class TestMatching:
+    """Test cases for lining results up with their faces"""
+
+    def test_falls_back_to_order(self):
+        """Test index matching when no bounding boxes agree"""
+        faces = [FakeFace(1), FakeFace(2)]
+        results = [FakeFace(7), FakeFace(8)]
+        assert match_results(faces, results) == results
+
+    def test_unmatched(self):
+        """Test that unmatched faces get None"""
+        assert match_results([FakeFace(1), FakeFace(2)], [FakeFace(9)]) == [None, None]
+        assert match_results([FakeFace(1)], None) == [None]
+
+
+class TestBestFace:
+    """Test cases for picking the reported face"""
+
+    def test_highest_score_first_on_ties(self):
+        """Test that the first highest score wins, as before"""
+        faces = [
+            {"bbox": {"x": 0.1}, "quality_score": 0.5},
+            {"bbox": {"x": 0.2}, "quality_score": 0.9},
+            {"bbox": {"x": 0.3}, "quality_score": 0.9},
+        ]
+        assert best_face(faces) == (0.9, {"x": 0.2})
@@ -0,0 +1,120 @@
+"""
+Unit tests for app/face/stream.py
+"""
+import asyncio
+import pytest
+from app.face.stream import LatestFrameSlot, LatencyStats, compact_face_result
+
+
+class TestLatestFrameSlot:
+    """Test cases for the newest-frame-only buffer"""
+
+    def test_get_returns_latest_frame(self):
+        """Test that only the newest frame is handed out"""
+        async def scenario():
+            slot = LatestFrameSlot()
+            slot.put(b"frame-1")
+            slot.put(b"frame-2")
+            slot.put(b"frame-3")
+            return slot, await slot.get()
+
+        slot, frame = asyncio.run(scenario())
+
+        assert frame[0] == 3
+        assert frame[1] == b"frame-3"
+        assert slot.received == 3
+        assert slot.dropped == 2
+
+    def test_get_waits_for_frame(self):
+        """Test that get blocks until a frame arrives"""
+        async def scenario():
+            slot = LatestFrameSlot()
+            waiter = asyncio.create_task(slot.get())
+            await asyncio.sleep(0)
+            assert not waiter.done()
+            slot.put(b"frame")
+            return await waiter
+
+        frame = asyncio.run(scenario())
+        assert frame[1] == b"frame"
+
+    def test_close_releases_waiter(self):
+        """Test that closing the slot wakes a pending get with None"""
+        async def scenario():
+            slot = LatestFrameSlot()
+            waiter = asyncio.create_task(slot.get())
+            await asyncio.sleep(0)
+            slot.close()
+            return await waiter
+
+        assert asyncio.run(scenario()) is None
+
+    def test_pending_frame_delivered_after_close(self):
+        """Test that a frame stored before close is still delivered"""
+        async def scenario():
+            slot = LatestFrameSlot()
+            slot.put(b"last")
+            slot.close()
+            return await slot.get(), await slot.get()
+
+        frame, after = asyncio.run(scenario())
+        assert frame[1] == b"last"
+        assert after is None
+
+
+class TestLatencyStats:
+    """Test cases for rolling latency statistics"""
+
+    def test_empty_summary(self):
+        """Test summary with no samples"""
+        summary = LatencyStats().summary()
+        assert summary["count"] == 0
+        assert summary["avg_ms"] is None
+
+    def test_summary_values(self):
+        """Test last, average and p95 values in milliseconds"""
+        stats = LatencyStats()
+        for seconds in [0.01, 0.02, 0.03]:
+            stats.add(seconds)
+
+        summary = stats.summary()
+        assert summary["count"] == 3
+        assert summary["last_ms"] == 30.0
+        assert summary["avg_ms"] == 20.0
+        assert summary["p95_ms"] == 30.0
+
+    def test_window_limits_samples(self):
+        """Test that old samples fall out of the window"""
+        stats = LatencyStats(window=2)
+        for seconds in [1.0, 0.01, 0.01]:
+            stats.add(seconds)
+
+        summary = stats.summary()
+        assert summary["count"] == 3
+        assert summary["avg_ms"] == 10.0
+
+
+class TestCompactFaceResult:
+    """Test cases for compact per-frame face results"""
+
+    def test_drops_heavy_fields(self):
+        """Test that images and per-face details are not included"""
+        result = compact_face_result({
+            "has_face": True,
+            "face_count": 1,
+            "quality_score": 0.123456,
+            "position": {"x": 0.1, "y": 0.2, "width": 0.3, "height": 0.4},
+            "faces": [{"id": "1"}],
+            "processing_time": 0.05,
+            "output_image": object()
+        })
+
+        assert result["quality_score"] == 0.1235
+        assert "faces" not in result
+        assert "output_image" not in result
+
+    def test_error_is_kept(self):
+        """Test that engine errors are forwarded"""
+        result = compact_face_result({"has_face": False, "error": "boom"})
+        assert result["error"] == "boom"
+        assert result["quality_score"] is None
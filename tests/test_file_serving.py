@@ -0,0 +1,182 @@
+"""
+Unit tests for app/utils/file_serving.py
+"""
+import asyncio
+import hashlib
+import os
+import pytest
+from app.utils.file_serving import (
+    is_safe_filename, resolve_output_path, ETagCache, etag_matches, parse_range,
+    iter_range, serve_file, GENERATED_FILENAME_RE, IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL
+)
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    folder = tmp_path / "output"
+    folder.mkdir()
+    (folder / "card_20250101_120000_abcdef12.png").write_bytes(b"0123456789")
+    (tmp_path / "secret.txt").write_text("secret")
+    return folder
+
+
+class TestFilenameValidation:
+    """Test cases for filename validation and path resolution"""
+
+    @pytest.mark.parametrize("filename", [
+        "ocr_20250101_120000_abcdef12.png", "test_output.png", "a.overlay.json"
+    ])
+    def test_safe_names(self, filename):
+        """Test that plain file names are accepted"""
+        assert is_safe_filename(filename)
+
+    @pytest.mark.parametrize("filename", [
+        "../secret.txt", "..", ".hidden", "a/b.png", "a\\b.png", "a..b", "", "name with space.png", "x" * 300
+    ])
+    def test_unsafe_names(self, filename):
+        """Test that traversal and unusual names are rejected"""
+        assert not is_safe_filename(filename)
+
+    def test_resolve_existing(self, output_dir):
+        """Test that an existing file resolves to its real path"""
+        path = resolve_output_path(str(output_dir), "card_20250101_120000_abcdef12.png")
+        assert path == os.path.realpath(output_dir / "card_20250101_120000_abcdef12.png")
+
+    def test_resolve_missing(self, output_dir):
+        """Test that a missing file resolves to None"""
+        assert resolve_output_path(str(output_dir), "missing.png") is None
+
+    def test_resolve_traversal(self, output_dir):
+        """Test that traversal outside the folder resolves to None"""
+        assert resolve_output_path(str(output_dir), "../secret.txt") is None
+
+    def test_resolve_symlink_escape(self, output_dir):
+        """Test that symlinks pointing outside the folder are refused"""
+        os.symlink(output_dir.parent / "secret.txt", output_dir / "link.txt")
+        assert resolve_output_path(str(output_dir), "link.txt") is None
+
+    def test_resolve_directory(self, output_dir):
+        """Test that directories are not served"""
+        (output_dir / "subdir").mkdir()
+        assert resolve_output_path(str(output_dir), "subdir") is None
+
+    def test_generated_name_pattern(self):
+        """Test which names are treated as immutable"""
+        assert GENERATED_FILENAME_RE.match("perspective_20250101_120000_abcdef12.webp")
+        assert GENERATED_FILENAME_RE.match("ocr_20250101_120000_abcdef12.overlay.json")
+        assert not GENERATED_FILENAME_RE.match("test_output.png")
+
+
+class TestETagCache:
+    """Test cases for content-hash ETags"""
+
+    def test_etag_is_sha256(self, output_dir):
+        """Test that the ETag is the quoted sha256 of the content"""
+        path = str(output_dir / "card_20250101_120000_abcdef12.png")
+        etag = ETagCache().get(path, os.stat(path))
+        assert etag == '"%s"' % hashlib.sha256(b"0123456789").hexdigest()
+
+    def test_cached_until_file_changes(self, output_dir):
+        """Test that the hash is reused until size or mtime change"""
+        path = str(output_dir / "card_20250101_120000_abcdef12.png")
+        cache = ETagCache()
+        first = cache.get(path, os.stat(path))
+        assert cache.get(path, os.stat(path)) == first
+        assert len(cache) == 1
+
+        with open(path, "wb") as f:
+            f.write(b"changed content")
+        assert cache.get(path, os.stat(path)) != first
+
+    def test_bounded(self, output_dir):
+        """Test that the cache evicts oldest entries"""
+        cache = ETagCache(max_entries=2)
+        for i in range(3):
+            path = output_dir / f"f{i}.png"
+            path.write_bytes(bytes([i]))
+            cache.get(str(path), os.stat(path))
+        assert len(cache) == 2
+
+
+class TestConditionalAndRange:
+    """Test cases for If-None-Match and Range parsing"""
+
+    def test_etag_matches(self):
+        """Test strong, weak, list and wildcard matches"""
+        assert etag_matches('"abc"', '"abc"')
+        assert etag_matches('W/"abc"', '"abc"')
+        assert etag_matches('"x", "abc"', '"abc"')
+        assert etag_matches("*", '"abc"')
+        assert not etag_matches('"x"', '"abc"')
+        assert not etag_matches(None, '"abc"')
+
+    @pytest.mark.parametrize("header,expected", [
+        ("bytes=0-3", (0, 3)),
+        ("bytes=5-", (5, 9)),
+        ("bytes=-4", (6, 9)),
+        ("bytes=-100", (0, 9)),
+        ("bytes=8-100", (8, 9)),
+        (None, None),
+        ("items=0-1", None),
+        ("bytes=0-1,3-4", None),
+        ("bytes=a-b", None),
+        ("bytes=-", None),
+    ])
+    def test_parse_range(self, header, expected):
+        """Test single-range parsing against a 10 byte file"""
+        assert parse_range(header, 10) == expected
+
+    @pytest.mark.parametrize("header", ["bytes=10-", "bytes=5-2", "bytes=-0"])
+    def test_unsatisfiable_range(self, header):
+        """Test that unsatisfiable ranges raise ValueError"""
+        with pytest.raises(ValueError):
+            parse_range(header, 10)
+
+
+class TestServeFile:
+    """Test cases for building the file response"""
+
+    def _serve(self, output_dir, **kwargs):
+        path = str(output_dir / "card_20250101_120000_abcdef12.png")
+        return serve_file(path, '"tag"', os.stat(path), **kwargs)
+
+    def test_cache_control(self, output_dir):
+        """Test immutable and revalidate cache headers"""
+        assert self._serve(output_dir, immutable=True).headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        assert self._serve(output_dir, immutable=False).headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+
+    def test_not_modified(self, output_dir):
+        """Test 304 when If-None-Match matches"""
+        response = self._serve(output_dir, immutable=True, if_none_match='"tag"')
+        assert response.status_code == 304
+        assert response.headers["etag"] == '"tag"'
+
+    def test_partial_content(self, output_dir):
+        """Test 206 with the requested slice"""
+        response = self._serve(output_dir, immutable=True, range_header="bytes=2-4")
+        assert response.status_code == 206
+        assert b"".join(asyncio.run(self._collect(response))) == b"234"
+        assert response.headers["content-range"] == "bytes 2-4/10"
+        assert response.headers["content-length"] == "3"
+        assert response.media_type == "image/png"
+
+    def test_range_read_in_chunks(self, output_dir):
+        """Test that a range is streamed in bounded chunks"""
+        path = str(output_dir / "card_20250101_120000_abcdef12.png")
+        assert list(iter_range(path, 1, 7, chunk_size=3)) == [b"123", b"456", b"7"]
+
+    @staticmethod
+    async def _collect(response):
+        return [chunk async for chunk in response.body_iterator]
+
+    def test_range_not_satisfiable(self, output_dir):
+        """Test 416 with the full size in Content-Range"""
+        response = self._serve(output_dir, immutable=True, range_header="bytes=20-")
+        assert response.status_code == 416
+        assert response.headers["content-range"] == "bytes */10"
+
+    def test_stale_if_range_serves_full(self, output_dir):
+        """Test that a mismatched If-Range ignores the Range header"""
+        response = self._serve(output_dir, immutable=True, range_header="bytes=2-4", if_range='"old"')
+        assert response.status_code == 200
+        assert response.headers["etag"] == '"tag"'
@@ -0,0 +1,307 @@
+"""
+Unit tests for app/wrap/geometry.py
+"""
+import math
+import numpy as np
+import pytest
+from app.wrap.geometry import (
+    Quad, point_xy, side_lengths, dimensions, areas, clockwise, validate_quads,
+    score_quads, best_quad_index, affine_matrix, to_cg_affine, transform_extent, orientation_steps,
+    plan_render
+)
+
+
+class FakeVector:
+    """Stands in for a CIVector"""
+
+    def __init__(self, x, y):
+        self._x = x
+        self._y = y
+
+    def X(self):
+        return self._x
+
+    def Y(self):
+        return self._y
+
+
+class FakePoint:
+    """Stands in for a CGPoint"""
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+RECT = Quad([[0, 0], [200, 0], [200, 100], [0, 100]])
+
+
+def legacy_score(corners, confidence):
+    """Scalar scoring exactly as find_best_rectangle did it per observation"""
+    tl, tr, br, bl = [FakePoint(*c) for c in corners]
+    width = ((tr.x - tl.x) + (br.x - bl.x)) / 2
+    height = ((bl.y - tl.y) + (br.y - tr.y)) / 2
+    area = width * height
+    center_x = (tl.x + tr.x + br.x + bl.x) / 4
+    center_y = (tl.y + tr.y + br.y + bl.y) / 4
+    dist_from_center = math.sqrt((center_x - 0.5)**2 + (center_y - 0.5)**2)
+    center_score = 1.0 - min(dist_from_center * 2, 0.8)
+    aspect = max(width, height) / min(width, height) if min(width, height) > 0 else 999
+    shape_score = 0.0
+    for target_ratio in [1.414, 1.5, 1.33, 1.77]:
+        ratio_diff = abs(aspect - target_ratio)
+        if ratio_diff < 0.5:
+            shape_score = max(shape_score, 1.0 - ratio_diff)
+    return confidence * 0.3 + area * 2 * 0.4 + center_score * 0.2 + shape_score * 0.1
+
+
+class TestPointConversion:
+    """Test cases for reading points at the framework boundary"""
+
+    def test_point_types(self):
+        """Test CIVector-like, CGPoint-like, dict and tuple points"""
+        assert point_xy(FakeVector(1, 2)) == (1.0, 2.0)
+        assert point_xy(FakePoint(3, 4)) == (3.0, 4.0)
+        assert point_xy({"x": 5, "y": 6}) == (5.0, 6.0)
+        assert point_xy((7, 8)) == (7.0, 8.0)
+
+    def test_unknown_point(self):
+        """Test that unsupported values raise TypeError"""
+        with pytest.raises(TypeError):
+            point_xy(object())
+
+    def test_from_points(self):
+        """Test building a Quad from mixed point objects"""
+        quad = Quad.from_points(FakeVector(0, 0), {"x": 200, "y": 0}, (200, 100), FakePoint(0, 100))
+        np.testing.assert_array_equal(quad.points, RECT.points)
+
+    def test_from_vision_flips_y(self):
+        """Test conversion from normalized bottom-left coordinates"""
+        quad = Quad.from_vision([[0.1, 0.9], [0.9, 0.9], [0.9, 0.1], [0.1, 0.1]], 100, 200)
+        np.testing.assert_allclose(quad.points, [[10, 20], [90, 20], [90, 180], [10, 180]])
+
+    def test_bad_shape(self):
+        """Test that batches must be (n, 4, 2)"""
+        with pytest.raises(ValueError):
+            areas(np.zeros((2, 3, 2)))
+
+
+class TestMeasurements:
+    """Test cases for sides, dimensions, area and winding"""
+
+    def test_dimensions(self):
+        """Test width and height of an axis-aligned rectangle"""
+        assert RECT.dimensions() == (200.0, 100.0)
+        assert RECT.aspect_ratio() == 2.0
+        np.testing.assert_array_equal(RECT.side_lengths(), [200, 100, 200, 100])
+
+    def test_degenerate_aspect(self):
+        """Test that a collapsed quad reports aspect 1.0"""
+        assert Quad(np.zeros((4, 2))).aspect_ratio() == 1.0
+
+    def test_area(self):
+        """Test area of a rectangle and a trapezoid"""
+        assert RECT.area() == 20000.0
+        assert Quad([[0, 0], [4, 0], [3, 2], [1, 2]]).area() == 6.0
+
+    def test_area_independent_of_winding(self):
+        """Test that reversing the corner order keeps the area"""
+        reversed_quad = Quad(RECT.points[::-1])
+        assert reversed_quad.area() == RECT.area()
+
+    def test_clockwise(self):
+        """Test winding detection and reordering"""
+        assert RECT.is_clockwise()
+        counter = Quad([[0, 100], [200, 100], [200, 0], [0, 0]])
+        assert not counter.is_clockwise()
+        assert counter.clockwise_order() == (3, 0, 1, 2)
+        np.testing.assert_array_equal(counter.clockwise().points, counter.points[[3, 0, 1, 2]])
+
+    def test_batched_functions(self):
+        """Test that batch helpers agree with per-quad methods"""
+        rng = np.random.default_rng(0)
+        quads = rng.uniform(0, 100, size=(50, 4, 2))
+
+        batch_areas = areas(quads)
+        batch_dims = dimensions(quads)
+        batch_clockwise = clockwise(quads)
+        batch_sides = side_lengths(quads)
+        for i, points in enumerate(quads):
+            quad = Quad(points)
+            assert batch_areas[i] == pytest.approx(quad.area())
+            assert tuple(batch_dims[i]) == pytest.approx(quad.dimensions())
+            assert batch_clockwise[i] == quad.is_clockwise()
+            np.testing.assert_allclose(batch_sides[i], quad.side_lengths())
+
+
+class TestOrientation:
+    """Test cases for document orientation analysis"""
+
+    def test_portrait_is_normal(self):
+        """Test an upright portrait document"""
+        orientation, aspect = Quad([[0, 0], [100, 0], [100, 141], [0, 141]]).orientation()
+        assert orientation == "normal"
+        assert aspect == pytest.approx(1.41)
+
+    def test_landscape_needs_rotation_check(self):
+        """Test a wide document is flagged for rotation"""
+        assert RECT.orientation()[0] == "check_rotation"
+
+    def test_upside_down(self):
+        """Test a document whose bottom edge is above its top edge"""
+        quad = Quad([[100, 141], [0, 141], [0, 0], [100, 0]])
+        assert quad.orientation()[0] == "upside_down"
+
+    @pytest.mark.parametrize("points,expected", [
+        ([[0, 0], [0, 141], [100, 141], [100, 0]], "rotated_90_cw"),
+        ([[0, 0], [0, 141], [100, 140], [100, 2]], "rotated_90_ccw"),
+    ])
+    def test_rotated(self, points, expected):
+        """Test documents whose top edge runs down the image"""
+        assert Quad(points).orientation()[0] == expected
+
+
+class TestValidation:
+    """Test cases for quadrilateral validation"""
+
+    def test_valid(self):
+        """Test a plausible document quad"""
+        assert RECT.is_valid(400, 300)
+        assert RECT.validation_error(400, 300) is None
+
+    @pytest.mark.parametrize("points,reason", [
+        ([[0, 0], [600, 0], [600, 100], [0, 100]], "outside image bounds"),
+        ([[0, 0], [5, 0], [5, 100], [0, 100]], "One side is too small"),
+        ([[0, 0], [390, 0], [390, 30], [0, 30]], "Aspect ratio is extreme"),
+        ([[0, 0], [200, 0], [0, 100], [200, 100]], "area is too small"),
+    ])
+    def test_invalid(self, points, reason):
+        """Test each rejection rule"""
+        quad = Quad(points)
+        if reason == "area is too small":
+            assert quad.validation_error(400, 300, min_area_ratio=0.2) is not None
+            assert reason in quad.validation_error(400, 300, min_area_ratio=0.2)
+        else:
+            assert reason in quad.validation_error(400, 300)
+
+    def test_batch_matches_scalar(self):
+        """Test that validate_quads agrees with validation_error"""
+        rng = np.random.default_rng(1)
+        quads = rng.uniform(-150, 550, size=(200, 4, 2))
+
+        mask = validate_quads(quads, 400, 300)
+        expected = [Quad(q).is_valid(400, 300) for q in quads]
+        assert mask.tolist() == expected
+        assert any(expected)
+
+
+class TestScoring:
+    """Test cases for batch rectangle scoring"""
+
+    def test_matches_legacy_scores(self):
+        """Test that vectorized scores equal the per-observation loop"""
+        rng = np.random.default_rng(2)
+        quads = rng.uniform(0, 1, size=(100, 4, 2))
+        confidences = rng.uniform(0, 1, size=100)
+
+        scores = score_quads(quads, confidences)["score"]
+        expected = [legacy_score(q, c) for q, c in zip(quads, confidences)]
+        np.testing.assert_allclose(scores, expected)
+
+    def test_matches_legacy_on_vision_layout(self):
+        """Test Vision-style corners where the signed height is negative"""
+        quads = np.array([
+            [[0.1, 0.9], [0.9, 0.9], [0.9, 0.1], [0.1, 0.1]],
+            [[0.3, 0.7], [0.6, 0.7], [0.6, 0.4], [0.3, 0.4]],
+        ])
+        confidences = np.array([0.9, 0.8])
+        scored = score_quads(quads, confidences)
+
+        assert (scored["aspect"] == 999).all()
+        np.testing.assert_allclose(scored["score"], [legacy_score(q, c) for q, c in zip(quads, confidences)])
+
+    def test_best_index(self):
+        """Test that the first highest positive score wins"""
+        assert best_quad_index(np.array([0.1, 0.5, 0.5])) == 1
+        assert best_quad_index(np.array([-0.1, 0.0])) is None
+        assert best_quad_index(np.array([])) is None
+
+
+def legacy_turns(orientation, document_aspect, width, height):
+    """Degrees turned by fix_output_orientation then check_and_fix_orientation"""
+    turns = []
+    if orientation == "upside_down":
+        turns.append(180)
+    elif orientation == "rotated_90_cw":
+        turns.append(-90)
+        width, height = height, width
+    elif orientation == "rotated_90_ccw" or (orientation == "check_rotation" and width / height > 1.3):
+        turns.append(90)
+        width, height = height, width
+
+    aspect = width / height
+    need_rotation = False
+    if (aspect < 1.0 and document_aspect > 1.3) or (aspect > 1.3 and document_aspect < 1.0):
+        need_rotation = True
+    else:
+        for ratio in [1.414, 1.59, 1.294]:
+            if abs(aspect - ratio) < 0.1:
+                break
+            elif abs(aspect - (1 / ratio)) < 0.1:
+                need_rotation = True
+                break
+    if need_rotation:
+        turns.append(90)
+        width, height = height, width
+    return turns, (width, height)
+
+
+class TestRenderPlan:
+    """Test cases for planning the fused orientation and resize"""
+
+    def test_affine_quarter_turn_is_exact(self):
+        """Test that quarter turns carry no floating point dust"""
+        matrix = affine_matrix(math.pi / 2, 100, 0)
+        assert to_cg_affine(matrix) == (0.0, 1.0, -1.0, 0.0, 100.0, 0.0)
+
+    @pytest.mark.parametrize("orientation", ["normal", "upside_down", "rotated_90_cw", "rotated_90_ccw", "check_rotation"])
+    @pytest.mark.parametrize("size", [(100, 141), (141, 100), (200, 100), (100, 100)])
+    @pytest.mark.parametrize("document_aspect", [0.7, 1.0, 1.41])
+    def test_matches_legacy_steps(self, orientation, size, document_aspect):
+        """Test that the planned turns equal the two-pass legacy fix"""
+        steps, rotated = orientation_steps(orientation, document_aspect, *size)
+        turns, expected_size = legacy_turns(orientation, document_aspect, *size)
+
+        assert [round(math.degrees(angle)) for angle, _, _ in steps] == turns
+        assert rotated == expected_size
+
+    @pytest.mark.parametrize("orientation", ["normal", "upside_down", "rotated_90_cw", "rotated_90_ccw", "check_rotation"])
+    def test_composed_matrix_lands_at_origin(self, orientation):
+        """Test that the single affine maps the image onto (0, 0, w', h')"""
+        plan = plan_render(200, 100, orientation, 1.41, origin=(5, 7))
+        width, height = plan["rotated_size"]
+        extent = transform_extent(plan["matrix"], 200, 100, origin=(5, 7))
+        assert extent == pytest.approx((0, 0, width, height))
+
+    def test_identity_when_nothing_to_fix(self):
+        """Test that an image already matching the document needs no affine and no resize"""
+        plan = plan_render(141, 100, "normal", 1.41)
+        assert plan["identity"]
+        assert plan["turns"] == 0
+        assert plan["scale"] is None
+        assert plan["output_size"] == (141, 100)
+
+    def test_scale_targets_output_size(self):
+        """Test the Lanczos scale and aspect for the rotated image"""
+        plan = plan_render(200, 100, "check_rotation", 0.7, output_width=50, output_height=80)
+        assert plan["rotated_size"] == (100, 200)
+        scale = plan["scale"]
+        assert scale["scale"] == pytest.approx(80 / 200)
+        assert 100 * scale["scale"] * scale["aspect_ratio"] == pytest.approx(50)
+        assert plan["output_size"] == (50, 80)
+
+    def test_resize_needs_both_dimensions(self):
+        """Test that a single output dimension leaves the size alone, as before"""
+        plan = plan_render(141, 100, "normal", 1.41, output_width=50)
+        assert plan["scale"] is None
+        assert plan["output_size"] == (141, 100)
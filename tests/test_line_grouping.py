@@ -0,0 +1,117 @@
+"""
+Unit tests for app/ocr/line_grouping.py
+"""
+import time
+import numpy as np
+import pytest
+from app.ocr.line_grouping import assign_line_labels, build_text_lines
+from app.ocr.observations import TextObservations
+
+
+def make_page(rows, columns, words_per_column, height=30.0, line_spacing=1.5, seed=0):
+    """Build a synthetic page of word boxes laid out in columns"""
+    rng = np.random.default_rng(seed)
+    boxes = []
+    texts = []
+    column_width = words_per_column * 100.0
+    for row in range(rows):
+        for column in range(columns):
+            for word in range(words_per_column):
+                x = column * (column_width + 6 * height) + word * 100.0
+                y = row * height * line_spacing + rng.uniform(-0.2, 0.2) * height
+                boxes.append((x, y, 90.0, height))
+                texts.append(f"r{row}c{column}w{word}")
+    return np.array(boxes), np.full(len(boxes), 0.9), texts
+
+
+class TestAssignLineLabels:
+    """Test cases for assign_line_labels function"""
+
+    def test_empty_boxes(self):
+        """Test with no boxes"""
+        order, labels = assign_line_labels(np.empty((0, 4)))
+        assert len(order) == 0
+        assert len(labels) == 0
+
+    def test_order_is_reading_order(self):
+        """Test that order walks top to bottom, then left to right"""
+        boxes = np.array([
+            [100, 0, 50, 20],
+            [0, 40, 50, 20],
+            [0, 2, 50, 20],
+        ], dtype=float)
+        order, labels = assign_line_labels(boxes)
+
+        assert order.tolist() == [2, 0, 1]
+        assert labels.tolist() == [0, 0, 1]
+
+    def test_columns_split_into_separate_lines(self):
+        """Test that a wide gutter splits a band into two lines"""
+        boxes = np.array([
+            [0, 0, 50, 20],
+            [60, 0, 50, 20],
+            [500, 3, 50, 20],
+        ], dtype=float)
+        order, labels = assign_line_labels(boxes)
+
+        assert labels.tolist() == [0, 0, 1]
+
+    def test_offset_columns_do_not_interleave(self):
+        """Test two columns whose baselines are offset by half a line"""
+        left = [[0, row * 40.0, 100, 20] for row in range(5)]
+        right = [[600, row * 40.0 + 20.0, 100, 20] for row in range(5)]
+        boxes = np.array(left + right, dtype=float)
+        order, labels = assign_line_labels(boxes)
+
+        assert labels.max() + 1 == 10
+
+    def test_wide_box_does_not_hide_gutter(self):
+        """Test that a long box ending before the gutter keeps the split"""
+        boxes = np.array([
+            [0, 0, 300, 20],
+            [10, 1, 50, 20],
+            [700, 0, 50, 20],
+        ], dtype=float)
+        order, labels = assign_line_labels(boxes)
+
+        assert labels[order.tolist().index(2)] == 1
+
+
+class TestBuildTextLines:
+    """Test cases for build_text_lines function"""
+
+    def test_line_fields(self):
+        """Test text, confidence and bounding box of a line"""
+        elements = [
+            {"text": "World", "confidence": 0.5, "position": {"x": 70, "y": 22, "width": 60, "height": 25}},
+            {"text": "Hello", "confidence": 1.0, "position": {"x": 10, "y": 20, "width": 50, "height": 20}},
+        ]
+        observations = TextObservations.from_elements(elements)
+        result = build_text_lines(observations.boxes, observations.confidences, observations.texts)
+
+        line = result["line_1"]
+        assert line["text"] == "Hello World"
+        assert line["confidence"] == 0.75
+        assert line["position"] == {"x": 10.0, "y": 20.0, "width": 120.0, "height": 27.0}
+
+    def test_dense_page_grouping(self):
+        """Test a page of jittered words in two columns"""
+        boxes, confidences, texts = make_page(rows=40, columns=2, words_per_column=5)
+        result = build_text_lines(boxes, confidences, texts)
+
+        assert len(result) == 80
+        assert result["line_1"]["text"] == " ".join(f"r0c0w{i}" for i in range(5))
+        assert result["line_2"]["text"] == " ".join(f"r0c1w{i}" for i in range(5))
+
+    @pytest.mark.slow
+    def test_ten_thousand_elements(self):
+        """Benchmark-sized page with 10k elements"""
+        boxes, confidences, texts = make_page(rows=500, columns=2, words_per_column=10)
+        assert len(boxes) == 10000
+
+        start = time.perf_counter()
+        result = build_text_lines(boxes, confidences, texts)
+        elapsed = time.perf_counter() - start
+
+        assert len(result) == 1000
+        assert elapsed < 1.0
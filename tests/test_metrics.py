@@ -0,0 +1,42 @@
+"""
+Unit tests for app/utils/metrics.py
+"""
+import pytest
+from app.utils.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry:
+    """Test cases for the in-process metrics registry"""
+
+    def test_counter(self):
+        """Test that counters accumulate per label set"""
+        registry = MetricsRegistry()
+        registry.increment("requests", endpoint="ocr")
+        registry.increment("requests", endpoint="ocr")
+        registry.increment("requests", endpoint="face")
+
+        counters = registry.snapshot()["counters"]
+        values = {c["labels"]["endpoint"]: c["value"] for c in counters}
+        assert values == {"face": 1.0, "ocr": 2.0}
+
+    def test_summary(self):
+        """Test count, sum, min, max and avg of observations"""
+        registry = MetricsRegistry()
+        for value in (1.0, 3.0, 2.0):
+            registry.observe("output_bytes", value, format="png")
+
+        summary = registry.snapshot()["summaries"][0]
+        assert summary["name"] == "output_bytes"
+        assert summary["labels"] == {"format": "png"}
+        assert summary["count"] == 3
+        assert summary["sum"] == 6.0
+        assert summary["min"] == 1.0
+        assert summary["max"] == 3.0
+        assert summary["avg"] == 2.0
+
+    def test_reset(self):
+        """Test that reset clears all metrics"""
+        registry = MetricsRegistry()
+        registry.increment("requests")
+        registry.reset()
+        assert registry.snapshot() == {"counters": [], "summaries": []}
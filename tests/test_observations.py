@@ -0,0 +1,71 @@
+"""
+Unit tests for app/ocr/observations.py
+"""
+import numpy as np
+import pytest
+from app.ocr.observations import TextObservations, as_observations
+
+
+class TestTextObservations:
+    """Test cases for TextObservations container"""
+
+    def test_length_mismatch_raises(self):
+        """Test that columns must have the same length"""
+        with pytest.raises(ValueError):
+            TextObservations(np.zeros((2, 4)), np.zeros(1), ["a", "b"])
+
+    def test_empty(self):
+        """Test empty container"""
+        observations = TextObservations.empty()
+        assert len(observations) == 0
+        assert observations.mean_confidence() == 0.0
+        assert observations.boxes.shape == (0, 4)
+
+    def test_from_normalized_flips_y(self):
+        """Test conversion from Vision's bottom-left normalized boxes"""
+        observations = TextObservations.from_normalized(
+            np.array([[0.1, 0.7, 0.2, 0.1]]), np.array([0.9]), ["Hello"], 1000, 500
+        )
+        x, y, w, h = observations.boxes[0]
+
+        assert x == pytest.approx(100.0)
+        assert y == pytest.approx(100.0)
+        assert w == pytest.approx(200.0)
+        assert h == pytest.approx(50.0)
+
+    def test_from_elements(self):
+        """Test that element dicts are packed into the columns"""
+        elements = [
+            {"text": "สวัสดี", "confidence": 0.92, "position": {"x": 10, "y": 20, "width": 60, "height": 25}},
+            {"text": "ครับ", "confidence": 0.88, "position": {"x": 80, "y": 22, "width": 40, "height": 25}},
+        ]
+        observations = TextObservations.from_elements(elements)
+
+        assert observations.texts == ["สวัสดี", "ครับ"]
+        assert observations.confidences.tolist() == [0.92, 0.88]
+        assert observations.boxes.tolist() == [[10.0, 20.0, 60.0, 25.0], [80.0, 22.0, 40.0, 25.0]]
+
+    def test_joined_text_and_confidence(self):
+        """Test aggregate helpers"""
+        observations = TextObservations(np.zeros((2, 4)), np.array([1.0, 0.5]), ["a", "b"])
+        assert observations.joined_text() == "a\nb"
+        assert observations.mean_confidence() == 0.75
+
+    def test_nbytes_is_compact(self):
+        """Test that memory is a fixed number of bytes per element plus text"""
+        observations = TextObservations(np.zeros((100, 4)), np.zeros(100), ["abc"] * 100)
+        assert observations.nbytes() == 100 * (4 * 8 + 8 + 3)
+
+
+class TestAsObservations:
+    """Test cases for as_observations helper"""
+
+    def test_passthrough(self):
+        """Test that containers are returned unchanged"""
+        observations = TextObservations.empty()
+        assert as_observations(observations) is observations
+
+    def test_none_and_empty(self):
+        """Test that missing input becomes an empty container"""
+        assert len(as_observations(None)) == 0
+        assert len(as_observations([])) == 0
@@ -170,13 +170,13 @@ class TestOrganizeTextElementsIntoLines:
         assert "ครับ" in result["line_1"]["text"]
     
     def test_line_grouping_threshold(self):
-        """Test the line grouping threshold of 20 pixels"""
+        """Test that line grouping is relative to the text height"""
         elements = [
-            # These two should be on the same line (within 20px)
+            # These two overlap by more than half their height
             {"text": "A", "confidence": 0.9, "position": {"x": 0, "y": 0, "width": 10, "height": 10}},
-            {"text": "B", "confidence": 0.9, "position": {"x": 20, "y": 15, "width": 10, "height": 10}},
-            # This should be on a different line (more than 20px difference)
-            {"text": "C", "confidence": 0.9, "position": {"x": 0, "y": 40, "width": 10, "height": 10}},
+            {"text": "B", "confidence": 0.9, "position": {"x": 20, "y": 4, "width": 10, "height": 10}},
+            # This one sits clearly below
+            {"text": "C", "confidence": 0.9, "position": {"x": 0, "y": 15, "width": 10, "height": 10}},
         ]
         result = organize_text_elements_into_lines(elements)
         
@@ -184,3 +184,16 @@ class TestOrganizeTextElementsIntoLines:
         assert "A" in result["line_1"]["text"]
         assert "B" in result["line_1"]["text"]
         assert result["line_2"]["text"] == "C"
+    
+    def test_high_resolution_line_grouping(self):
+        """Test that tall text with more than 20px jitter stays on one line"""
+        elements = [
+            {"text": "Hello", "confidence": 0.9, "position": {"x": 0, "y": 100, "width": 300, "height": 120}},
+            {"text": "World", "confidence": 0.9, "position": {"x": 350, "y": 135, "width": 300, "height": 120}},
+            {"text": "Next", "confidence": 0.9, "position": {"x": 0, "y": 300, "width": 200, "height": 120}},
+        ]
+        result = organize_text_elements_into_lines(elements)
+        
+        assert len(result) == 2
+        assert result["line_1"]["text"] == "Hello World"
+        assert result["line_2"]["text"] == "Next"
@@ -0,0 +1,156 @@
+"""
+Unit tests for app/utils/prescreen.py
+"""
+import io
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFilter
+from app.utils.prescreen import (
+    prescreen, prescreen_enabled, thresholds_for, grayscale_thumbnail, laplacian_variance,
+    draft_proxy, measure, DEFAULT_THRESHOLDS, PRESCREEN_MAX_SIDE
+)
+
+
+def document_image(width=1200, height=1600):
+    """Dark text on off-white paper"""
+    image = Image.new("RGB", (width, height), (235, 232, 228))
+    draw = ImageDraw.Draw(image)
+    for row in range(60):
+        draw.text((50, 20 + row * 25), "Lorem ipsum dolor sit amet 12345 ABCDEFG " * 3, fill=(30, 30, 30))
+    return image
+
+
+def jpeg_bytes(image):
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=92)
+    return buffer.getvalue()
+
+
+def codes(result):
+    return [reason["code"] for reason in result["reasons"]]
+
+
+class TestMetrics:
+    """Test cases for the individual measurements"""
+
+    def test_jpeg_decoded_small(self):
+        """Test that a large JPEG upload is decoded at a reduced scale for the check"""
+        proxy = draft_proxy(jpeg_bytes(document_image(2400, 3200)))
+        proxy.load()
+        assert proxy.mode == "L"
+        assert PRESCREEN_MAX_SIDE <= max(proxy.size) < 3200
+
+    def test_jpeg_draft_matches_full_decode(self):
+        """Test that metrics from the reduced decode agree with the full image"""
+        data = jpeg_bytes(document_image(2400, 3200))
+        image = Image.open(io.BytesIO(data))
+        drafted = measure(image, data)
+        full = measure(Image.open(io.BytesIO(data)).convert("RGB"))
+        assert (drafted["width"], drafted["height"]) == (2400, 3200)
+        assert drafted["brightness"] == pytest.approx(full["brightness"], abs=0.02)
+        assert drafted["sharpness"] == pytest.approx(full["sharpness"], rel=0.35)
+        image.load()
+        assert (image.size, image.mode) == ((2400, 3200), "RGB")
+
+    def test_jpeg_decision_unchanged(self):
+        """Test that the reduced decode reaches the same verdicts"""
+        sharp = jpeg_bytes(document_image(2400, 3200))
+        blurry = jpeg_bytes(document_image(2400, 3200).filter(ImageFilter.GaussianBlur(8)))
+        assert prescreen(Image.open(io.BytesIO(sharp)), "ocr", data=sharp)["passed"]
+        assert "blurry" in codes(prescreen(Image.open(io.BytesIO(blurry)), "ocr", data=blurry))
+
+    def test_thumbnail_size(self):
+        """Test that the grayscale copy is bounded by the max side"""
+        gray = grayscale_thumbnail(Image.new("RGB", (3000, 1500)))
+        assert gray.shape == (PRESCREEN_MAX_SIDE // 2, PRESCREEN_MAX_SIDE)
+        assert gray.dtype == np.float32
+
+    def test_small_image_not_upscaled(self):
+        """Test that images under the max side keep their size"""
+        assert grayscale_thumbnail(Image.new("L", (40, 30))).shape == (30, 40)
+
+    def test_laplacian_flat_is_zero(self):
+        """Test that a flat image has no Laplacian response"""
+        assert laplacian_variance(np.full((10, 10), 128.0)) == 0.0
+        assert laplacian_variance(np.zeros((2, 2))) == 0.0
+
+    def test_blur_lowers_sharpness(self):
+        """Test that blurring a document lowers its sharpness score"""
+        sharp = document_image()
+        blurry = sharp.filter(ImageFilter.GaussianBlur(4))
+        assert prescreen(blurry, "ocr")["metrics"]["sharpness"] < prescreen(sharp, "ocr")["metrics"]["sharpness"] / 10
+
+
+class TestDecisions:
+    """Test cases for pass and reject decisions"""
+
+    def test_sharp_document_passes(self):
+        """Test that a readable document passes the OCR gate"""
+        result = prescreen(document_image(), "ocr")
+        assert result["passed"], result["reasons"]
+        assert result["reasons"] == []
+
+    def test_blurry_document_rejected(self):
+        """Test that a heavily blurred document is rejected as blurry"""
+        result = prescreen(document_image().filter(ImageFilter.GaussianBlur(4)), "ocr")
+        assert not result["passed"]
+        assert "blurry" in codes(result)
+
+    @pytest.mark.parametrize("color,code", [(5, "too_dark"), (254, "overexposed")])
+    def test_exposure(self, color, code):
+        """Test dark and blown-out images"""
+        result = prescreen(Image.new("L", (800, 800), color), "card")
+        assert code in codes(result)
+
+    def test_glare(self):
+        """Test that a large clipped highlight counts as glare for faces"""
+        rng = np.random.default_rng(0)
+        pixels = rng.normal(110, 40, (600, 600)).clip(0, 255).astype(np.uint8)
+        pixels[:300, :300] = 255
+        result = prescreen(Image.fromarray(pixels), "face")
+        assert "glare" in codes(result)
+        assert result["metrics"]["glare"] == pytest.approx(0.25, abs=0.01)
+
+    def test_too_small(self):
+        """Test the minimum size check on the original dimensions"""
+        result = prescreen(document_image(200, 150), "ocr")
+        reason = next(r for r in result["reasons"] if r["code"] == "too_small")
+        assert reason["value"] == 150
+        assert reason["threshold"] == 300
+
+    def test_reason_shape(self):
+        """Test that every reason is self-describing"""
+        result = prescreen(Image.new("L", (50, 50), 0), "face")
+        for reason in result["reasons"]:
+            assert set(reason) == {"code", "metric", "value", "threshold", "message"}
+
+
+class TestConfiguration:
+    """Test cases for per-endpoint thresholds and the enable switch"""
+
+    def test_endpoint_overrides_defaults(self):
+        """Test that endpoint values replace the defaults"""
+        assert thresholds_for("ocr")["min_side"] == 300
+        assert thresholds_for("face")["min_side"] == 120
+        assert thresholds_for("unknown") == DEFAULT_THRESHOLDS
+
+    def test_environment_override(self, monkeypatch):
+        """Test PRESCREEN_<ENDPOINT>_<KEY> overrides"""
+        monkeypatch.setenv("PRESCREEN_CARD_MIN_SIDE", "1000")
+        assert thresholds_for("card")["min_side"] == 1000.0
+        assert thresholds_for("ocr")["min_side"] == 300
+
+    def test_explicit_thresholds(self):
+        """Test that passed thresholds are used as given"""
+        thresholds = {**DEFAULT_THRESHOLDS, "min_side": 10, "min_sharpness": 0.0,
+                      "min_brightness": 0.0, "max_brightness": 1.0}
+        assert prescreen(Image.new("L", (50, 50), 0), "ocr", thresholds)["passed"]
+
+    def test_enabled_switch(self, monkeypatch):
+        """Test that the request flag wins over the environment"""
+        monkeypatch.delenv("PRESCREEN_ENABLED", raising=False)
+        assert not prescreen_enabled()
+        assert prescreen_enabled(True)
+        monkeypatch.setenv("PRESCREEN_ENABLED", "true")
+        assert prescreen_enabled()
+        assert not prescreen_enabled(False)
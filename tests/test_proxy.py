@@ -0,0 +1,35 @@
+"""
+Unit tests for app/utils/proxy.py
+"""
+import pytest
+from PIL import Image
+from app.utils.proxy import make_proxy, proxy_max_side, DETECTION_PROXY_MAX_SIDE
+
+
+class TestMakeProxy:
+    """Test cases for building the detection proxy"""
+
+    def test_downscales_longest_side(self):
+        """Test that the longest side is capped and the aspect kept"""
+        proxy = make_proxy(Image.new("RGB", (4000, 3000)), 1000)
+        assert proxy.image.size == (1000, 750)
+        assert (proxy.full_width, proxy.full_height) == (4000, 3000)
+        assert proxy.is_downscaled
+
+    def test_small_image_used_as_is(self):
+        """Test that images under the limit are not copied"""
+        image = Image.new("RGB", (800, 600))
+        proxy = make_proxy(image, 1000)
+        assert proxy.image is image
+        assert not proxy.is_downscaled
+
+    def test_disabled(self):
+        """Test that max_side 0 keeps the full image"""
+        image = Image.new("RGB", (4000, 3000))
+        assert make_proxy(image, 0).image is image
+
+    def test_default_from_environment_setting(self):
+        """Test that None falls back to DETECTION_PROXY_MAX_SIDE"""
+        assert proxy_max_side() == DETECTION_PROXY_MAX_SIDE
+        assert proxy_max_side(512) == 512
+
@@ -0,0 +1,124 @@
+"""
+Unit tests for app/ocr/recognition_level.py
+"""
+import pytest
+from app.ocr.recognition_level import LevelSelector, effective_level, RECOVER_RATIO
+
+
+class TestEffectiveLevel:
+    """Test cases for mapping requested levels to Vision levels"""
+
+    def test_levels(self):
+        """Test that only accurate maps to accurate"""
+        assert effective_level("accurate") == "accurate"
+        assert effective_level("fast") == "fast"
+        assert effective_level("anything") == "fast"
+
+
+class TestLevelSelector:
+    """Test cases for choosing the level from load and the SLO"""
+
+    def test_idle_uses_accurate(self):
+        """Test that accurate is used when nothing is queued"""
+        assert LevelSelector(slo_seconds=3.0).choose() == "accurate"
+
+    def test_estimate_includes_queue(self):
+        """Test that in-flight work is spread over the capacity"""
+        selector = LevelSelector(slo_seconds=3.0, capacity=2)
+        selector.latency = {"fast": 0.5, "accurate": 2.0}
+        selector.inflight = {"fast": 2, "accurate": 1}
+        assert selector.estimate("accurate") == pytest.approx((2 * 0.5 + 2.0) / 2 + 2.0)
+        assert selector.estimate("fast") == pytest.approx(1.5 + 0.5)
+
+    def test_degrades_under_load(self):
+        """Test that a deep queue switches to fast"""
+        selector = LevelSelector(slo_seconds=3.0)
+        selector.latency = {"fast": 0.3, "accurate": 1.0}
+        with selector.track("accurate"), selector.track("accurate"), selector.track("accurate"):
+            assert selector.choose() == "fast"
+        assert selector.inflight["accurate"] == 0
+
+    def test_recovers_once_load_drops(self):
+        """Test that accurate comes back when the queue drains"""
+        selector = LevelSelector(slo_seconds=3.0)
+        selector.latency = {"fast": 0.3, "accurate": 1.0}
+        selector.inflight["accurate"] = 3
+        assert selector.choose() == "fast"
+        selector.inflight["accurate"] = 0
+        assert selector.choose() == "accurate"
+
+    def test_hysteresis(self):
+        """Test that an estimate just under the SLO does not switch back yet"""
+        selector = LevelSelector(slo_seconds=3.0)
+        selector.latency = {"fast": 0.5, "accurate": 1.0}
+        selector.inflight["accurate"] = 3
+        assert selector.choose() == "fast"
+
+        # 2.0 queued + 1.0 own = 3.0 meets the SLO, but the wait is over
+        # RECOVER_RATIO of the 2.0 headroom
+        selector.inflight = {"fast": 0, "accurate": 2}
+        assert 2.0 > RECOVER_RATIO * (3.0 - 1.0)
+        assert selector.choose() == "fast"
+
+        selector.inflight = {"fast": 0, "accurate": 1}
+        assert selector.choose() == "accurate"
+
+    def test_recovers_when_accurate_is_near_slo(self):
+        """Test that an idle queue recovers even when accurate alone is close to the SLO"""
+        selector = LevelSelector(slo_seconds=3.0)
+        selector.latency = {"fast": 0.5, "accurate": 2.5}
+        selector.inflight["accurate"] = 1
+        assert selector.choose() == "fast"
+        selector.inflight["accurate"] = 0
+        assert selector.choose() == "accurate"
+
+    def test_recovers_after_latency_spike(self):
+        """Test that probes at accurate bring the level back once a spike has passed"""
+        selector = LevelSelector(slo_seconds=3.0, probe_seconds=10.0)
+        now = [0.0]
+        selector.clock = lambda: now[0]
+        selector.latency = {"fast": 0.5, "accurate": 2.5}
+        for _ in range(5):
+            selector.observe("accurate", 8.0)
+        assert selector.choose() == "fast"
+
+        levels = []
+        for _ in range(200):
+            now[0] += 1.0
+            level = selector.choose()
+            levels.append(level)
+            selector.observe(level, 2.5 if level == "accurate" else 0.5)
+        assert levels[:9] == ["fast"] * 9
+        assert levels[-20:] == ["accurate"] * 20
+
+    def test_probe_rate_limited(self):
+        """Test that only one request per probe interval runs accurate while degraded"""
+        selector = LevelSelector(slo_seconds=1.0, probe_seconds=10.0)
+        now = [0.0]
+        selector.clock = lambda: now[0]
+        selector.latency["accurate"] = 4.0
+        assert selector.choose() == "fast"
+        now[0] = 10.0
+        assert [selector.choose() for _ in range(5)] == ["accurate"] + ["fast"] * 4
+
+    def test_observe_moves_average(self):
+        """Test that measured latency updates the level's estimate"""
+        selector = LevelSelector()
+        before = selector.latency["accurate"]
+        selector.observe("accurate", before + 10.0)
+        assert before < selector.latency["accurate"] < before + 10.0
+
+    def test_slow_accurate_degrades_without_queue(self):
+        """Test that accurate alone slower than the SLO picks fast"""
+        selector = LevelSelector(slo_seconds=1.0)
+        for _ in range(30):
+            selector.observe("accurate", 4.0)
+        assert selector.choose() == "fast"
+
+    def test_track_releases_on_error(self):
+        """Test that a failing request is no longer counted in flight"""
+        selector = LevelSelector()
+        with pytest.raises(RuntimeError):
+            with selector.track("fast"):
+                raise RuntimeError("vision failed")
+        assert selector.inflight["fast"] == 0
@@ -0,0 +1,127 @@
+"""
+Unit tests for app/utils/request_logging.py
+"""
+import io
+import json
+import logging
+import numpy as np
+import pytest
+from app.utils.request_logging import (
+    configure_logging, shutdown_logging, get_logger, bind_request, reset_request,
+    current_request_id, StructuredLogger
+)
+
+
+@pytest.fixture
+def log_stream():
+    stream = io.StringIO()
+    configure_logging("DEBUG", stream=stream)
+    yield stream
+    shutdown_logging()
+    logging.getLogger("app").handlers.clear()
+
+
+def read_entries(stream):
+    shutdown_logging()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+class CountingValue:
+    """Counts how often it is turned into text"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "value"
+
+
+class TestRequestContext:
+    """Test cases for request id binding"""
+
+    def test_default_request_id(self):
+        """Test the id outside of any request"""
+        assert current_request_id() == "-"
+
+    def test_bind_and_reset(self):
+        """Test that a valid caller id is kept and reset afterwards"""
+        tokens = bind_request("abc-123")
+        assert current_request_id() == "abc-123"
+        reset_request(tokens)
+        assert current_request_id() == "-"
+
+    @pytest.mark.parametrize("request_id", [None, "", "bad id", "x" * 65, "a\nb"])
+    def test_invalid_ids_replaced(self, request_id):
+        """Test that missing or unusual ids get a fresh one"""
+        tokens = bind_request(request_id)
+        try:
+            generated = current_request_id()
+            assert len(generated) == 32
+            assert generated != request_id
+        finally:
+            reset_request(tokens)
+
+
+class TestStructuredLogging:
+    """Test cases for structured log output"""
+
+    def test_json_fields(self, log_stream):
+        """Test that events are JSON lines with request id and fields"""
+        tokens = bind_request("req-1")
+        try:
+            get_logger("tests").info("rectangle_scored", score=np.float64(0.5), corners=np.zeros((1, 2)))
+        finally:
+            reset_request(tokens)
+
+        entries = read_entries(log_stream)
+        assert len(entries) == 1
+        entry = entries[0]
+        assert entry["event"] == "rectangle_scored"
+        assert entry["level"] == "info"
+        assert entry["logger"] == "app.tests"
+        assert entry["request_id"] == "req-1"
+        assert entry["score"] == 0.5
+        assert entry["corners"] == [[0.0, 0.0]]
+
+    def test_level_gating_skips_formatting(self):
+        """Test that disabled levels never format their fields"""
+        stream = io.StringIO()
+        configure_logging("INFO", stream=stream)
+        value = CountingValue()
+
+        log = get_logger("tests")
+        log.debug("hidden", value=value)
+        assert not log.is_enabled(logging.DEBUG)
+
+        assert read_entries(stream) == []
+        assert value.calls == 0
+        logging.getLogger("app").handlers.clear()
+
+    def test_debug_sampling(self, log_stream, monkeypatch):
+        """Test that unsampled requests drop DEBUG but keep INFO"""
+        monkeypatch.setenv("LOG_DEBUG_SAMPLE_RATE", "0")
+        log = get_logger("tests")
+
+        tokens = bind_request("req-2")
+        try:
+            log.debug("dropped")
+            log.info("kept")
+        finally:
+            reset_request(tokens)
+
+        assert [e["event"] for e in read_entries(log_stream)] == ["kept"]
+
+    def test_formatting_happens_on_listener(self, log_stream):
+        """Test that fields are formatted by the listener, not the caller"""
+        value = CountingValue()
+        get_logger("tests").warning("queued", value=value)
+
+        entries = read_entries(log_stream)
+        assert entries[0]["value"] == "value"
+        assert value.calls == 1
+
+    def test_get_logger_namespace(self):
+        """Test that loggers live under the app namespace"""
+        assert isinstance(get_logger("app.wrap.geometry"), StructuredLogger)
+        assert get_logger("x")._logger.name == "app.x"
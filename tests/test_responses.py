@@ -0,0 +1,92 @@
+"""
+Unit tests for app/utils/responses.py
+"""
+import json
+import pytest
+from app.utils.responses import (
+    result_headers, image_response, multipart_response, build_result_response, MAX_HEADER_VALUE
+)
+
+
+PAYLOAD = {
+    "format": "png",
+    "width": 640,
+    "fast_rate": 0.3,
+    "has_card": True,
+    "position": None,
+    "dimensions": {"width": 640, "height": 480, "unit": "pixel"},
+    "recognized_text": "ชื่อ\nName",
+    "text_lines": {"line_1": {"text": "nested"}},
+    "output_path": "",
+}
+
+
+class TestResultHeaders:
+    """Test cases for metadata headers"""
+
+    def test_scalar_fields(self):
+        """Test that scalar fields map to X-Result-* headers"""
+        headers = result_headers(PAYLOAD)
+
+        assert headers["X-Result-Format"] == "png"
+        assert headers["X-Result-Width"] == "640"
+        assert headers["X-Result-Fast-Rate"] == "0.3"
+        assert headers["X-Result-Has-Card"] == "true"
+        assert "X-Result-Position" not in headers
+
+    def test_nested_dict_flattened_one_level(self):
+        """Test that one level of nested dicts is flattened"""
+        headers = result_headers(PAYLOAD)
+
+        assert headers["X-Result-Dimensions-Width"] == "640"
+        assert headers["X-Result-Dimensions-Unit"] == "pixel"
+        assert not any(name.startswith("X-Result-Text-Lines") for name in headers)
+
+    def test_non_ascii_percent_encoded(self):
+        """Test that Thai text and newlines are percent-encoded"""
+        value = result_headers(PAYLOAD)["X-Result-Recognized-Text"]
+        value.encode("latin-1")
+        assert "\n" not in value
+        assert value.endswith("%0AName")
+
+    def test_long_values_omitted(self):
+        """Test that oversized values are left out of headers"""
+        headers = result_headers({"recognized_text": "x" * (MAX_HEADER_VALUE + 1)})
+        assert headers == {}
+
+
+class TestResultResponses:
+    """Test cases for inline image and multipart responses"""
+
+    def test_image_response(self):
+        """Test that the image is the body and metadata is in headers"""
+        response = image_response(b"\x89PNG", "image/png", PAYLOAD, "out.png")
+
+        assert response.body == b"\x89PNG"
+        assert response.media_type == "image/png"
+        assert response.headers["x-result-width"] == "640"
+        assert response.headers["content-disposition"] == 'inline; filename="out.png"'
+
+    def test_multipart_response(self):
+        """Test that multipart bodies carry JSON then the image"""
+        response = multipart_response(b"IMAGEDATA", "image/jpeg", PAYLOAD, "out.jpg")
+
+        content_type = response.headers["content-type"]
+        assert content_type.startswith("multipart/mixed; boundary=")
+        boundary = content_type.split("boundary=")[1].encode()
+
+        parts = response.body.split(b"--" + boundary)
+        assert parts[-1].strip() == b"--"
+
+        json_headers, json_body = parts[1].split(b"\r\n\r\n", 1)
+        assert b"application/json" in json_headers
+        assert json.loads(json_body.rstrip(b"\r\n").decode("utf-8")) == PAYLOAD
+
+        image_headers, image_body = parts[2].split(b"\r\n\r\n", 1)
+        assert b"Content-Type: image/jpeg" in image_headers
+        assert image_body == b"IMAGEDATA\r\n"
+
+    def test_build_result_response_dispatch(self):
+        """Test mode dispatch"""
+        assert build_result_response("image", b"x", "image/png", {}, "a.png").media_type == "image/png"
+        assert build_result_response("multipart", b"x", "image/png", {}, "a.png").media_type.startswith("multipart/mixed")
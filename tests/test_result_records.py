@@ -0,0 +1,136 @@
+"""
+Unit tests for app/utils/result_records.py
+"""
+import json
+import os
+import time
+import pytest
+from app.utils.result_records import (
+    ResultRecorder, encode_record, decode_record, sweep_expired, record_filename,
+    bind_record, reset_record, claim_record_id, used_record_id, RECORD_ID_RE
+)
+
+
+def touch(path, age=0.0):
+    with open(path, "wb") as f:
+        f.write(b"x")
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    recorder = ResultRecorder(str(tmp_path), retention=0)
+    yield recorder
+    recorder.close()
+
+
+class TestRecordEncoding:
+    """Test cases for the compressed record format"""
+
+    def test_round_trip(self):
+        """Test that a record decodes to the same data"""
+        record = {"id": "abc", "result": {"recognized_text": "บัตรประจำตัว", "confidence": 0.9}}
+        assert decode_record(encode_record(record)) == record
+
+    def test_smaller_than_json(self):
+        """Test that repetitive results compress well below their JSON size"""
+        record = {"result": {"text_lines": {f"line_{i}": {"text": "ประจำตัว", "confidence": 0.9} for i in range(200)}}}
+        assert len(encode_record(record)) < len(json.dumps(record).encode()) / 5
+
+    def test_deterministic(self):
+        """Test that the same record always encodes to the same bytes"""
+        assert encode_record({"a": 1}) == encode_record({"a": 1})
+
+
+class TestResultRecorder:
+    """Test cases for writing records off the request path"""
+
+    def test_pending_until_written(self, recorder):
+        """Test that a submitted record is readable before and after the write"""
+        recorder.submit("req-1", {"id": "req-1", "endpoint": "ocr"})
+        assert recorder.get("req-1") == {"id": "req-1", "endpoint": "ocr"}
+        recorder.flush()
+        assert recorder.get("req-1") is None
+        assert decode_record(recorder.read("req-1")) == {"id": "req-1", "endpoint": "ocr"}
+
+    def test_batch_written(self, recorder):
+        """Test that many records submitted together all land on disk"""
+        for i in range(100):
+            recorder.submit(f"req-{i}", {"id": i})
+        recorder.flush()
+        assert sorted(os.listdir(recorder.records_folder)) == sorted(record_filename(f"req-{i}") for i in range(100))
+
+    def test_missing(self, recorder):
+        """Test that unknown ids read as None"""
+        assert recorder.get("nope") is None
+        assert recorder.read("nope") is None
+
+    def test_close_flushes(self, tmp_path):
+        """Test that closing writes everything still queued"""
+        recorder = ResultRecorder(str(tmp_path), retention=0)
+        recorder.submit("req-1", {"id": 1})
+        recorder.close()
+        assert recorder.read("req-1") is not None
+
+    def test_sweeps_on_start(self, tmp_path):
+        """Test that the writer thread applies the retention rule"""
+        old_image = tmp_path / "ocr_20240101_120000_abcdef12.png"
+        touch(str(old_image), age=3600)
+        recorder = ResultRecorder(str(tmp_path), retention=60, sweep_interval=3600)
+        recorder.start()
+        recorder.close()
+        assert not old_image.exists()
+
+
+class TestSweepExpired:
+    """Test cases for the retention sweep"""
+
+    def test_removes_old_outputs_and_records(self, tmp_path):
+        """Test that old images, overlays and records go and new ones stay"""
+        records = tmp_path / "results"
+        records.mkdir()
+        old = [tmp_path / "ocr_20240101_120000_abcdef12.png",
+               tmp_path / "ocr_20240101_120000_abcdef12.overlay.json",
+               records / record_filename("old")]
+        new = [tmp_path / "card_20240101_120000_abcdef12.jpg", records / record_filename("new")]
+        for path in old:
+            touch(str(path), age=7200)
+        for path in new:
+            touch(str(path))
+
+        assert sweep_expired(str(tmp_path), str(records), 3600) == 3
+        assert not any(path.exists() for path in old)
+        assert all(path.exists() for path in new)
+
+    def test_leaves_other_files(self, tmp_path):
+        """Test that files the service did not generate are kept"""
+        keep = tmp_path / "notes.txt"
+        touch(str(keep), age=7200)
+        assert sweep_expired(str(tmp_path), str(tmp_path / "results"), 3600) == 0
+        assert keep.exists()
+
+
+class TestRecordIds:
+    """Test cases for server-issued record ids"""
+
+    def test_unused_until_claimed(self):
+        """Test that a request has no record id to report until one is claimed"""
+        token = bind_record()
+        try:
+            assert used_record_id() is None
+            record_id = claim_record_id()
+            assert RECORD_ID_RE.match(record_id)
+            assert used_record_id() == record_id
+            assert claim_record_id() == record_id
+        finally:
+            reset_record(token)
+
+    def test_fresh_per_request(self):
+        """Test that every request gets a different id"""
+        ids = []
+        for _ in range(2):
+            token = bind_record()
+            ids.append(claim_record_id())
+            reset_record(token)
+        assert ids[0] != ids[1]
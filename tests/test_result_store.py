@@ -0,0 +1,134 @@
+"""
+Unit tests for app/ocr/result_store.py
+"""
+import pytest
+from app.ocr import result_store as result_store_module
+from app.ocr.result_store import ResultStore, get_result_store
+
+
+def ocr_result(text, lines=None, document_type="card_id"):
+    lines = lines or [text]
+    return {
+        "document_type": document_type,
+        "recognized_text": text,
+        "confidence": 0.93,
+        "dimensions": {"width": 1000, "height": 630, "unit": "pixel"},
+        "text_lines": {
+            f"line_{i + 1}": {"id": f"line_{i + 1}", "text": line, "confidence": 0.9,
+                              "position": {"x": 0.0, "y": float(i * 40), "width": 300.0, "height": 30.0}}
+            for i, line in enumerate(lines)
+        },
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(str(tmp_path / "ocr.db"))
+    yield store
+    store.close()
+
+
+class TestResultStore:
+    """Test cases for storing and searching OCR results"""
+
+    def test_save_and_get_by_hash(self, store):
+        """Test that a saved result comes back with its lines"""
+        store.save("abc123", ocr_result("Thai National ID Card", ["Thai National", "ID Card"]),
+                   request_id="req-1", languages=["th-TH", "en-US"], recognition_level="accurate")
+        document = store.get("abc123")
+        assert document["recognized_text"] == "Thai National ID Card"
+        assert document["languages"] == ["th-TH", "en-US"]
+        assert document["recognition_level"] == "accurate"
+        assert (document["width"], document["height"]) == (1000, 630)
+        assert [line["text"] for line in document["text_lines"]] == ["Thai National", "ID Card"]
+
+    def test_request_id_is_not_a_key(self, store):
+        """Test that the client-chosen request id cannot be used to fetch a document"""
+        store.save("abc123", ocr_result("hello"), request_id="req-1")
+        assert store.get("req-1") is None
+        assert store.get("abc123")["request_id"] == "req-1"
+
+    def test_missing(self, store):
+        """Test that unknown keys return None"""
+        assert store.get("nope") is None
+
+    def test_search_thai_substring(self, store):
+        """Test that Thai text is found by a substring without word breaks"""
+        store.save("doc-th", ocr_result("บัตรประจำตัวประชาชน Thai National ID Card"))
+        store.save("doc-en", ocr_result("Driving licence"))
+        results = store.search("ประจำตัว")
+        assert [hit["key"] for hit in results] == ["doc-th"]
+        assert results[0]["snippet"]
+
+    def test_search_line_text(self, store):
+        """Test that text appearing only in text_lines is indexed"""
+        result = ocr_result("", ["เลขประจำตัว 1234567890123"])
+        store.save("doc", result)
+        assert [hit["key"] for hit in store.search("4567890")] == ["doc"]
+
+    def test_resave_replaces(self, store):
+        """Test that recognizing the same upload again replaces the old text"""
+        store.save("doc", ocr_result("old passport text"))
+        store.save("doc", ocr_result("new licence text"))
+        assert store.search("passport") == []
+        assert [hit["key"] for hit in store.search("licence")] == ["doc"]
+
+    def test_query_operators_are_literal(self, store):
+        """Test that FTS syntax in a query does not raise"""
+        store.save("doc", ocr_result('Name: "Somchai" AND more'))
+        assert [hit["key"] for hit in store.search('"Somchai" AND')] == ["doc"]
+        assert store.search("NEAR(") == []
+
+    def test_short_query(self, store):
+        """Test that queries shorter than a trigram still find substrings"""
+        store.save("doc-th", ocr_result("ขอบคุณจากใจ", ["ขอบคุณจากใจ"]))
+        store.save("doc-en", ocr_result("", ["ID 42"]))
+        results = store.search("ใจ")
+        assert [hit["key"] for hit in results] == ["doc-th"]
+        assert "[ใจ]" in results[0]["snippet"]
+        assert [hit["key"] for hit in store.search("42")] == ["doc-en"]
+        assert [hit["key"] for hit in store.search("id")] == ["doc-en"]
+
+    def test_short_query_wildcards_are_literal(self, store):
+        """Test that LIKE wildcards in a short query match only themselves"""
+        store.save("doc", ocr_result("50% off"))
+        store.save("other", ocr_result("nothing here"))
+        assert [hit["key"] for hit in store.search("%")] == ["doc"]
+        assert store.search("_") == []
+
+    def test_limit(self, store):
+        """Test that the number of hits is capped"""
+        for i in range(5):
+            store.save(f"doc-{i}", ocr_result(f"invoice number {i}"))
+        assert len(store.search("invoice", limit=2)) == 2
+
+    def test_persists(self, tmp_path):
+        """Test that results survive reopening the file"""
+        path = str(tmp_path / "ocr.db")
+        first = ResultStore(path)
+        first.save("doc", ocr_result("persisted text"))
+        first.close()
+        second = ResultStore(path)
+        try:
+            assert second.get("doc")["recognized_text"] == "persisted text"
+        finally:
+            second.close()
+
+
+class TestGetResultStore:
+    """Test cases for the configured store"""
+
+    def test_disabled_by_default(self, monkeypatch):
+        """Test that no store is opened without OCR_RESULT_STORE"""
+        monkeypatch.setattr(result_store_module, "OCR_RESULT_STORE", "")
+        assert get_result_store() is None
+
+    def test_opened_once(self, monkeypatch, tmp_path):
+        """Test that the configured store is shared"""
+        monkeypatch.setattr(result_store_module, "OCR_RESULT_STORE", str(tmp_path / "ocr.db"))
+        monkeypatch.setattr(result_store_module, "_store", None)
+        store = get_result_store()
+        try:
+            assert store is get_result_store()
+        finally:
+            store.close()
@@ -0,0 +1,192 @@
+"""
+Unit tests for app/utils/scheduler.py
+"""
+import asyncio
+import time
+import pytest
+from app.utils.deadline import Deadline, DeadlineExceeded, bind_deadline, reset_deadline
+from app.utils.scheduler import CostModel, CostScheduler, megapixels, MIN_MEGAPIXELS, DEFAULT_RATE
+
+
+class TestCostModel:
+    """Test cases for estimating engine cost"""
+
+    def test_scales_with_megapixels(self):
+        """Test that cost grows with image size"""
+        model = CostModel({("ocr", "accurate"): 0.5})
+        assert model.estimate(("ocr", "accurate"), 12.0) == pytest.approx(6.0)
+        assert megapixels(4000, 3000) == 12.0
+
+    def test_small_images_have_floor(self):
+        """Test that tiny images are charged the minimum size"""
+        model = CostModel({("face", None): 0.1})
+        assert model.estimate(("face", None), 0.01) == pytest.approx(0.1 * MIN_MEGAPIXELS)
+
+    def test_unknown_key_uses_default(self):
+        """Test that an unseen endpoint falls back to the default rate"""
+        assert CostModel({}).estimate(("new", None), 1.0) == pytest.approx(DEFAULT_RATE)
+
+    def test_learns_from_timings(self):
+        """Test that observed run times move the estimate"""
+        model = CostModel({("ocr", "fast"): 0.1})
+        for _ in range(50):
+            model.observe(("ocr", "fast"), 2.0, 1.0)
+        assert model.estimate(("ocr", "fast"), 2.0) == pytest.approx(1.0, rel=0.01)
+
+
+def run_jobs(scheduler, jobs, hold=0.01):
+    """Runs (name, key, mp) jobs while a first job holds the only slot; returns start order."""
+    order = []
+
+    async def job(name, key, mp):
+        async with scheduler.slot(key, mp):
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    async def main():
+        blocker = asyncio.ensure_future(job("blocker", ("face", None), 0.1))
+        await asyncio.sleep(0)
+        tasks = []
+        for name, key, mp in jobs:
+            tasks.append(asyncio.ensure_future(job(name, key, mp)))
+            await asyncio.sleep(0)
+        await asyncio.gather(blocker, *tasks)
+
+    asyncio.run(main())
+    return order
+
+
+class TestCostScheduler:
+    """Test cases for shortest-expected-job-first scheduling"""
+
+    def test_small_jobs_first(self):
+        """Test that cheap jobs queued behind an expensive one start first"""
+        scheduler = CostScheduler(1, aging=0.0)
+        order = run_jobs(scheduler, [
+            ("big", ("ocr", "accurate"), 16.0),
+            ("small", ("face", None), 0.1),
+            ("medium", ("ocr", "fast"), 2.0),
+        ])
+        assert order == ["blocker", "small", "medium", "big"]
+
+    def test_aging_prevents_starvation(self):
+        """Test that a job that has waited long enough goes before newer cheap jobs"""
+        scheduler = CostScheduler(1, aging=1.0, model=CostModel({("big", None): 1.0, ("small", None): 0.1}))
+        clock = iter([0.0, 10.0, 10.0])
+        scheduler.clock = lambda: next(clock)
+        order = run_jobs(scheduler, [
+            ("big", ("big", None), 5.0),       # priority 5 + 0
+            ("small", ("small", None), 1.0),   # priority 0.1 + 10
+            ("small2", ("small", None), 1.0),  # priority 0.1 + 10
+        ])
+        assert order == ["blocker", "big", "small", "small2"]
+
+    def test_concurrency_limit(self):
+        """Test that no more than the configured number of jobs run at once"""
+        scheduler = CostScheduler(2, aging=0.0)
+        peak = []
+
+        async def job():
+            async with scheduler.slot(("face", None), 0.1):
+                peak.append(scheduler.running)
+                await asyncio.sleep(0.005)
+
+        async def main():
+            await asyncio.gather(*[job() for _ in range(6)])
+
+        asyncio.run(main())
+        assert max(peak) == 2
+        assert scheduler.running == 0
+        assert scheduler.queued == 0
+
+    def test_disabled_passes_through(self):
+        """Test that concurrency 0 runs everything immediately"""
+        scheduler = CostScheduler(0)
+        order = run_jobs(scheduler, [("a", ("ocr", "accurate"), 16.0), ("b", ("face", None), 0.1)], hold=0)
+        assert sorted(order) == ["a", "b", "blocker"]
+        assert scheduler.running == 0
+
+    def test_learns_run_time(self):
+        """Test that a finished job updates the cost model"""
+        model = CostModel({("face", None): 10.0})
+        scheduler = CostScheduler(1, model=model)
+
+        async def main():
+            async with scheduler.slot(("face", None), 1.0):
+                pass
+
+        asyncio.run(main())
+        assert model.rates[("face", None)] < 10.0
+
+    def test_failed_job_releases_slot(self):
+        """Test that an exception inside the slot frees it for the next job"""
+        scheduler = CostScheduler(1)
+
+        async def main():
+            with pytest.raises(RuntimeError):
+                async with scheduler.slot(("face", None), 0.1):
+                    raise RuntimeError("vision failed")
+            async with scheduler.slot(("face", None), 0.1):
+                return scheduler.running
+
+        assert asyncio.run(main()) == 1
+        assert scheduler.running == 0
+
+    def test_deadline_expires_in_queue(self):
+        """Test that a queued job is dropped when its deadline passes"""
+        scheduler = CostScheduler(1)
+
+        async def holder():
+            async with scheduler.slot(("face", None), 0.1):
+                await asyncio.sleep(0.05)
+
+        async def late():
+            token = bind_deadline(Deadline(time.time() + 0.01))
+            try:
+                async with scheduler.slot(("face", None), 0.1):
+                    pytest.fail("should not run")
+            finally:
+                reset_deadline(token)
+
+        async def main():
+            first = asyncio.ensure_future(holder())
+            await asyncio.sleep(0)
+            with pytest.raises(DeadlineExceeded) as exc_info:
+                await late()
+            await first
+            return exc_info.value
+
+        error = asyncio.run(main())
+        assert error.stage == "queue"
+        assert scheduler.running == 0
+
+    def test_disconnect_drops_queued_job(self):
+        """Test that a cancelled deadline removes the job from the queue"""
+        scheduler = CostScheduler(1)
+        deadline = Deadline.after(None)
+
+        async def holder():
+            async with scheduler.slot(("face", None), 0.1):
+                await asyncio.sleep(0.02)
+
+        async def waiting():
+            token = bind_deadline(deadline)
+            try:
+                async with scheduler.slot(("face", None), 0.1):
+                    pytest.fail("should not run")
+            finally:
+                reset_deadline(token)
+
+        async def main():
+            first = asyncio.ensure_future(holder())
+            await asyncio.sleep(0)
+            second = asyncio.ensure_future(waiting())
+            await asyncio.sleep(0)
+            deadline.cancel()
+            with pytest.raises(DeadlineExceeded) as exc_info:
+                await second
+            await first
+            return exc_info.value
+
+        assert asyncio.run(main()).reason == "client_disconnected"
+        assert scheduler.running == 0
@@ -0,0 +1,228 @@
+"""
+Unit tests for app/utils/single_flight.py
+"""
+import asyncio
+import pytest
+from app.utils.deadline import Deadline, DeadlineExceeded, bind_deadline, current_deadline, reset_deadline
+from app.utils.metrics import metrics
+from app.utils.single_flight import SingleFlight, request_key
+
+
+def counter_value(name, **labels):
+    for counter in metrics.snapshot()["counters"]:
+        if counter["name"] == name and counter["labels"] == {k: str(v) for k, v in labels.items()}:
+            return counter["value"]
+    return 0.0
+
+
+class TestRequestKey:
+    """Test cases for building coalescing keys"""
+
+    def test_same_upload_and_params(self):
+        """Test that identical uploads and parameters give the same key"""
+        assert request_key("ocr", b"abc", languages=["th-TH"], level="fast") == \
+            request_key("ocr", b"abc", level="fast", languages=["th-TH"])
+
+    def test_content_and_params_matter(self):
+        """Test that different bytes, parameters or endpoints give different keys"""
+        key = request_key("ocr", b"abc", level="fast")
+        assert key != request_key("ocr", b"abd", level="fast")
+        assert key != request_key("ocr", b"abc", level="accurate")
+        assert key != request_key("card", b"abc", level="fast")
+
+
+class TestSingleFlight:
+    """Test cases for sharing in-flight computations"""
+
+    def test_concurrent_duplicates_run_once(self):
+        """Test that concurrent callers with one key share a single run"""
+        flight = SingleFlight()
+        calls = []
+        before = counter_value("coalesced_requests", endpoint="test")
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"text": "hello"}
+
+        async def main():
+            return await asyncio.gather(*[flight.run("k", compute, endpoint="test") for _ in range(5)])
+
+        results = asyncio.run(main())
+        assert len(calls) == 1
+        assert all(result == {"text": "hello"} for result in results)
+        assert counter_value("coalesced_requests", endpoint="test") - before == 4
+        assert len(flight) == 0
+
+    def test_callers_get_independent_copies(self):
+        """Test that one caller deleting a key does not affect another"""
+        flight = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            return {"image": object(), "count": 1}
+
+        async def caller():
+            result = await flight.run("k", compute)
+            del result["image"]
+            return result
+
+        async def main():
+            return await asyncio.gather(flight.run("k", compute), caller())
+
+        first, second = asyncio.run(main())
+        assert "image" in first
+        assert "image" not in second
+
+    def test_different_keys_run_separately(self):
+        """Test that distinct keys are not coalesced"""
+        flight = SingleFlight()
+        calls = []
+
+        async def compute(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            return value
+
+        async def main():
+            return await asyncio.gather(flight.run("a", lambda: compute(1)), flight.run("b", lambda: compute(2)))
+
+        assert asyncio.run(main()) == [1, 2]
+        assert sorted(calls) == [1, 2]
+
+    def test_finished_key_runs_again(self):
+        """Test that a later request does not reuse a finished result"""
+        flight = SingleFlight()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return len(calls)
+
+        async def main():
+            first = await flight.run("k", compute)
+            await asyncio.sleep(0)
+            return first, await flight.run("k", compute)
+
+        assert asyncio.run(main()) == (1, 2)
+
+    def test_errors_shared(self):
+        """Test that every waiting caller sees the exception"""
+        flight = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            raise ValueError("bad image")
+
+        async def main():
+            return await asyncio.gather(flight.run("k", compute), flight.run("k", compute), return_exceptions=True)
+
+        results = asyncio.run(main())
+        assert all(isinstance(result, ValueError) for result in results)
+
+    def test_first_caller_cancelled(self):
+        """Test that cancelling the first caller does not cancel the shared run"""
+        flight = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        async def main():
+            first = asyncio.ensure_future(flight.run("k", compute))
+            await asyncio.sleep(0)
+            second = asyncio.ensure_future(flight.run("k", compute))
+            await asyncio.sleep(0)
+            first.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await first
+            return await second
+
+        assert asyncio.run(main()) == "done"
+
+    def test_leader_disconnect_keeps_follower(self):
+        """Test that the first caller's client going away does not fail the others"""
+        flight = SingleFlight()
+        leader_deadline = Deadline()
+        seen = []
+
+        async def compute():
+            await asyncio.sleep(0.02)
+            seen.append(current_deadline())
+            return "done"
+
+        async def caller(deadline):
+            token = bind_deadline(deadline)
+            try:
+                return await flight.run("k", compute)
+            finally:
+                reset_deadline(token)
+
+        async def main():
+            leader = asyncio.ensure_future(caller(leader_deadline))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(caller(Deadline()))
+            await asyncio.sleep(0)
+            leader_deadline.cancel()
+            with pytest.raises(DeadlineExceeded) as exc_info:
+                await leader
+            return exc_info.value, await follower
+
+        error, result = asyncio.run(main())
+        assert error.reason == "client_disconnected"
+        assert result == "done"
+        assert seen[0] is not leader_deadline and not seen[0].expired
+
+    def test_leader_timeout_keeps_follower(self):
+        """Test that a caller with a short deadline times out alone"""
+        flight = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        async def caller(seconds):
+            token = bind_deadline(Deadline.after(seconds))
+            try:
+                return await flight.run("k", compute)
+            finally:
+                reset_deadline(token)
+
+        async def main():
+            return await asyncio.gather(caller(0.01), caller(None), return_exceptions=True)
+
+        short, long = asyncio.run(main())
+        assert isinstance(short, DeadlineExceeded) and short.reason == "timeout"
+        assert long == "done"
+
+    def test_last_caller_gone_cancels_run(self):
+        """Test that the shared deadline is cancelled once nobody waits"""
+        flight = SingleFlight()
+        deadlines = [Deadline(), Deadline()]
+        seen = []
+
+        async def compute():
+            seen.append(current_deadline())
+            await asyncio.sleep(0.05)
+            current_deadline().check("recognition")
+            return "done"
+
+        async def caller(deadline):
+            token = bind_deadline(deadline)
+            try:
+                return await flight.run("k", compute)
+            finally:
+                reset_deadline(token)
+
+        async def main():
+            tasks = [asyncio.ensure_future(caller(deadline)) for deadline in deadlines]
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            for deadline in deadlines:
+                deadline.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            assert seen[0].expired
+            await asyncio.sleep(0.06)
+            return len(flight)
+
+        assert asyncio.run(main()) == 0
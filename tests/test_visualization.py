@@ -0,0 +1,123 @@
+"""
+Unit tests for app/utils/visualization.py
+"""
+import numpy as np
+import pytest
+from PIL import Image
+from app.ocr.observations import TextObservations
+from app.utils.visualization import (
+    build_overlay, ocr_overlay, face_overlay, card_overlay, render_overlay, maybe_render,
+    overlay_to_svg, format_overlay
+)
+
+
+class TestBuildOverlay:
+    """Test cases for overlay geometry"""
+
+    def test_overlay_is_columnar(self):
+        """Test that boxes, labels and confidences are parallel lists"""
+        overlay = build_overlay("ocr", 100, 50, [[1.234, 2, 3, 4]], ["Hi"], [0.912345])
+
+        assert overlay == {
+            "kind": "ocr",
+            "width": 100,
+            "height": 50,
+            "boxes": [[1.23, 2.0, 3.0, 4.0]],
+            "labels": ["Hi"],
+            "confidences": [0.9123],
+        }
+
+    def test_ocr_overlay_from_observations(self):
+        """Test OCR overlay built from a columnar container"""
+        observations = TextObservations(np.array([[10, 20, 30, 40]]), np.array([0.5]), ["Hello"])
+        overlay = ocr_overlay(observations, 200, 100)
+
+        assert overlay["boxes"] == [[10.0, 20.0, 30.0, 40.0]]
+        assert overlay["labels"] == ["Hello"]
+
+    def test_face_overlay_flips_to_top_left(self):
+        """Test that normalized bottom-left face boxes become pixel boxes"""
+        faces = [{"bbox": {"x": 0.1, "y": 0.2, "width": 0.3, "height": 0.4}, "quality_score": 0.87}]
+        overlay = face_overlay(faces, 100, 100)
+
+        assert overlay["boxes"] == [[10.0, 40.0, 30.0, 40.0]]
+        assert overlay["labels"] == ["Q: 0.87"]
+
+    def test_card_overlay(self):
+        """Test card overlay uses pixel positions directly"""
+        cards = [{"position": {"x": 5, "y": 6, "width": 70, "height": 40}, "confidence": 0.7}]
+        overlay = card_overlay(cards, 100, 100)
+
+        assert overlay["boxes"] == [[5.0, 6.0, 70.0, 40.0]]
+        assert overlay["labels"] == ["Confidence: 0.70"]
+
+
+class TestRenderOverlay:
+    """Test cases for rendering overlays onto images"""
+
+    def test_render_does_not_modify_source(self):
+        """Test that rendering works on a copy"""
+        image = Image.new("RGB", (100, 100), color="white")
+        overlay = build_overlay("card", 100, 100, [[10, 10, 50, 50]], ["Confidence: 0.90"], [0.9])
+
+        result = render_overlay(image, overlay)
+
+        assert image.getpixel((10, 30)) == (255, 255, 255)
+        assert result.getpixel((10, 30)) == (0, 255, 0)
+
+    def test_render_ocr_uses_red(self):
+        """Test OCR boxes are drawn in red"""
+        image = Image.new("RGB", (100, 100), color="white")
+        overlay = build_overlay("ocr", 100, 100, [[20, 20, 40, 40]], ["a very long label"], [0.9])
+
+        result = render_overlay(image, overlay)
+
+        assert result.getpixel((20, 40)) == (255, 0, 0)
+
+    def test_render_empty_overlay(self):
+        """Test rendering with no shapes"""
+        image = Image.new("RGB", (10, 10), color="white")
+        result = render_overlay(image, build_overlay("face", 10, 10, [], [], []))
+        assert result.getpixel((5, 5)) == (255, 255, 255)
+
+    def test_maybe_render(self):
+        """Test that nothing is drawn unless asked for and still in time"""
+        import time
+        from app.utils.deadline import Deadline, bind_deadline, reset_deadline
+
+        image = Image.new("RGB", (10, 10), color="white")
+        overlay = build_overlay("face", 10, 10, [], [], [])
+        assert maybe_render(image, overlay, False) is None
+        assert maybe_render(image, overlay, True) is not None
+
+        token = bind_deadline(Deadline(time.time() - 1))
+        try:
+            assert maybe_render(image, overlay, True) is None
+        finally:
+            reset_deadline(token)
+
+
+class TestVectorOverlay:
+    """Test cases for JSON/SVG overlay output"""
+
+    def test_svg_contains_boxes_and_labels(self):
+        """Test that each box becomes a rect and labels are escaped"""
+        overlay = build_overlay("ocr", 200, 100, [[10, 20, 30, 40], [50, 60, 5, 5]], ["A&B", "<x>"], [0.9, 0.8])
+        svg = overlay_to_svg(overlay)
+
+        assert svg.startswith('<svg xmlns="http://www.w3.org/2000/svg" width="200" height="100"')
+        assert svg.count("<rect ") == 2
+        assert '<rect x="10.0" y="20.0" width="30.0" height="40.0"/>' in svg
+        assert "A&amp;B" in svg
+        assert "&lt;x&gt;" in svg
+
+    def test_svg_uses_kind_color(self):
+        """Test that face overlays use the same green as the raster output"""
+        svg = overlay_to_svg(build_overlay("face", 10, 10, [[1, 1, 2, 2]], ["Q: 0.50"], [0.5]))
+        assert 'stroke="rgb(0,255,0)"' in svg
+
+    def test_format_overlay(self):
+        """Test that JSON returns the overlay dict and SVG returns markup"""
+        overlay = build_overlay("card", 10, 10, [], [], [])
+        assert format_overlay(overlay, "json") is overlay
+        assert format_overlay(overlay, "svg").endswith("</svg>")
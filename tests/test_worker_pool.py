@@ -0,0 +1,234 @@
+"""
+Unit tests for app/utils/worker_pool.py
+"""
+import asyncio
+import time
+import numpy as np
+import pytest
+from multiprocessing import shared_memory
+from PIL import Image, ImageOps
+from app.utils.deadline import Deadline, DeadlineExceeded, bind_deadline, reset_deadline
+from app.utils.prescreen import measure
+from app.utils.proxy import make_proxy
+from app.utils import worker_pool
+from app.utils.worker_pool import (
+    WorkerPool, share_image, attach_image, release_image, restore_mode, current_rss
+)
+
+
+def gradient_image(mode="RGB", size=(64, 48)):
+    data = np.arange(size[0] * size[1] * 3, dtype=np.uint32).reshape(size[1], size[0], 3) % 251
+    return Image.fromarray(data.astype(np.uint8), "RGB").convert(mode)
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = WorkerPool(processes=2, max_tasks=50, max_rss_mb=4096)
+    yield pool
+    pool.shutdown()
+
+
+class TestSharedImage:
+    """Test cases for handing images over through shared memory"""
+
+    @pytest.mark.parametrize("mode", ["RGB", "RGBA", "L"])
+    def test_round_trip(self, mode):
+        """Test that an attached image has the same pixels as the original"""
+        image = gradient_image(mode)
+        handle, shm = share_image(image)
+        try:
+            attached, view = attach_image(handle)
+            assert attached.size == image.size
+            assert np.array_equal(np.asarray(attached.convert(mode)), np.asarray(image))
+            attached = None
+            view.close()
+        finally:
+            release_image(shm)
+
+    @pytest.mark.parametrize("mode", ["RGB", "L"])
+    def test_without_private_encoder(self, monkeypatch, mode):
+        """Test that sharing falls back to tobytes() when Pillow lacks its raw encoder hook"""
+        monkeypatch.setattr(worker_pool, "_getencoder", None)
+        image = gradient_image(mode)
+        handle, shm = share_image(image)
+        try:
+            attached, view = attach_image(handle)
+            assert np.array_equal(np.asarray(attached.convert(mode)), np.asarray(image))
+            attached = None
+            view.close()
+        finally:
+            release_image(shm)
+
+    def test_rgb_shared_as_rgba(self):
+        """Test that RGB is mapped as opaque RGBA and remembers its source mode"""
+        image = gradient_image("RGB")
+        handle, shm = share_image(image)
+        try:
+            assert handle["mode"] == "RGBA"
+            assert handle["source_mode"] == "RGB"
+            pixels = np.ndarray((image.height, image.width, 4), np.uint8, buffer=shm.buf)
+            assert np.array_equal(pixels[..., :3], np.asarray(image))
+            assert (pixels[..., 3] == 255).all()
+            pixels = None
+        finally:
+            release_image(shm)
+
+    def test_other_modes_converted(self):
+        """Test that modes Pillow cannot map are shared as RGBA"""
+        image = gradient_image("P")
+        handle, shm = share_image(image)
+        try:
+            attached, view = attach_image(handle)
+            assert handle["mode"] == "RGBA"
+            assert handle["source_mode"] == "P"
+            assert np.array_equal(np.asarray(attached.convert("RGB")), np.asarray(image.convert("RGB")))
+            attached = None
+            view.close()
+        finally:
+            release_image(shm)
+
+    def test_large_image_packed_in_blocks(self):
+        """Test that images bigger than one encoder block are copied whole"""
+        image = gradient_image("RGB", size=(1200, 900))
+        handle, shm = share_image(image)
+        try:
+            attached, view = attach_image(handle)
+            assert np.array_equal(np.asarray(attached.convert("RGB")), np.asarray(image))
+            attached = None
+            view.close()
+        finally:
+            release_image(shm)
+
+    def test_attach_is_zero_copy(self):
+        """Test that the attached image reads the shared buffer directly"""
+        image = Image.new("L", (4, 4), 0)
+        handle, shm = share_image(image)
+        try:
+            attached, view = attach_image(handle)
+            shm.buf[0] = 200
+            assert attached.getpixel((0, 0)) == 200
+            assert attached.readonly
+            attached = None
+            view.close()
+        finally:
+            release_image(shm)
+
+    def test_release_unlinks(self):
+        """Test that a released block can no longer be attached"""
+        handle, shm = share_image(gradient_image())
+        release_image(shm)
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=handle["name"])
+
+
+class TestRestoreMode:
+    """Test cases for converting results back to the input mode"""
+
+    def test_nested_images_restored(self):
+        """Test that RGBA images inside dicts and lists come back as RGB"""
+        result = restore_mode({"image": Image.new("RGBA", (2, 2)), "cards": [{"crop": Image.new("RGBA", (2, 2))}],
+                               "count": 1}, "RGB")
+        assert result["image"].mode == "RGB"
+        assert result["cards"][0]["crop"].mode == "RGB"
+        assert result["count"] == 1
+
+    def test_rgba_source_kept(self):
+        """Test that RGBA inputs keep RGBA results"""
+        assert restore_mode(Image.new("RGBA", (2, 2)), "RGBA").mode == "RGBA"
+
+    def test_rss_positive(self):
+        """Test that the resident size is reported in bytes"""
+        assert current_rss() > 1024 * 1024
+
+
+class TestWorkerPool:
+    """Test cases for running engine functions in worker processes"""
+
+    def test_matches_inline(self, pool):
+        """Test that a worker returns the same result as an inline call"""
+        image = gradient_image()
+        assert pool.call(measure, image) == measure(image)
+
+    def test_images_come_back_in_source_mode(self, pool):
+        """Test that image results are returned as RGB for RGB input"""
+        image = gradient_image()
+        flipped = pool.call(ImageOps.flip, image)
+        assert flipped.mode == "RGB"
+        assert np.array_equal(np.asarray(flipped), np.asarray(ImageOps.flip(image)))
+
+    def test_arguments_forwarded(self, pool):
+        """Test that extra positional arguments reach the function"""
+        proxy = pool.call(make_proxy, gradient_image(size=(400, 200)), 100)
+        assert proxy.image.size == (100, 50)
+        assert (proxy.full_width, proxy.full_height) == (400, 200)
+
+    def test_errors_propagate(self, pool):
+        """Test that an exception in the worker is raised to the caller"""
+        with pytest.raises(TypeError):
+            pool.call(make_proxy, gradient_image(), "large")
+
+    def test_async_run(self, pool):
+        """Test that run can be awaited from the event loop"""
+        image = gradient_image()
+        assert asyncio.run(pool.run(measure, image)) == measure(image)
+
+    def test_recycles_over_rss_limit(self):
+        """Test that a worker above the RSS limit is replaced"""
+        pool = WorkerPool(processes=1, max_rss_mb=1)
+        try:
+            pool.call(measure, gradient_image())
+            assert pool.recycles == 1
+            assert pool.call(measure, gradient_image())["width"] == 64
+            assert pool.recycles == 2
+        finally:
+            pool.shutdown()
+
+    def test_rss_limit_retires_only_that_worker(self):
+        """Test that one bloated worker is replaced without restarting the others"""
+        pool = WorkerPool(processes=2, max_tasks=0, max_rss_mb=0)
+        try:
+            jobs = [pool.submit(measure, gradient_image()) for _ in range(2)]
+            [job.result() for job in jobs]
+            first, second = pool._workers
+            assert first is not None and second is not None
+
+            pool.max_rss = 1
+            pool.call(measure, gradient_image())
+            assert pool.recycles == 1
+            assert pool._workers[0] is not first
+            assert pool._workers[1] is second
+        finally:
+            pool.shutdown()
+
+    def test_task_limit_retires_worker(self):
+        """Test that a worker is replaced after max_tasks jobs"""
+        pool = WorkerPool(processes=1, max_tasks=2, max_rss_mb=0)
+        try:
+            pool.call(measure, gradient_image())
+            assert pool.recycles == 0
+            pool.call(measure, gradient_image())
+            assert pool.recycles == 1
+            assert pool.call(measure, gradient_image())["width"] == 64
+        finally:
+            pool.shutdown()
+
+    def test_jobs_go_to_least_busy_worker(self):
+        """Test that concurrent jobs are spread over the workers"""
+        pool = WorkerPool(processes=2, max_tasks=0, max_rss_mb=0)
+        try:
+            jobs = [pool.submit(measure, gradient_image()) for _ in range(2)]
+            assert all(worker is not None for worker in pool._workers)
+            [job.result() for job in jobs]
+            assert pool._pending == [0, 0]
+        finally:
+            pool.shutdown()
+
+    def test_expired_job_dropped(self, pool):
+        """Test that a job whose request is out of time does not run"""
+        token = bind_deadline(Deadline(time.time() - 1))
+        try:
+            with pytest.raises(DeadlineExceeded) as exc_info:
+                pool.call(measure, gradient_image())
+            assert exc_info.value.stage == "queue"
+        finally:
+            reset_deadline(token)
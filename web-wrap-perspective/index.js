@@ -22,6 +22,7 @@ const dimensionsRow = document.getElementById('dimensionsRow');
 const outputWidth = document.getElementById('outputWidth');
 const outputHeight = document.getElementById('outputHeight');
 const correctButton = document.getElementById('correctButton');
+const autoCorrectButton = document.getElementById('autoCorrectButton');
 const resetButton = document.getElementById('resetButton');
 const loading = document.getElementById('loading');
 const resultContainer = document.getElementById('resultContainer');
@@ -65,6 +66,7 @@ uploadButton.addEventListener('click', () => {
             dimensionsRow.classList.remove('hidden');
             correctButton.disabled = false;
             detectButton.classList.remove('hidden');
+            autoCorrectButton.classList.remove('hidden');
             resetButton.classList.remove('hidden');
             hideError();
             resultContainer.classList.add('hidden');
@@ -288,26 +290,87 @@ correctButton.addEventListener('click', async () => {
         
         const data = await response.json();
         
-        // Build the full URL for the result image
-        const resultImageUrl = new URL(data.output_path, API_BASE_URL).href;
+        showResult(data);
+    } catch (error) {
+        showError(error.message);
+    } finally {
+        loading.classList.add('hidden');
+        correctButton.disabled = false;
+    }
+});
+
+// Function to detect, correct and enhance in one request
+autoCorrectButton.addEventListener('click', async () => {
+    if (!imageBlob) {
+        showError('กรุณาอัปโหลดรูปภาพก่อน');
+        return;
+    }
+    
+    autoCorrectButton.disabled = true;
+    loading.classList.remove('hidden');
+    hideError();
+    
+    try {
+        const formData = new FormData();
+        formData.append('file', imageBlob);
         
-        // Display the result
-        resultImage.src = resultImageUrl;
-        resultContainer.classList.remove('hidden');
+        if (outputWidth.value) formData.append('output_width', outputWidth.value);
+        if (outputHeight.value) formData.append('output_height', outputHeight.value);
+        
+        const response = await fetch(`${API_BASE_URL}/perspective/auto`, {
+            method: 'POST',
+            body: formData
+        });
         
-        // Display info about the processed image
-        resultInfo.innerHTML = `
-            <p><strong>ขนาด:</strong> ${data.width} x ${data.height} พิกเซล</p>
-            <p><strong>อัตราเร่ง:</strong> ${data.fast_rate.toFixed(2)}</p>
-            <p><strong>อัตราระบายความร้อน:</strong> ${data.rack_cooling_rate.toFixed(2)}</p>
-        `;
+        if (!response.ok) {
+            const errorData = await response.json().catch(() => ({}));
+            throw new Error(errorData.detail || 'การปรับภาพล้มเหลว');
+        }
+        
+        const data = await response.json();
+        
+        // Move the handles to the corners the server used so they can be fine-tuned
+        if (data.points && data.points.length === 4) {
+            const imgWidth = uploadedImage.naturalWidth;
+            const imgHeight = uploadedImage.naturalHeight;
+            
+            data.points.forEach((point, index) => {
+                points[index].x = point.x / imgWidth;
+                points[index].y = point.y / imgHeight;
+                
+                const element = document.getElementById(points[index].id);
+                element.style.left = `${points[index].x * 100}%`;
+                element.style.top = `${points[index].y * 100}%`;
+            });
+            
+            updateLines();
+        }
+        
+        showResult(data);
     } catch (error) {
         showError(error.message);
     } finally {
         loading.classList.add('hidden');
-        correctButton.disabled = false;
+        autoCorrectButton.disabled = false;
     }
 });
 
+// Function to display a perspective result
+function showResult(data) {
+    // Build the full URL for the result image
+    const resultImageUrl = new URL(data.output_path, API_BASE_URL).href;
+    
+    // Display the result
+    resultImage.src = resultImageUrl;
+    resultContainer.classList.remove('hidden');
+    
+    // Display info about the processed image
+    resultInfo.innerHTML = `
+        <p><strong>ขนาด:</strong> ${data.width} x ${data.height} พิกเซล</p>
+        <p><strong>อัตราเร่ง:</strong> ${data.fast_rate.toFixed(2)}</p>
+        <p><strong>อัตราระบายความร้อน:</strong> ${data.rack_cooling_rate.toFixed(2)}</p>
+    `;
+}
+
 // Initialize lines on page load
 updateLines();
\ No newline at end of file